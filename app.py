@@ -1,12 +1,20 @@
 from flask import Flask, render_template, request, jsonify
 import os
-import json
-from database_utils import create_database_engine
-from data_loader import load_and_clean_data, table_mapping, transform_mapping
-from sqlalchemy import text, select, func, column
-from sqlalchemy.sql import table
-from sqlalchemy.sql.expression import select, column
-from sqlalchemy.sql import table, column, join
+import html
+import logging
+import importlib.util
+from itertools import chain
+from database_utils import (create_database_engine, create_import_ledger, get_table_count, rebuild_table_stats, SEARCH_SOURCES,
+                            decoded_table_name)
+from import_jobs import ImportQueue
+from migrations import migrate
+from response_cache import DataGeneration, PageCache
+from exports import EXPORT_SECTIONS, EXPORT_FORMATS, parse_export_bound, iter_export
+from serialization import dumps, rows_to_records, iter_ndjson, NDJSON_MIMETYPE
+from queries import (DATA_SECTIONS, CONVERSATION_LOOKUP, conversation_messages, decode_cursor, page_cursors, fetch_page,
+                     stream_page_rows)
+from query_plans import startup_check
+from sqlalchemy import text
 
 app = Flask(__name__)
 
@@ -14,8 +22,25 @@ UPLOAD_FOLDER = 'static/uploads'
 DATA_FOLDER = 'static/data'
 ALLOWED_EXTENSIONS = {'csv', 'xls', 'xlsx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-db_path = "my_database.db"
-db_engine = create_database_engine(db_path)
+db_path = os.environ.get("DATABASE_PATH", "my_database.db")
+# Older databases are brought up to the current schema before anything reads them
+migrate(db_path)
+db_engine = create_database_engine(db_path, preset="serving")
+# EXPLAIN QUERY PLAN on every /get_data statement: failing plans are logged ("warn"), fail startup ("strict") or not checked ("off")
+startup_check(db_engine, os.environ.get("QUERY_PLAN_CHECK", "warn"))
+# Uploads are imported in the background; the queue serializes their database writes. The ingestion stack
+# (pandas, openpyxl) is only imported by the queue once the first upload arrives.
+import_engine = create_database_engine(db_path, preset="bulk_import")
+create_import_ledger(import_engine)
+# /get_data pages are cached per data generation and revalidated with ETags
+data_generation = DataGeneration(db_path)
+page_cache = PageCache()
+
+def on_import_complete(job):
+    if job.status == "done":
+        data_generation.bump()
+
+import_queue = ImportQueue(import_engine, max_workers=int(os.environ.get('IMPORT_WORKERS', 2)), on_complete=on_import_complete)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -43,177 +68,283 @@ def upload_file():
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(file_path)
 
-         # Process the uploaded file (e.g., update the JSON data)
-        try:
-            load_and_clean_data(file_path, db_engine, table_mapping, transform_mapping)
-        except Exception as e:
-            print(f"Error when loading and cleaning: {e}")
-            return jsonify({'error': f'File upload failed: {e}'}), 500
-        return jsonify({'message': 'File uploaded successfully', 'reload_required': True}), 200
+         # Queue the uploaded file for import; progress is reported by /jobs/<job_id>
+        # Unchanged files are skipped via the import ledger unless force=1 is posted
+        force = request.form.get('force', '').lower() in ('1', 'true', 'yes')
+        job = import_queue.submit(file_path, force=force)
+        return jsonify({
+            'message': 'File uploaded, import queued',
+            'job_id': job.id,
+            'status_url': f'/jobs/{job.id}'
+        }), 202
     return jsonify({'error': 'File type not allowed'}), 400
 
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Reports the status and row counters of a queued upload import."""
+    job = import_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/table_stats/rebuild', methods=['POST'])
+def rebuild_stats():
+    """Recounts every table and resets the cached row counts used by /get_data."""
+    try:
+        counts = rebuild_table_stats(db_engine)
+        data_generation.bump()
+    except Exception as e:
+        logging.exception("Error rebuilding table stats")
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'counts': counts}), 200
+
+# per_page above which /get_data streams NDJSON instead of building one JSON document
+STREAM_PER_PAGE = 1000
+
+def section_total_count(conn, spec):
+    if spec.count_statement is not None:
+        return spec.count_statement.execute(conn).scalar()
+    return get_table_count(conn, spec.count_table)
+
+def paging_error(page, per_page):
+    """Returns a 400 response if page or per_page is below 1 (LIMIT/OFFSET and total_pages need both positive), else None"""
+    if page < 1 or per_page < 1:
+        return jsonify({'error': 'page and per_page must be positive integers'}), 400
+    return None
+
+def page_meta(page, per_page, total_count, next_cursor, prev_cursor):
+    return {
+        'page': page,
+        'per_page': per_page,
+        'total_count': total_count,
+        'total_pages': (total_count + per_page - 1) // per_page,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor
+    }
+
+def build_data_page(section, page, per_page, cursor):
+    """Runs the /get_data queries for one page of a section and returns the response payload."""
+    spec = DATA_SECTIONS[section]
+    with db_engine.connect() as conn:
+        total_count = section_total_count(conn, spec)
+        result, next_cursor, prev_cursor = fetch_page(conn, spec, page, per_page, cursor)
+    payload = {'data': rows_to_records(result, spec.fields, spec.extra)}
+    payload.update(page_meta(page, per_page, total_count, next_cursor, prev_cursor))
+    return payload
+
+def stream_data_page(section, page, per_page, cursor):
+    """Returns one /get_data page as NDJSON lines: a record per line, then a {"meta": ...} line with
+    the counts and cursors. Rows are read in batches, so the page is never held in memory whole.
+
+    The count and the page's first query run before this returns, so a failing query
+    is reported by get_data as a 500; an error once rows are streaming ends the body
+    with an {"error": ...} line instead (see _close_after_lines).
+    """
+    spec = DATA_SECTIONS[section]
+    conn = db_engine.connect()
+    try:
+        total_count = section_total_count(conn, spec)
+        steps, direction = spec.page_query(page, per_page, cursor)
+        if direction == 'prev':
+            # Previous pages are read oldest first and must be reversed, so they are fetched whole
+            rows, next_cursor, prev_cursor = fetch_page(conn, spec, page, per_page, cursor)
+            lines = iter_ndjson(rows, spec.fields, spec.extra,
+                                page_meta(page, per_page, total_count, next_cursor, prev_cursor))
+        else:
+            state = {'first': None, 'last': None, 'has_more': False}
+
+            def meta():
+                has_prev = direction == 'next' or page > 1
+                next_cursor, prev_cursor = page_cursors(state['first'], state['last'], state['has_more'], has_prev)
+                return page_meta(page, per_page, total_count, next_cursor, prev_cursor)
+
+            rows = stream_page_rows(conn, steps, per_page, state)
+            first_row = next(rows, None)
+            if first_row is not None:
+                rows = chain([first_row], rows)
+            lines = iter_ndjson(rows, spec.fields, spec.extra, meta)
+    except Exception:
+        conn.close()
+        raise
+    return _close_after_lines(conn, lines)
+
+def _close_after_lines(conn, lines):
+    """Yields a streamed body's lines, then closes conn (also when the client disconnects).
+
+    The status line has already been sent, so an error is logged and reported in a
+    final {"error": ...} line for the client to detect the truncated body.
+    """
+    try:
+        yield from lines
+    except Exception as e:
+        logging.exception("Error streaming get_data")
+        yield dumps({'error': str(e)}) + b'\n'
+    finally:
+        conn.close()
+
+def _with_validators(response, generation):
+    response.set_etag(data_generation.etag(generation))
+    response.last_modified = data_generation.last_modified
+    response.cache_control.no_cache = True
+    return response
+
+def cached_json_response(cache_key, build_payload):
+    """Serves a JSON payload built by build_payload, cached for the current data generation.
+
+    The ETag and Last-Modified headers come from the data generation, so a client
+    revalidating a page it already has gets 304 Not Modified, and a repeated page
+    is served from page_cache; neither touches the database.
+    """
+    generation = data_generation.current()
+    if request.if_none_match.contains(data_generation.etag(generation)):
+        return _with_validators(app.response_class(status=304), generation)
+    body = page_cache.get(cache_key, generation)
+    if body is None:
+        body = dumps(build_payload())
+        page_cache.put(cache_key, generation, body)
+    return _with_validators(app.response_class(body, mimetype='application/json'), generation)
+
+def streamed_ndjson_response(build_lines):
+    """Streams the NDJSON lines returned by build_lines; revalidated like cached_json_response but not cached.
+
+    build_lines is only called when the client's copy is stale, so a 304 runs no query.
+    """
+    generation = data_generation.current()
+    if request.if_none_match.contains(data_generation.etag(generation)):
+        return _with_validators(app.response_class(status=304), generation)
+    return _with_validators(app.response_class(build_lines(), mimetype=NDJSON_MIMETYPE), generation)
+
 @app.route('/get_data')
 def get_data():
     section = request.args.get('section')
     page = request.args.get('page', default=1, type=int)
     per_page = request.args.get('per_page', default=10, type=int)
+    cursor = request.args.get('cursor') or None
     if not section:
         return jsonify({'error': 'Section is required'}), 400
+    if section not in DATA_SECTIONS:
+        return jsonify({'error': 'Invalid section'}), 400
+    error = paging_error(page, per_page)
+    if error:
+        return error
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    try:
+        # Large pages (or format=ndjson) are streamed row by row instead of built as one document
+        if per_page > STREAM_PER_PAGE or request.args.get('format') == 'ndjson':
+            return streamed_ndjson_response(lambda: stream_data_page(section, page, per_page, cursor))
+        return cached_json_response(('get_data', section, page, per_page, cursor),
+                                    lambda: build_data_page(section, page, per_page, cursor))
+    except Exception as e:
+        logging.exception("Error in get_data")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/get_conversation')
+def get_conversation():
+    """Returns one conversation's messages (newest first), cursor paged like /get_data."""
+    section = request.args.get('section')
+    name = request.args.get('name')
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=50, type=int)
+    cursor = request.args.get('cursor') or None
+    if section not in ('chats', 'sms') or not name:
+        return jsonify({'error': 'section (chats or sms) and name are required'}), 400
+    error = paging_error(page, per_page)
+    if error:
+        return error
+    if cursor is not None:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
     try:
         with db_engine.connect() as conn:
-            if section == 'chats':
-                 cm = table("chat_messages").alias("cm")
-                 c = table("contacts").alias("c")
-                 base_query = select(
-                     cm.c.messenger,
-                     cm.c.time,
-                     cm.c.sender,
-                     cm.c.text,
-                     c.c.name.label("contact_name")
-                    ).select_from(
-                         join(cm, c, cm.c.contact_id == c.c.contact_id, isouter=True)
-                    )
-
-                 total_count = conn.execute(select(func.count()).select_from(text("chat_messages"))).scalar()
-                 result = conn.execute(base_query.limit(per_page).offset((page - 1) * per_page)).fetchall()
-                 data = []
-                 for row in result:
-                     data.append({
-                        'messenger': row[0],
-                        'time': row[1],
-                        'name': row[2] if row[2] else "Unknown",
-                        'last_message': row[3],
-                        'profile_pic': '/static/images/user.png',
-                        'messages': [{'sender': row[2] if row[2] else "Unknown", 'content': row[3]}]
-                    })
-                # Group messages by sender
-                 grouped_data = {}
-                 for item in data:
-                     key = item['name']
-                     if key not in grouped_data:
-                         grouped_data[key] = {
-                             'name': item['name'],
-                            'profile_pic': item['profile_pic'],
-                            'last_message': item['last_message'],
-                             'messages': item['messages']
-                         }
-                     else:
-                         grouped_data[key]['messages'].extend(item['messages'])
-                         grouped_data[key]['last_message'] = item['last_message']
-                 data = list(grouped_data.values())
-
-            elif section == 'calls':
-                 c = table("calls").alias("c")
-                 l = table("locations").alias("l")
-                 con = table("contacts").alias("con")
-                 base_query = select(
-                    c.c.call_type,
-                    c.c.time,
-                    c.c.from_to,
-                    c.c.duration,
-                    l.c.location_text,
-                    con.c.name.label("contact_name")
-                ).select_from(
-                     join(c, l, c.c.location_id == l.c.location_id, isouter=True).\
-                     join(c, con, c.c.contact_id == con.c.contact_id, isouter=True)
-                )
-
-                 total_count = conn.execute(select(func.count()).select_from(text("calls"))).scalar()
-                 result = conn.execute(base_query.limit(per_page).offset((page - 1) * per_page)).fetchall()
-                 data = [{
-                    'call_type': row[0],
-                    'time': row[1],
-                    'name': row[2] if row[2] else "Unknown",
-                    'duration': row[3],
-                    'location': row[4] if row[4] else "Unknown",
-                    'profile_pic': '/static/images/user.png'
-                 } for row in result]
-            elif section == 'keylogs':
-                 base_query = select(
-                    column("application"),
-                    column("time"),
-                    column("text")
-                 ).select_from(table("keylogs"))
-                 total_count = conn.execute(select(func.count()).select_from(text("keylogs"))).scalar()
-                 result = conn.execute(base_query.limit(per_page).offset((page - 1) * per_page)).fetchall()
-                 data = [{'application': row[0], 'time': row[1], 'text': row[2]} for row in result]
-            elif section == 'contacts':
-                base_query = select(
-                    column("name"),
-                    column("phone_number"),
-                    column("email_id")
-                ).select_from(table("contacts"))
-                total_count = conn.execute(select(func.count()).select_from(text("contacts"))).scalar()
-                result = conn.execute(base_query.limit(per_page).offset((page - 1) * per_page)).fetchall()
-                data = [{
-                     'name': row[0],
-                    'phone_number': row[1],
-                    'email_id': row[2],
-                     'profile_pic': '/static/images/user.png'
-                } for row in result]
-            elif section == 'sms':
-                 sms = table("sms_messages").alias("sms")
-                 l = table("locations").alias("l")
-                 con = table("contacts").alias("con")
-
-                 base_query = select(
-                     sms.c.sms_type,
-                     sms.c.time,
-                     sms.c.from_to,
-                     sms.c.text,
-                     l.c.location_text,
-                    con.c.name.label("contact_name")
-                ).select_from(
-                     join(sms, l, sms.c.location_id == l.c.location_id, isouter=True).\
-                     join(sms, con, sms.c.contact_id == con.c.contact_id, isouter=True)
-                )
-                 total_count = conn.execute(select(func.count()).select_from(text("sms_messages"))).scalar()
-                 result = conn.execute(base_query.limit(per_page).offset((page - 1) * per_page)).fetchall()
-                 data = []
-                 for row in result:
-                     data.append({
-                       'sms_type': row[0],
-                        'time': row[1],
-                        'name': row[2] if row[2] else "Unknown",
-                       'last_message': row[3],
-                        'location': row[4] if row[4] else "Unknown",
-                        'profile_pic': '/static/images/user.png',
-                       'messages': [{'sender': row[2] if row[2] else "Unknown", 'content': row[3]}]
-                    })
-                 # Group messages by sender
-                 grouped_data = {}
-                 for item in data:
-                     key = item['name']
-                     if key not in grouped_data:
-                         grouped_data[key] = {
-                             'name': item['name'],
-                             'profile_pic': item['profile_pic'],
-                            'last_message': item['last_message'],
-                             'messages': item['messages']
-                         }
-                     else:
-                         grouped_data[key]['messages'].extend(item['messages'])
-                         grouped_data[key]['last_message'] = item['last_message']
-                 data = list(grouped_data.values())
-
-            elif section == 'installed_apps':
-               base_query = select(
-                   column("application_name"),
-                    column("package_name"),
-                   column("installed_date")
-                ).select_from(table("installedapps"))
-               total_count = conn.execute(select(func.count()).select_from(text("installedapps"))).scalar()
-               result = conn.execute(base_query.limit(per_page).offset((page - 1) * per_page)).fetchall()
-               data = [{
-                     'name': row[0],
-                    'package_name': row[1],
-                     'installed_date': row[2],
-                    'icon': '/static/images/app_icon.png',
-                    'version': '1.0'
-                 } for row in result]
-            else:
-                return jsonify({'error': 'Invalid section'}), 400
+            conversation = CONVERSATION_LOOKUP.execute(conn, section=section, name=name).fetchone()
+            if conversation is None:
+                return jsonify({'error': 'Conversation not found'}), 404
+            contact_id, total_count = conversation
+
+            messages = conversation_messages(section, name, contact_id)
+            result, next_cursor, prev_cursor = fetch_page(conn, messages, page, per_page, cursor,
+                                                          name=name, contact_id=contact_id)
+            data = [{
+                'sender': row[0] if row[0] else name,
+                'content': row[1],
+                'time': row[2]
+            } for row in result]
+        payload = {'data': data, 'name': name}
+        payload.update(page_meta(page, per_page, total_count, next_cursor, prev_cursor))
+        return jsonify(payload)
+    except Exception as e:
+        logging.exception("Error in get_conversation")
+        return jsonify({'error': str(e)}), 500
+
+# highlight() wraps matches in these control characters; the snippet is HTML-escaped before they become <mark> tags
+HIGHLIGHT_START, HIGHLIGHT_END = '\x02', '\x03'
+
+def highlight_snippet(snippet):
+    """HTML-escapes a highlight() snippet of stored text, then turns its match markers into <mark> tags."""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+def build_match_query(search_term):
+    """Turns free text into an FTS5 query matching every word, quoting each so user input is never parsed as syntax."""
+    words = search_term.split()
+    return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
+
+@app.route('/search')
+def search():
+    """Ranked, highlighted full-text search over chat, SMS and keylog text.
+
+    Query args: q (required), sections (comma separated, default all), page, per_page.
+    """
+    search_term = request.args.get('q', '')
+    page = request.args.get('page', default=1, type=int)
+    per_page = request.args.get('per_page', default=20, type=int)
+    sections = [name for name in request.args.get('sections', ','.join(SEARCH_SOURCES)).split(',') if name]
+    match_query = build_match_query(search_term)
+    if not match_query:
+        return jsonify({'error': 'Search term is required'}), 400
+    invalid = [name for name in sections if name not in SEARCH_SOURCES]
+    if invalid:
+        return jsonify({'error': f'Invalid section: {", ".join(invalid)}'}), 400
+    error = paging_error(page, per_page)
+    if error:
+        return error
+
+    selects = []
+    counts = []
+    for name in sections:
+        table_name, name_column = SEARCH_SOURCES[name]
+        selects.append(f"""
+            SELECT '{name}' AS section, m.{name_column} AS name, m.time AS time,
+                   highlight({table_name}_fts, 0, char(2), char(3)) AS snippet,
+                   bm25({table_name}_fts) AS rank
+            FROM {table_name}_fts JOIN {decoded_table_name(table_name)} m ON m.rowid = {table_name}_fts.rowid
+            WHERE {table_name}_fts MATCH :query
+        """)
+        counts.append(f"SELECT count(*) FROM {table_name}_fts WHERE {table_name}_fts MATCH :query")
+    query = text(' UNION ALL '.join(selects) + ' ORDER BY rank LIMIT :limit OFFSET :offset')
+
+    try:
+        with db_engine.connect() as conn:
+            total_count = sum(conn.execute(text(sql), {'query': match_query}).scalar() for sql in counts)
+            result = conn.execute(query, {
+                'query': match_query,
+                'limit': per_page,
+                'offset': (page - 1) * per_page
+            }).fetchall()
+        data = [{
+            'section': row[0],
+            'name': row[1] if row[1] else "Unknown",
+            'time': row[2],
+            'snippet': highlight_snippet(row[3])
+        } for row in result]
         return jsonify({
             'data': data,
             'page': page,
@@ -222,8 +353,41 @@ def get_data():
             'total_pages': (total_count + per_page - 1) // per_page
         })
     except Exception as e:
-        print(f"Error in get_data: {e}")
+        logging.exception("Error in search")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/export')
+def export():
+    """Streams a whole section, optionally limited to from <= date < to, as CSV, NDJSON or Parquet.
+
+    Rows are read from a server-side cursor in batches and written out as they
+    arrive, so memory use does not grow with the export. The body is gzip
+    compressed when the client accepts it (except Parquet, which is already compressed).
+    """
+    section = request.args.get('section')
+    export_format = request.args.get('format', 'csv').lower()
+    if section not in EXPORT_SECTIONS:
+        return jsonify({'error': f'section must be one of: {", ".join(EXPORT_SECTIONS)}'}), 400
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    if export_format == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        return jsonify({'error': 'Parquet export needs pyarrow installed on the server'}), 501
+    try:
+        date_from = parse_export_bound(request.args.get('from'))
+        date_to = parse_export_bound(request.args.get('to'), end=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    compress = export_format != 'parquet' and request.accept_encodings['gzip'] > 0
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    response = app.response_class(iter_export(db_engine, section, export_format, date_from, date_to, compress),
+                                  mimetype=mimetype)
+    filename = "_".join(part for part in (section, request.args.get('from'), request.args.get('to')) if part)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    response.vary.add('Accept-Encoding')
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
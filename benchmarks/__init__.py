@@ -0,0 +1,8 @@
+"""Benchmarks for ingestion and the /get_data API.
+
+    python -m benchmarks.generate --rows 100000 --out bench_data
+    python -m benchmarks.run --rows 100000 --output results.json
+    python -m benchmarks.importtime
+
+Run from the repository root.
+"""
@@ -0,0 +1,120 @@
+"""Writes synthetic exports in the layout of the files in samples/.
+
+XLSX files have the one-cell "Tracking Smartphone" banner above the header
+row, like the real exports; CSV files start with the header row, which is
+what the CSV reader expects. Output is reproducible for a given seed.
+"""
+import argparse
+import csv
+import os
+import random
+from datetime import datetime
+from openpyxl import Workbook
+
+BANNER = "Tracking Smartphone - Free Remote Monitoring Tool For Android"
+# Header row and base file name of each export, as in samples/
+EXPORT_LAYOUTS = {
+    "keylogs": ("keylogs", ["Application", "Time", "Text"]),
+    "sms_messages": ("sms", ["SMS type", "Time", "From/To", "Text", "Location"]),
+    "chat_messages": ("chatMessages", ["Messenger", "Time", "Sender", "Text"]),
+    "contacts": ("contacts", ["Name", "Phone Number", "Email Id", "Last Contacted"]),
+    "calls": ("calls", ["Call type", "Time", "From/To", "Duration (Sec)", "Location"]),
+    "installedapps": ("installedApps", ["Application Name", "Package Name", "Installed Date"])
+}
+WORDS = ("hey", "ok", "thanks", "see", "you", "later", "on", "my", "way", "call", "me", "back", "love", "it",
+         "where", "are", "what", "time", "tomorrow", "sounds", "good", "lol", "yes", "no", "maybe")
+APPLICATIONS = ("com.android.settings", "com.google.android.apps.messaging", "com.whatsapp", "com.facebook.orca",
+                "com.einnovation.temu", "com.android.chrome", "com.snapchat.android")
+MESSENGERS = ("WhatsApp", "Messenger", "Instagram", "Snapchat", "Telegram")
+PLACES = ("Price", "Wellington", "Helper", "Castle Dale", "Huntington", "Provo", "Orem")
+
+
+class ExportRowGenerator:
+    """Produces rows for each export; contacts, places and timestamps repeat like in a real phone's history"""
+    def __init__(self, seed=0, contact_count=500, location_count=200):
+        self.random = random.Random(seed)
+        self.contacts = [(f"Contact {i}", f"+1435{self.random.randint(1000000, 9999999)}") for i in range(contact_count)]
+        self.locations = [f"{self.random.randint(1, 999)} N Main St, {place}, UT 84501, USA, {place}"
+                          for place in PLACES for _ in range(max(1, location_count // len(PLACES)))]
+        # Export times have no year, so a fixed (non-leap) reference year keeps the output reproducible
+        self.start = datetime(2001, 12, 31, 23, 59)
+
+    def _text(self, max_words=12):
+        return " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(1, max_words)))
+
+    def _times(self, count):
+        """Newest-first timestamps spread over a year, in the export format ("Sep 9, 12:35 PM")"""
+        year_start = self.start.replace(month=1, day=1, hour=0, minute=0)
+        step = (self.start - year_start) / max(count, 1)
+        for i in range(count):
+            t = self.start - step * i
+            yield f"{t:%b} {t.day}, {t:%I:%M %p}"
+
+    def rows(self, table_name, count):
+        r = self.random
+        if table_name == "keylogs":
+            for time in self._times(count):
+                yield (r.choice(APPLICATIONS), time, self._text(6))
+        elif table_name == "sms_messages":
+            for time in self._times(count):
+                yield (r.choice(("Received", "Sent")), time, r.choice(self.contacts)[1], self._text(), r.choice(self.locations))
+        elif table_name == "chat_messages":
+            for time in self._times(count):
+                yield (r.choice(MESSENGERS), time, r.choice(self.contacts)[0], self._text())
+        elif table_name == "contacts":
+            for i in range(count):
+                name, phone = self.contacts[i] if i < len(self.contacts) else (f"Contact {i}", f"+1801{i:07d}")
+                yield (name, phone, f"{name.replace(' ', '.').lower()}@example.com", "1969-12-31 17:00:00")
+        elif table_name == "calls":
+            for time in self._times(count):
+                yield (r.choice(("Incoming", "Outgoing", "Missed")), time, r.choice(self.contacts)[1],
+                       f"{r.randint(0, 3600)} Sec", r.choice(self.locations))
+        elif table_name == "installedapps":
+            times = self._times(count)
+            for i, time in enumerate(times):
+                yield (f"App {i}", f"com.example.app{i}", time)
+        else:
+            raise ValueError(f"No export layout for table: {table_name}")
+
+
+def write_xlsx(path, header, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([BANNER])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def generate_dataset(output_dir, rows_per_table, tables=None, file_format="xlsx", seed=0):
+    """Writes one export per table and returns {table_name: file path}"""
+    os.makedirs(output_dir, exist_ok=True)
+    generator = ExportRowGenerator(seed)
+    writer = write_xlsx if file_format == "xlsx" else write_csv
+    files = {}
+    for table_name in tables or EXPORT_LAYOUTS:
+        base_name, header = EXPORT_LAYOUTS[table_name]
+        path = os.path.join(output_dir, f"{base_name}.{file_format}")
+        writer(path, header, generator.rows(table_name, rows_per_table))
+        files[table_name] = path
+    return files
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Write synthetic exports for benchmarking.")
+    arg_parser.add_argument("--rows", type=int, default=10000, help="rows per table (default: 10000)")
+    arg_parser.add_argument("--out", default="bench_data", help="output directory (default: bench_data)")
+    arg_parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    arg_parser.add_argument("--tables", nargs="*", choices=list(EXPORT_LAYOUTS), default=None)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+    for table_name, path in generate_dataset(args.out, args.rows, args.tables, args.format, args.seed).items():
+        print(f"{table_name}: {path}")
@@ -0,0 +1,85 @@
+"""Measures what importing the web app costs, using python -X importtime.
+
+Each measurement runs in a fresh interpreter, so nothing is already in
+sys.modules. Exits with status 1 if a module of the ingestion stack is
+imported at startup, so the check can run in CI:
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --module app --repeat 5 --output importtime.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules only uploads and imports need; serving /get_data must not import them
+INGESTION_MODULES = ("pandas", "openpyxl", "dateutil", "pytz", "data_loader", "transforms", "cleaned_output")
+# Slowest imports listed in the report
+TOP_IMPORTS = 15
+# Printed by the child after the import: peak RSS in KiB (bytes on macOS)
+RSS_SNIPPET = "import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def parse_importtime(stderr):
+    """Parses -X importtime output into {module: (self_us, cumulative_us)}"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module, db_path):
+    """Imports module in a fresh interpreter and returns (import timings, peak RSS in MiB or None)"""
+    code = f"import {module}; {RSS_SNIPPET}" if sys.platform != "win32" else f"import {module}"
+    env = dict(os.environ, DATABASE_PATH=db_path, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rss = None
+    if result.stdout.strip():
+        rss = round(int(result.stdout.split()[-1]) / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return parse_importtime(result.stderr), rss
+
+
+def run(module="app", repeat=3):
+    """Imports module repeat times and reports the fastest run, the slowest imports and any ingestion modules loaded"""
+    with tempfile.TemporaryDirectory(prefix="repldb_importtime_") as work_dir:
+        db_path = os.path.join(work_dir, "importtime.db")
+        runs = [measure_import(module, db_path) for _ in range(repeat)]
+    timings, rss = min(runs, key=lambda run: run[0].get(module, (0, 0))[1])
+    top = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)[:TOP_IMPORTS]
+    return {
+        "module": module,
+        "python": sys.version.split()[0],
+        "cumulative_ms": round(timings.get(module, (0, 0))[1] / 1000, 3),
+        "modules_imported": len(timings),
+        "peak_rss_mb": rss,
+        "top_imports_ms": {name: round(cumulative / 1000, 3) for name, (_, cumulative) in top},
+        "ingestion_modules_imported": sorted({name.split(".")[0] for name in timings} & set(INGESTION_MODULES))
+    }
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Report the import time of the web app.")
+    arg_parser.add_argument("--module", default="app", help="module to import (default: app)")
+    arg_parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters to run; the fastest is reported")
+    arg_parser.add_argument("--output", default=None, help="also write the report to this JSON file")
+    args = arg_parser.parse_args()
+    report = run(args.module, args.repeat)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["ingestion_modules_imported"]:
+        print(f"{args.module} imports the ingestion stack at startup: {', '.join(report['ingestion_modules_imported'])}",
+              file=sys.stderr)
+        sys.exit(1)
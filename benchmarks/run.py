@@ -0,0 +1,202 @@
+"""Times ingestion and /get_data on a synthetic dataset and writes the results as JSON.
+
+Each run uses fresh databases in a scratch directory, so results from
+different commits can be compared directly.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.generate import generate_dataset, EXPORT_LAYOUTS
+from benchmarks import importtime
+
+# /get_data section for each table
+GET_DATA_SECTIONS = {
+    "chat_messages": "chats",
+    "sms_messages": "sms",
+    "calls": "calls",
+    "keylogs": "keylogs",
+    "contacts": "contacts",
+    "installedapps": "installed_apps"
+}
+GET_DATA_PER_PAGE = 10
+# Requests per measurement; the median is reported
+GET_DATA_REPEAT = 5
+
+
+def create_benchmark_database(db_path):
+    """Creates the tables, triggers and indexes main.py would create"""
+    from create_db import create_database
+    create_database(db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript((REPO_ROOT / "schema.sql").read_text())
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds > 0 else None
+
+
+def bench_load_and_clean_data(files, work_dir):
+    """Times data_loader.load_and_clean_data per file on a fresh database"""
+    from data_loader import load_and_clean_data, table_mapping, transform_mapping
+    from database_utils import create_database_engine
+    db_path = os.path.join(work_dir, "load_and_clean_data.db")
+    create_benchmark_database(db_path)
+    db_engine = create_database_engine(db_path, preset="bulk_import")
+    results = {}
+    for table_name, file_path in files.items():
+        progress, seconds = _timed(load_and_clean_data, file_path, db_engine, table_mapping, transform_mapping)
+        results[table_name] = {
+            "seconds": round(seconds, 4),
+            "rows_read": progress["rows_read"],
+            "rows_inserted": progress["rows_inserted"],
+            "rows_per_sec": _rate(progress["rows_read"], seconds),
+            "error": progress["error"]
+        }
+    db_engine.dispose()
+    return results, db_path
+
+
+def bench_process_and_insert_data(files, work_dir):
+    """Times data_processor.process_and_insert_data per file, if the module can be imported here"""
+    try:
+        data_processor = importlib.import_module("data_processor")
+    except ImportError as e:
+        return {"skipped": f"data_processor could not be imported: {e}"}
+    data_processor.DATABASE_FILE = os.path.join(work_dir, "process_and_insert_data.db")
+    data_processor.init_db()
+    id_caches = data_processor.create_id_caches()
+    results = {}
+    for table_name, file_path in files.items():
+        try:
+            stats, seconds = _timed(data_processor.process_and_insert_data, Path(file_path), id_caches)
+        except Exception as e:
+            results[table_name] = {"error": str(e)}
+            continue
+        results[table_name] = {
+            "seconds": round(seconds, 4),
+            "rows_read": stats["total_rows"],
+            "rows_inserted": stats["processed_rows"],
+            "rows_per_sec": _rate(stats["total_rows"], seconds)
+        }
+    return results
+
+
+def _median_ms(timings):
+    timings = sorted(timings)
+    return round(timings[len(timings) // 2] * 1000, 3)
+
+
+def bench_get_data(db_path, tables, repeat=GET_DATA_REPEAT, per_page=GET_DATA_PER_PAGE):
+    """Times /get_data through Flask's test client at the first, middle and last page of each section.
+
+    The first request of each page is reported separately (cold: database
+    queried) from the repeated ones (warm: page cache), and a deep page is
+    also fetched by cursor to compare keyset with OFFSET paging.
+    """
+    os.environ["DATABASE_PATH"] = db_path
+    app_module = importlib.import_module("app")
+    client = app_module.app.test_client()
+    results = {}
+    for table_name in tables:
+        section = GET_DATA_SECTIONS[table_name]
+        first = client.get(f"/get_data?section={section}&per_page={per_page}").get_json()
+        total_pages = max(1, first.get("total_pages") or 1)
+        pages = {"first": 1, "middle": max(1, total_pages // 2), "last": total_pages}
+        section_results = {"total_count": first.get("total_count")}
+        for label, page in pages.items():
+            url = f"/get_data?section={section}&page={page}&per_page={per_page}"
+            app_module.page_cache.clear()
+            _, cold = _timed(client.get, url)
+            warm = [_timed(client.get, url)[1] for _ in range(repeat)]
+            section_results[f"page_{label}"] = {"page": page, "cold_ms": round(cold * 1000, 3), "warm_ms": _median_ms(warm)}
+        # Keyset paging: the page after the middle one, located by cursor instead of OFFSET
+        middle = client.get(f"/get_data?section={section}&page={pages['middle']}&per_page={per_page}").get_json()
+        if middle.get("next_cursor"):
+            url = f"/get_data?section={section}&per_page={per_page}&cursor={middle['next_cursor']}"
+            app_module.page_cache.clear()
+            _, cold = _timed(client.get, url)
+            section_results["cursor_after_middle"] = {"cold_ms": round(cold * 1000, 3)}
+        results[section] = section_results
+    app_module.import_queue.shutdown(wait=False)
+    return results
+
+
+def run(rows, tables=None, file_format="xlsx", seed=0, work_dir=None):
+    """Runs every benchmark and returns the results; work_dir is kept if given, otherwise a scratch directory is used"""
+    tables = tables or list(EXPORT_LAYOUTS)
+    own_work_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="repldb_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        files, generate_seconds = _timed(generate_dataset, os.path.join(work_dir, "data"), rows, tables, file_format, seed)
+        results = {
+            "meta": {
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "rows_per_table": rows,
+                "file_format": file_format,
+                "seed": seed,
+                "generate_seconds": round(generate_seconds, 3)
+            }
+        }
+        results["load_and_clean_data"], db_path = bench_load_and_clean_data(files, work_dir)
+        results["process_and_insert_data"] = bench_process_and_insert_data(files, work_dir)
+        results["get_data"] = bench_get_data(db_path, tables)
+        try:
+            results["app_import"] = importtime.run("app")
+        except RuntimeError as e:
+            results["app_import"] = {"skipped": str(e)}
+        return results
+    finally:
+        if own_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark ingestion and /get_data on synthetic exports.")
+    arg_parser.add_argument("--rows", type=int, default=10000, help="rows per table (default: 10000)")
+    arg_parser.add_argument("--tables", nargs="*", choices=list(EXPORT_LAYOUTS), default=None)
+    arg_parser.add_argument("--format", choices=["xlsx", "csv"], default="xlsx")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--work-dir", default=None, help="keep generated files and databases here")
+    arg_parser.add_argument("--output", default=None,
+                            help="results file (default: benchmarks/results/<timestamp>.json)")
+    args = arg_parser.parse_args()
+    results = run(args.rows, args.tables, args.format, args.seed, args.work_dir)
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results",
+                                         f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
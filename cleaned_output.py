@@ -0,0 +1,102 @@
+import os
+import glob
+import uuid
+from datetime import datetime
+import pandas as pd
+from database_utils import insert_or_ignore
+
+CLEANED_OUTPUT_DIR = "cleaned_output"
+# Default cleaned-output format; override per call or with the CLEANED_OUTPUT_FORMAT environment variable
+DEFAULT_OUTPUT_FORMAT = os.environ.get("CLEANED_OUTPUT_FORMAT", "csv")
+# Columns used, in order, to pick the date partition of a Parquet row
+PARTITION_DATE_COLUMNS = ["time_dt", "last_contacted_dt", "installed_date"]
+PARTITION_COLUMN = "partition_date"
+
+
+class CsvOutputWriter:
+    """Writes the cleaned rows of one imported file to cleaned_output/<name>_cleaned_<timestamp>.csv"""
+    def __init__(self, file_path):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_dir = os.path.join(os.path.dirname(file_path), CLEANED_OUTPUT_DIR)
+        os.makedirs(output_dir, exist_ok=True)
+        base_name, _ = os.path.splitext(os.path.basename(file_path))
+        self.output_file = os.path.join(output_dir, f"{base_name}_cleaned_{timestamp}.csv")
+        self._is_first_chunk = True
+
+    def write(self, table_name, df):
+        df.to_csv(self.output_file, mode='w' if self._is_first_chunk else 'a', header=self._is_first_chunk, index=False)
+        self._is_first_chunk = False
+
+    def close(self):
+        pass
+
+
+class ParquetOutputWriter:
+    """Writes cleaned rows as Parquet, partitioned by table and by date:
+    cleaned_output/<table>/partition_date=YYYY-MM-DD/<name>_<timestamp>_<n>.parquet
+
+    Needs pyarrow. Each chunk is written as soon as it arrives, so memory stays bounded by the chunk size.
+    """
+    def __init__(self, file_path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet cleaned output needs pyarrow; install it or use the csv format")
+        self.output_dir = os.path.join(os.path.dirname(file_path), CLEANED_OUTPUT_DIR)
+        base_name, _ = os.path.splitext(os.path.basename(file_path))
+        self.file_prefix = f"{base_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self._chunk_number = 0
+
+    def write(self, table_name, df):
+        if df.empty:
+            return
+        date_column = next((col for col in PARTITION_DATE_COLUMNS if col in df.columns), None)
+        if date_column is not None:
+            partitions = pd.to_datetime(df[date_column], errors='coerce').dt.strftime('%Y-%m-%d').fillna('unknown')
+        else:
+            partitions = pd.Series('unknown', index=df.index)
+        for partition, part in df.groupby(partitions.values):
+            partition_dir = os.path.join(self.output_dir, table_name, f"{PARTITION_COLUMN}={partition}")
+            os.makedirs(partition_dir, exist_ok=True)
+            part.to_parquet(os.path.join(partition_dir, f"{self.file_prefix}_{self._chunk_number}.parquet"), index=False)
+        self._chunk_number += 1
+
+    def close(self):
+        pass
+
+
+OUTPUT_WRITERS = {
+    "csv": CsvOutputWriter,
+    "parquet": ParquetOutputWriter
+}
+
+
+def get_output_writer(file_path, output_format=None):
+    """Returns the cleaned-output writer for a format ("csv" or "parquet")."""
+    output_format = (output_format or DEFAULT_OUTPUT_FORMAT).lower()
+    writer_class = OUTPUT_WRITERS.get(output_format)
+    if writer_class is None:
+        raise ValueError(f"Unknown cleaned output format: {output_format}")
+    return writer_class(file_path)
+
+
+def rebuild_from_cleaned_output(db_engine, output_dir):
+    """Loads every Parquet cleaned output under output_dir back into the database.
+
+    Reads the columnar files directly instead of re-parsing the original
+    spreadsheets. Rows already present are skipped (INSERT OR IGNORE), so it
+    is safe to run against a partly populated database.
+    Returns:
+        dict: Rows inserted per table.
+    """
+    inserted_per_table = {}
+    for table_dir in sorted(glob.glob(os.path.join(output_dir, "*", ""))):
+        table_name = os.path.basename(os.path.normpath(table_dir))
+        for parquet_file in sorted(glob.glob(os.path.join(table_dir, f"{PARTITION_COLUMN}=*", "*.parquet"))):
+            df = pd.read_parquet(parquet_file)
+            df = df.drop(columns=[PARTITION_COLUMN], errors='ignore')
+            inserted, _ = insert_or_ignore(db_engine, table_name, df)
+            inserted_per_table[table_name] = inserted_per_table.get(table_name, 0) + inserted
+        if table_name in inserted_per_table:
+            print(f"Rebuilt {table_name}: {inserted_per_table[table_name]} rows inserted")
+    return inserted_per_table
@@ -1,5 +1,6 @@
-import os
 from sqlalchemy import create_engine, text
+from database_utils import create_table_stats, create_conversations, create_search_index, create_serving_indexes
+from migrations import migrate
 
 db_path = "my_database.db"
 
@@ -13,37 +14,37 @@ create_locations_sql = """
 
 create_keylogs_sql = """
     CREATE TABLE IF NOT EXISTS keylogs (
-        application TEXT,
+        application_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         text TEXT,
         package_id TEXT,
-        UNIQUE(application, time, text)
+        UNIQUE(application_id, time, text)
     );
 """
 
 create_sms_messages_sql = """
     CREATE TABLE IF NOT EXISTS sms_messages (
-        sms_type TEXT,
+        sms_type_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         from_to TEXT,
         text TEXT,
         location_id INTEGER,
         contact_id INTEGER,
-        UNIQUE(sms_type, time, from_to, text)
+        UNIQUE(sms_type_id, time, from_to, text)
     );
 """
 
 create_chat_messages_sql = """
      CREATE TABLE IF NOT EXISTS chat_messages (
-        messenger TEXT,
+        messenger_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         sender TEXT,
         text TEXT,
         contact_id INTEGER,
-        UNIQUE(messenger, time, sender, text)
+        UNIQUE(messenger_id, time, sender, text)
     );
 """
 
@@ -54,21 +55,21 @@ create_contacts_sql = """
         phone_number TEXT,
         email_id TEXT,
         last_contacted TEXT,
-        last_contacted_dt DATETIME,
+        last_contacted_dt INTEGER,
         UNIQUE(name, phone_number, email_id)
     );
 """
 
 create_calls_sql = """
     CREATE TABLE IF NOT EXISTS calls (
-        call_type TEXT,
+        call_type_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         from_to TEXT,
         duration INTEGER,
         location_id INTEGER,
         contact_id INTEGER,
-         UNIQUE(call_type, time, from_to)
+         UNIQUE(call_type_id, time, from_to)
     );
 """
 
@@ -100,6 +101,12 @@ def create_database(db_path):
             for table_name, create_sql in table_creation_mapping.items():
                 conn.execute(text(create_sql))
                 print(f"Table '{table_name}' created successfully.")
+        # Indexes the web app's queries are checked against (see query_plans.py)
+        create_serving_indexes(engine)
+        create_table_stats(engine)
+        create_conversations(engine)
+        create_search_index(engine)
+        migrate(db_path)
         print("Database and tables created successfully.")
     except Exception as e:
         print(f"Error creating database or tables: {e}")
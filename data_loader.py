@@ -1,17 +1,20 @@
-import os
+import time
 import pandas as pd
-from datetime import datetime
-from database_utils import create_database_engine, get_or_create_record
+from itertools import chain, islice
+from openpyxl import load_workbook
+from database_utils import insert_or_ignore
+from cleaned_output import get_output_writer
+from schema_registry import get_schema_registry
+from instrumentation import StageTimer, log_stage_timings, profile_import
 from transforms import KeylogTransform, SmsMessageTransform, ChatMessageTransform, ContactTransform, CallTransform, InstalledAppTransform, LocationTransform
 import logging
-from sqlalchemy.exc import IntegrityError
 
 table_mapping = {
     "keylogs": ["application", "time", "text"],
-    "sms_messages": ["sms_type", "time", "from_to", "text", "location"],
+    "sms_messages": ["sms_type", "time", "from_to", "text", "location_text"],
     "chat_messages": ["messenger", "time", "sender", "text"],
     "contacts": ["name", "phone_number", "email_id", "last_contacted"],
-    "calls": ["call_type", "time", "from_to", "duration_(sec)", "location"],
+    "calls": ["call_type", "time", "from_to", "duration", "location_text"],
     "installedapps": ["application_name", "package_name", "installed_date"],
     "locations": ["location_text"]
 }
@@ -25,98 +28,207 @@ transform_mapping = {
     "installedapps": InstalledAppTransform,
     "locations": LocationTransform
 }
-def _read_file(file_path):
-    """Reads the data from the file, handling both excel and csv files"""
-    df = None
-    if file_path.lower().endswith(('.xls', '.xlsx')):
-      print(f"Loading data as excel: {file_path}")
-      try:
-          df = pd.read_excel(file_path)
-          # Remove the first row if it has only one column
-          if df.shape[1] == 1:
-              df = df.iloc[1:]
-          # Reset the column headers after removing the meta row
-          if not df.empty:
-              df.columns = df.iloc[0]
-              df = df[1:]
-      except Exception as e:
-          print(f"Error loading as excel: {e}")
-          raise
+# Header signatures of every table, compiled once and shared with data_processor
+schema_registry = get_schema_registry(table_mapping)
+# Rows per chunk yielded by the streaming readers
+STREAM_CHUNK_SIZE = 5000
+# Number of leading rows inspected when looking for the metadata banner
+BANNER_SCAN_ROWS = 5
+
+def _detect_header_row(rows):
+    """Returns the index of the header row among the first rows of a sheet, skipping the export banner"""
+    header_index, _ = schema_registry.find_header_row(rows)
+    return header_index
+
+def _iter_xlsx_chunks(file_path, chunk_size):
+    """Streams an xlsx workbook in DataFrame chunks using openpyxl read-only mode"""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        head = list(islice(rows, BANNER_SCAN_ROWS))
+        if not head:
+            return
+        header_index = _detect_header_row(head)
+        header = [str(value).strip() if value is not None else f"Unnamed: {i}" for i, value in enumerate(head[header_index])]
+        width = len(header)
+        chunk = []
+        for row in chain(head[header_index + 1:], rows):
+            if all(value is None for value in row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+def _iter_xls_chunks(file_path, chunk_size):
+    """Reads a legacy xls workbook (not supported by openpyxl) and yields it in chunks"""
+    df = pd.read_excel(file_path, header=None)
+    header_index = _detect_header_row(df.head(BANNER_SCAN_ROWS).itertuples(index=False))
+    df.columns = [str(col).strip() for col in df.iloc[header_index]]
+    df = df.iloc[header_index + 1:].dropna(how='all')
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+def iter_file_chunks(file_path, chunk_size=STREAM_CHUNK_SIZE):
+    """Yields the data rows of an excel or csv file as DataFrame chunks with the header applied.
+
+    The file is parsed once and memory stays bounded by chunk_size for xlsx and csv files.
+    """
+    file_path = str(file_path)
+    lower_path = file_path.lower()
+    if lower_path.endswith('.xlsx'):
+        print(f"Streaming data as excel: {file_path}")
+        yield from _iter_xlsx_chunks(file_path, chunk_size)
+    elif lower_path.endswith('.xls'):
+        print(f"Loading data as excel: {file_path}")
+        yield from _iter_xls_chunks(file_path, chunk_size)
     else:
-      try:
-        df = pd.read_csv(file_path)
-      except Exception as e:
-          print(f"Error loading csv: {e}")
-          raise
-    return df
-
-def _identify_table(df, table_mapping):
-    """Identifies which table the dataframe should be loaded into"""
-    for table_name, expected_columns in table_mapping.items():
-        if df is not None and all(col.lower().replace(' ', '_') in [expected_col.lower().replace(' ', '_') for expected_col in expected_columns] for col in df.columns):
-
-            # Check if all expected columns are present after normalization
-            normalized_expected_columns = [col.lower().replace(' ', '_') for col in expected_columns]
-            normalized_df_columns = [col.lower().replace(' ', '_') for col in df.columns]
-            if all(col in normalized_df_columns for col in normalized_expected_columns):
-                return table_name
-            else:
-               missing_cols = [col for col in normalized_expected_columns if col not in normalized_df_columns]
-               print(f"Error: Not all expected columns present in {table_name}. Missing columns: {missing_cols} for columns: {list(df.columns)}")
-    return None
-def load_and_clean_data(file_path, db_engine, table_mapping, transform_mapping):
-    """Loads data from a CSV-like file, performs basic cleaning, and inserts into the appropriate table based on column names
-    Args:
-        file_path (str): The path to the CSV file.
-        db_engine (sqlalchemy.engine.Engine): The SQLAlchemy database engine.
-    Returns:
-    None: The function insert data into the database.
+        yield from pd.read_csv(file_path, chunksize=chunk_size)
+
+def new_import_progress():
+    """Returns the counters load_and_clean_data updates while it imports a file"""
+    return {
+        "table_name": None,
+        "rows_read": 0,
+        "rows_transformed": 0,
+        "rows_inserted": 0,
+        "rows_rejected": 0,
+        "schema_match": None,
+        "stage_timings": {},
+        "error": None
+    }
+
+def _import_failed(progress, message):
+    print(message)
+    progress["error"] = message
+    return progress
+
+def iter_transformed_chunks(file_path, table_mapping, transform_mapping, progress=None, db_engine=None):
+    """Parse and transform stage of an import: yields (table_name, DataFrame) chunks ready to insert.
+
+    Does not write to the database, so it can run in a worker process.
+    Raises:
+        ValueError: If the file is empty or its target table cannot be identified.
     """
-    try:
-        df = _read_file(file_path)
-    except Exception as e:
-        print(f"Error reading file: {file_path}, {e}")
-        return
+    if progress is None:
+        progress = new_import_progress()
+    timer = StageTimer(progress["stage_timings"])
+    chunks = timer.iter_span("read", iter_file_chunks(file_path))
+    df = next(chunks, None)
+    if df is None:
+        raise ValueError(f"No data found in file: {file_path}")
 
-    table_name = _identify_table(df, table_mapping)
-    if not table_name:
-         print(f"Error: Could not identify target table for columns: {list(df.columns)}")
-         return
+    with timer.span("identify"):
+        match = get_schema_registry(table_mapping).match(df.columns)
+    if match is None:
+        raise ValueError(f"Could not identify target table for columns: {list(df.columns)}")
+    table_name = match.table_name
+    progress["schema_match"] = match.to_dict()
+    logging.info(f"Identified {file_path} as {table_name}: {progress['schema_match']}")
 
     transform_class = transform_mapping.get(table_name)
     if not transform_class:
-        print(f"Error: No transform defined for table: {table_name}")
-        return
+        raise ValueError(f"No transform defined for table: {table_name}")
+
+    transform_instance = transform_class(db_engine, timer)
+    progress["table_name"] = table_name
+
+    is_first_chunk = True
+    for df in chain([df], chunks):
+        progress["rows_read"] += len(df)
+        with timer.span("clean_columns", len(df)):
+            if match.renames:
+                df = df.rename(columns=match.renames)
+            df = transform_instance.clean_columns(df)
+        if is_first_chunk:
+            skipped = min(transform_instance.skip_rows, len(df))
+            df = df.iloc[skipped:]
+            progress["rows_rejected"] += skipped
+        with timer.span("transform", len(df)):
+            df = transform_instance.transform(df)
+        progress["rows_transformed"] += len(df)
+        is_first_chunk = False
+        yield table_name, df
+
+def transform_file(file_path, table_mapping, transform_mapping):
+    """Runs the parse and transform stage for a whole file, e.g. in a ProcessPoolExecutor worker.
+
+    Returns:
+        tuple: (list of (table_name, DataFrame) chunks, progress counters).
+    """
+    progress = new_import_progress()
+    chunks = list(iter_transformed_chunks(file_path, table_mapping, transform_mapping, progress))
+    return chunks, progress
 
-    transform_instance = transform_class(db_engine)
-    df = transform_instance.clean_columns(df)
-    print(f"Loading data into table: {table_name}")
-    df = transform_instance.transform(df)
+def write_transformed_chunks(db_engine, file_path, chunks, progress, write_lock=None, output_format=None):
+    """Write stage of an import: inserts transformed chunks and saves the cleaned output next to the file
+    output_format selects the cleaned-output writer ("csv" or "parquet", see cleaned_output.OUTPUT_WRITERS)"""
+    writer = None
+    duplicates_skipped = 0
+    timer = StageTimer(progress.setdefault("stage_timings", {}))
+    for table_name, df in chunks:
+        if writer is None:
+            print(f"Loading data into table: {table_name}")
+            writer = get_output_writer(file_path, output_format)
 
+        # Insert data into the database; duplicates (in the file or already imported) are skipped by the database
+        try:
+            if write_lock is not None:
+                with timer.span("write_lock_wait"):
+                    write_lock.acquire()
+            try:
+                with timer.span("insert", len(df)):
+                    inserted, skipped = insert_or_ignore(db_engine, table_name, df)
+            finally:
+                if write_lock is not None:
+                    write_lock.release()
+            progress["rows_inserted"] += inserted
+            progress["rows_rejected"] += skipped
+            duplicates_skipped += skipped
+        except Exception as e:
+              progress["rows_rejected"] += len(df)
+              print(f"Error when loading data into table: {table_name}: {e}")
 
-    # Detect and Remove Duplicates
-    original_length = len(df)
-    df = df.drop_duplicates()
-    duplicates_removed = original_length - len(df)
-    if duplicates_removed > 0:
-         print(f"Removed {duplicates_removed} duplicate rows from {table_name}")
+        with timer.span("cleaned_output", len(df)):
+            writer.write(table_name, df)
 
-    # Insert data into the database
+    if writer is not None:
+        writer.close()
+    if duplicates_skipped > 0:
+         print(f"Skipped {duplicates_skipped} duplicate rows already in {progress['table_name']}")
+    print(f"Successfully loaded {progress['rows_inserted']} rows into {progress['table_name']}")
+    return progress
+
+def load_and_clean_data(file_path, db_engine, table_mapping, transform_mapping, progress=None, write_lock=None,
+                        output_format=None):
+    """Loads data from a CSV-like file, performs basic cleaning, and inserts into the appropriate table based on column names
+    Args:
+        file_path (str): The path to the CSV file.
+        db_engine (sqlalchemy.engine.Engine): The SQLAlchemy database engine.
+        progress (dict): Counters from new_import_progress(), updated as chunks are processed so
+            another thread can report on the import.
+        write_lock (threading.Lock): Held around each database write so concurrent imports write one at a time.
+        output_format (str): Cleaned-output format, "csv" or "parquet"; defaults to CLEANED_OUTPUT_FORMAT.
+    Returns:
+    dict: The progress counters; "error" is set if the file could not be imported.
+    """
+    if progress is None:
+        progress = new_import_progress()
+    start = time.perf_counter()
     try:
-        df.to_sql(table_name, db_engine, if_exists='append', index=False)
-        print(f"Successfully loaded data into {table_name}")
-    except IntegrityError as e:
-         print(f"Integrity error when loading data into {table_name}: {e}")
-         print(f"Continuing to load other files")
+        with profile_import(file_path):
+            chunks = iter_transformed_chunks(file_path, table_mapping, transform_mapping, progress, db_engine)
+            return write_transformed_chunks(db_engine, file_path, chunks, progress, write_lock, output_format)
+    except ValueError as e:
+        return _import_failed(progress, f"Error: {e}")
     except Exception as e:
-          print(f"Error when loading data into table: {table_name}: {e}")
-
-    #Save the file name
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_dir = os.path.join(os.path.dirname(file_path), "cleaned_output")
-    if not os.path.exists(output_dir):
-       os.makedirs(output_dir)
-    filename = os.path.basename(file_path)
-    base_name, _ = os.path.splitext(filename)
-    output_file = os.path.join(output_dir, f"{base_name}_cleaned_{timestamp}.csv")
-    df.to_csv(output_file, index=False)
\ No newline at end of file
+        return _import_failed(progress, f"Error reading file: {file_path}, {e}")
+    finally:
+        log_stage_timings(file_path, progress["table_name"], progress["stage_timings"],
+                          duration_sec=round(time.perf_counter() - start, 6), rows_read=progress["rows_read"],
+                          rows_inserted=progress["rows_inserted"], error=progress["error"])
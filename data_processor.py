@@ -1,105 +1,68 @@
-# repldb/data_processor.py
 import pandas as pd
 import logging
+import sqlite3
+import time
 from datetime import datetime
 import pytz
 from dateutil.parser import parse
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from pathlib import Path
-from repldb.db_utils import create_connection, execute_query, close_connection, fetch_data
-from repldb.data_loader import load_data_from_excel_text, convert_duration_to_seconds
-
-DATABASE_FILE = "repldb.db"
+from itertools import chain
+from database_utils import (IdCache, COUNTED_TABLES, table_stats_sql, conversations_sql,
+                            rebuild_conversations_sql, search_index_sql, rebuild_search_index_sql,
+                            ENGINE_PRESETS, apply_sqlite_pragmas, epoch_ms_series, create_id_caches,
+                            preload_id_caches, encode_dimension_columns, create_connection, execute_query, fetch_data)
+from transforms import parse_datetime_series, parse_duration
+from instrumentation import StageTimer, log_stage_timings, profile_import
+from migrations import migrate
+from data_loader import iter_file_chunks, STREAM_CHUNK_SIZE, schema_registry
+
+# The database main.py and the web app use
+DATABASE_FILE = "my_database.db"
 BATCH_SIZE = 100
 
 TABLE_SCHEMAS = {
     "contacts": {
         "columns": ["contact_id", "name", "phone_number", "email_id", "last_contacted", "last_contacted_dt"],
-        "types": [int, str, str, str, str, datetime],
-        "renames": {"email": "email_id", "last contacted": "last_contacted"}
+        "types": [int, str, str, str, str, datetime]
     },
     "installedapps": {
         "columns": ["application_name", "package_name", "installed_date"],
-        "types": [str, str, datetime],
-        "renames": {}
+        "types": [str, str, datetime]
     },
     "calls": {
-        "columns": ["call_type", "time", "from_to", "duration", "location_id", "contact_id", "time_dt"],
-        "types": [str, str, str, int, int, int, datetime],
-        "renames": {"time": "time", "from/to": "from_to", "duration (sec)": "duration", "location": "location_text"}
+        "columns": ["call_type", "time", "from_to", "duration", "location_text", "location_id", "contact_id", "time_dt"],
+        "types": [str, str, str, int, str, int, int, datetime]
     },
     "sms_messages": {
-        "columns": ["sms_type", "time", "from_to", "text", "location_id", "contact_id", "time_dt"],
-        "types": [str, str, str, str, int, int, datetime],
-        "renames": {"location": "location_text"}
+        "columns": ["sms_type", "time", "from_to", "text", "location_text", "location_id", "contact_id", "time_dt"],
+        "types": [str, str, str, str, str, int, int, datetime]
     },
     "chat_messages": {
         "columns": ["messenger", "time", "sender", "text", "contact_id", "time_dt"],
-        "types": [str, str, str, str, int, datetime],
-        "renames": {}
+        "types": [str, str, str, str, int, datetime]
     },
     "keylogs": {
         "columns": ["application", "time", "text", "package_id", "time_dt"],
-        "types": [str, str, str, str, datetime],
-        "renames": {}
+        "types": [str, str, str, str, datetime]
     },
      "locations": {
         "columns": ["location_id", "location_text"],
-        "types": [int, str],
-        "renames": {}
+        "types": [int, str]
     }
 }
 
+# Epoch-millisecond columns and the raw text column each is parsed from
+EPOCH_MS_SOURCES = {"time_dt": "time", "last_contacted_dt": "last_contacted"}
+
 
 def normalize_column_name(col: str) -> str:
     """Normalize column name for comparison"""
     return str(col).lower().strip().replace(' ', '_')
 
 def identify_table(df: pd.DataFrame) -> Optional[str]:
-    """Identifies the table based on the file's headers with flexible matching."""
-    # Drop any unnamed columns first
-    df = df.loc[:, ~df.columns.str.contains('^Unnamed:', na=False)]
-
-    # Convert all headers to normalized form for comparison
-    file_headers = {normalize_column_name(col) for col in df.columns if pd.notna(col)}
-    logging.info(f"Found headers in file (after cleaning): {list(df.columns)}")
-    logging.info(f"Normalized headers: {list(file_headers)}")
-
-    # Early return if no valid headers
-    if not file_headers:
-        logging.error("No valid headers found in the file")
-        return None
-
-    for table, schema in TABLE_SCHEMAS.items():
-        schema_headers = {normalize_column_name(col) for col in schema["columns"]}
-        rename_headers = {normalize_column_name(col) for col in schema["renames"].keys()}
-
-        logging.info(f"Checking table {table}")
-        logging.info(f"Schema headers: {schema_headers}")
-        logging.info(f"Rename headers: {rename_headers}")
-
-        # Special handling for Keylog tables with more flexible matching
-        if table in ['KeylogImport', 'Keylogs']:
-            required_keylog_headers = {'application', 'time', 'text'}
-            normalized_required = {normalize_column_name(h) for h in required_keylog_headers}
-
-            # Check if required headers are present (allowing for partial matches)
-            if any(any(req in header for header in file_headers) for req in normalized_required):
-                logging.info(f"Matched {table} table based on required keylog headers")
-                return table
-
-        # For other tables, use a more lenient matching approach
-        schema_match_ratio = len(schema_headers.intersection(file_headers)) / len(schema_headers)
-        rename_match_ratio = len(rename_headers.intersection(file_headers)) / len(rename_headers)
-
-        # Lower the threshold to 60% for more flexible matching
-        if schema_match_ratio >= 0.6 or rename_match_ratio >= 0.6:
-            logging.info(f"Matched {table} table with match ratio: {max(schema_match_ratio, rename_match_ratio):.2f}")
-            return table
-
-    logging.error("No matching table schema found")
-    logging.error(f"Available headers: {list(df.columns)}")
-    return None
+    """Identifies the table based on the file's headers, using the registry shared with data_loader."""
+    return schema_registry.identify(df.columns)
 
 def init_db():
     """Initializes the SQLite database and creates tables if they don't exist."""
@@ -110,7 +73,7 @@ def init_db():
         phone_number TEXT,
         email_id TEXT,
         last_contacted TEXT,
-        last_contacted_dt DATETIME,
+        last_contacted_dt INTEGER,
         UNIQUE(name, phone_number, email_id)
     );
 
@@ -123,47 +86,47 @@ def init_db():
 
     CREATE TABLE IF NOT EXISTS Calls (
         call_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        call_type TEXT NOT NULL,
+        call_type_id INTEGER NOT NULL,
         time TEXT NOT NULL,
-        time_dt DATETIME,
+        time_dt INTEGER,
         from_to TEXT,
         duration INTEGER DEFAULT 0,
         location_id INTEGER,
         contact_id INTEGER,
-         UNIQUE(call_type, time, from_to)
+         UNIQUE(call_type_id, time, from_to)
     );
 
     CREATE TABLE IF NOT EXISTS SMS_Messages (
         sms_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        sms_type TEXT NOT NULL,
+        sms_type_id INTEGER NOT NULL,
         time TEXT NOT NULL,
-        time_dt DATETIME,
+        time_dt INTEGER,
         from_to TEXT,
         text TEXT,
         location_id INTEGER,
         contact_id INTEGER,
-        UNIQUE(sms_type, time, from_to, text)
+        UNIQUE(sms_type_id, time, from_to, text)
     );
 
     CREATE TABLE IF NOT EXISTS Chat_Messages (
         message_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        messenger TEXT NOT NULL,
+        messenger_id INTEGER NOT NULL,
         time TEXT NOT NULL,
-        time_dt DATETIME,
+        time_dt INTEGER,
         sender TEXT,
         text TEXT,
         contact_id INTEGER,
-        UNIQUE(messenger, time, sender, text)
+        UNIQUE(messenger_id, time, sender, text)
     );
 
     CREATE TABLE IF NOT EXISTS Keylogs (
         keylog_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        application TEXT NOT NULL,
+        application_id INTEGER NOT NULL,
         time TEXT NOT NULL,
-        time_dt DATETIME,
+        time_dt INTEGER,
         text TEXT,
         package_id TEXT,
-        UNIQUE(application, time, text)
+        UNIQUE(application_id, time, text)
     );
 
     CREATE TABLE IF NOT EXISTS Locations (
@@ -173,10 +136,20 @@ def init_db():
     """
     with sqlite3.connect(DATABASE_FILE) as conn:
         conn.executescript(schema)
-        logging.info("Database initialized successfully")
-
-def parse_timestamp_flexible(date_str: str, timezone: str = "UTC") -> Optional[datetime]:
-    """Parse timestamp with flexible format handling"""
+        conn.executescript("".join(table_stats_sql() + conversations_sql() + rebuild_conversations_sql()
+                                   + search_index_sql() + rebuild_search_index_sql()))
+        conn.execute(
+            "INSERT OR IGNORE INTO table_stats (table_name, row_count) "
+            + " UNION ALL ".join(f"SELECT '{name}', count(*) FROM {name}" for name in COUNTED_TABLES)
+        )
+    migrate(DATABASE_FILE)
+    logging.info("Database initialized successfully")
+
+def parse_timestamp_flexible(date_str: str, timezone: Optional[str] = "UTC") -> Optional[datetime]:
+    """Parse timestamp with flexible format handling
+
+    Pass timezone=None to leave naive results unlocalized.
+    """
     if pd.isna(date_str) or not date_str:
         return None
 
@@ -220,7 +193,7 @@ def parse_timestamp_flexible(date_str: str, timezone: str = "UTC") -> Optional[d
                     raise ValueError(f"Could not parse date string: {date_str}")
 
             # Set timezone if not present
-            if dt.tzinfo is None:
+            if dt.tzinfo is None and timezone:
                 dt = pytz.timezone(timezone).localize(dt)
             return dt
 
@@ -229,8 +202,17 @@ def parse_timestamp_flexible(date_str: str, timezone: str = "UTC") -> Optional[d
         logging.error(f"Failed to parse timestamp '{date_str}': {e}")
         return None
 
-def validate_data(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
-    """Validates and cleans data according to schema"""
+def _parse_timestamp_fallback(date_str: Any) -> Optional[datetime]:
+    """Per-value fallback for parse_datetime_series; localization is done for the whole column"""
+    return parse_timestamp_flexible(date_str, timezone=None)
+
+def validate_data(df: pd.DataFrame, table_name: str, format_cache: Optional[Dict[str, str]] = None,
+                  timezone: str = "UTC") -> pd.DataFrame:
+    """Validates and cleans data according to schema
+
+    format_cache holds the timestamp format detected per column; pass the same
+    dict for every chunk of a file so the format is only inferred once.
+    """
     schema = TABLE_SCHEMAS.get(table_name)
     if not schema:
         raise ValueError(f"Schema not found for table: {table_name}")
@@ -261,12 +243,16 @@ def validate_data(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
             try:
                 if dtype == datetime:
                     # Convert to datetime and handle invalid values
-                    df[col] = df[col].apply(parse_timestamp_flexible)
+                    df[col] = parse_datetime_series(df[col], format_cache, col,
+                                                    fallback=_parse_timestamp_fallback, timezone=timezone)
                     # Drop rows where required datetime fields are null
                     if col in ['time', 'last_contacted', 'install_date']:
                         df = df.dropna(subset=[col])
                         logging.info(f"Dropped {len(df)} rows with null {col}")
                 elif dtype == int:
+                    if col == "duration":
+                        # Export text such as "1 Min & 7 Sec", parsed as data_loader's CallTransform does
+                        df[col] = df[col].map(parse_duration)
                     df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
                 else:
                     # Handle text fields, replace NaN with empty string for optional text fields
@@ -280,114 +266,145 @@ def validate_data(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
                 logging.error(f"Error converting column {col}: {e}")
                 raise ValueError(f"Failed to process column {col}: {e}")
 
+    # Timestamps are stored as integer epoch milliseconds, next to the raw text they were parsed from
+    for target, source in EPOCH_MS_SOURCES.items():
+        if target in df.columns:
+            df[target] = epoch_ms_series(df[target])
+        elif target in schema["columns"] and source in df.columns:
+            df[target] = epoch_ms_series(parse_datetime_series(df[source], format_cache, source,
+                                                               fallback=_parse_timestamp_fallback, timezone=timezone))
+
+    # Other parsed timestamps (installed_date) are stored as text, which sqlite3 can bind
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S.%f').astype(object).where(df[col].notna(), None)
+
     return df
 
-def process_and_insert_data(file_path: Path) -> Dict[str, Any]:
-    """Process and import data with statistics tracking"""
+def process_and_insert_data(file_path: Path, id_caches: Optional[Dict[str, IdCache]] = None,
+                            db_path: str = DATABASE_FILE) -> Dict[str, Any]:
+    """Process and import data into the database at db_path with statistics tracking
+
+    Pass the same id_caches (see create_id_caches) for every file of a run to
+    share contact/location lookups between files.
+    """
     stats = {
         "total_rows": 0,
         "processed_rows": 0,
         "failed_rows": 0,
-        "table_name": None
+        "skipped_rows": 0,
+        "table_name": None,
+        "stage_timings": {}
     }
+    timer = StageTimer(stats["stage_timings"])
+    start = time.perf_counter()
 
     try:
-        logging.info(f"Processing file: {file_path}")
+        with profile_import(file_path):
+            logging.info(f"Processing file: {file_path}")
+
+            # Stream the file in chunks; the metadata banner row is detected by the reader
+            chunks = timer.iter_span("read", iter_file_chunks(file_path, STREAM_CHUNK_SIZE))
+            df = next(chunks, None)
+            if df is None:
+                raise ValueError("No data found in the file.")
+            logging.info(f"Successfully read headers: {list(df.columns)}")
+
+            # Identify table
+            with timer.span("identify"):
+                match = schema_registry.match(df.columns)
+            if match is None:
+                logging.error(f"No matching table schema found for headers: {list(df.columns)}")
+                raise ValueError("Could not identify table schema. Please check the file headers.")
+            table_name = match.table_name
+            logging.info(f"Matched {table_name} table: {match.to_dict()}")
+
+            stats["table_name"] = table_name
+            stats["schema_match"] = match.to_dict()
+
+            # Insert data
+            if id_caches is None:
+                id_caches = create_id_caches()
+            # Timestamp formats detected in this file, shared by all of its chunks
+            format_cache = {}
+            with create_connection(db_path) as conn:
+                apply_sqlite_pragmas(conn, ENGINE_PRESETS["bulk_import"]["pragmas"])
+                preload_id_caches(conn, id_caches)
+                for df in chain([df], chunks):
+                    stats["total_rows"] += len(df)
+                    if match.renames:
+                        df = df.rename(columns=match.renames)
+
+                    # Process data
+                    with timer.span("validate", len(df)):
+                        df = validate_data(df, table_name, format_cache)
+
+                    for i in range(0, len(df), BATCH_SIZE):
+                        batch = df.iloc[i:i + BATCH_SIZE]
+                        # Convert pandas DataFrame to list of dictionaries
+                        with timer.span("to_records", len(batch)):
+                            records = batch.to_dict(orient='records')
+                        processed, failed, skipped = insert_batch(conn, table_name, records, id_caches, timer)
+                        stats["processed_rows"] += processed
+                        stats["failed_rows"] += failed
+                        stats["skipped_rows"] += skipped
+
+            stats["id_cache"] = {name: cache.stats() for name, cache in id_caches.items()}
+            logging.info(f"Id cache stats: {stats['id_cache']}")
 
-        # Read the file
-        if file_path.suffix.lower() == '.csv':
-            df = pd.read_csv(file_path)
-            logging.info("Successfully read CSV file")
-        else:
-            # First attempt to read without skipping rows
-            try:
-                df = pd.read_excel(file_path, engine='openpyxl')
-                # Check if first row contains metadata about tracking
-                if any(col.lower().startswith('tracking smartphone') for col in df.columns.astype(str)):
-                    logging.info("Detected metadata row, reading file again with header row 1")
-                    df = pd.read_excel(file_path, engine='openpyxl', header=1)
-                logging.info(f"Successfully read Excel file with headers: {list(df.columns)}")
-            except Exception as e:
-                logging.warning(f"Failed to read with openpyxl: {e}")
-                try:
-                    df = pd.read_excel(file_path, engine='xlrd')
-                    if any(col.lower().startswith('tracking smartphone') for col in df.columns.astype(str)):
-                        df = pd.read_excel(file_path, engine='xlrd', header=1)
-                    logging.info(f"Successfully read Excel file with xlrd engine")
-                except Exception as e:
-                    logging.error(f"Failed to read Excel file with both engines: {e}")
-                    raise
-
-        stats["total_rows"] = len(df)
-
-        # Identify table
-        table_name = identify_table(df)
-        if not table_name:
-            raise ValueError("Could not identify table schema. Please check the file headers.")
-
-        stats["table_name"] = table_name
-
-        # Process data
-        df = validate_data(df, table_name)
-
-        # Insert data
-        with create_connection(DATABASE_FILE) as conn:
-            for i in range(0, len(df), BATCH_SIZE):
-                batch = df.iloc[i:i + BATCH_SIZE]
-                # Convert pandas DataFrame to list of dictionaries
-                records = batch.to_dict(orient='records')
-                for record in records:
-                    if table_name == "calls":
-                        location_text = record.pop("location_text", None)
-                        contact_name = record.pop("from_to", None)
-                        
-                        location_id = None
-                        if location_text:
-                            location_id = fetch_or_create_location(conn, location_text)
-                        record["location_id"] = location_id
-
-                        contact_id = None
-                        if contact_name:
-                            contact_id = fetch_or_create_contact(conn, contact_name)
-                        record["contact_id"] = contact_id
-                    elif table_name == "sms_messages":
-                        location_text = record.pop("location_text", None)
-                        contact_name = record.pop("from_to", None)
-
-                        location_id = None
-                        if location_text:
-                            location_id = fetch_or_create_location(conn, location_text)
-                        record["location_id"] = location_id
-
-                        contact_id = None
-                        if contact_name:
-                            contact_id = fetch_or_create_contact(conn, contact_name)
-                        record["contact_id"] = contact_id
-                    elif table_name == "chat_messages":
-                        contact_name = record.pop("sender", None)
-                        contact_id = None
-                        if contact_name:
-                            contact_id = fetch_or_create_contact(conn, contact_name)
-                        record["contact_id"] = contact_id
-                    
-                    record["time_dt"] = record.pop("time", None)
-                    
-                    # Insert the record
-                    placeholders = ', '.join('?' for _ in record.values())
-                    columns = ', '.join(record.keys())
-                    query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
-                    cursor = execute_query(conn, query, list(record.values()))
-                    if not cursor:
-                        stats["failed_rows"] += 1
-                    else:
-                        stats["processed_rows"] += 1
-            
         return stats
 
     except Exception as e:
-        stats["failed_rows"] = stats["total_rows"] - stats["processed_rows"]
+        stats["failed_rows"] = stats["total_rows"] - stats["processed_rows"] - stats["skipped_rows"]
         logging.error(f"Error processing file: {e}")
         raise
+    finally:
+        log_stage_timings(file_path, stats["table_name"], stats["stage_timings"],
+                          duration_sec=round(time.perf_counter() - start, 6), rows_read=stats["total_rows"],
+                          rows_inserted=stats["processed_rows"])
+
+def insert_batch(conn: sqlite3.Connection, table_name: str, records: List[Dict[str, Any]],
+                 id_caches: Optional[Dict[str, IdCache]] = None,
+                 timer: Optional[StageTimer] = None) -> Tuple[int, int, int]:
+    """Resolves dimension IDs for a batch in bulk and inserts the fact rows with one executemany.
+
+    If a StageTimer is given, the dimension lookups and the insert are timed as separate stages.
+
+    Returns:
+        tuple: (processed_rows, failed_rows, skipped_rows) for the batch; skipped rows were already in the table.
+    """
+    if not records:
+        return 0, 0, 0
+
+    timer = timer or StageTimer()
+    with timer.span("dimension_lookup", len(records)):
+        # Same contact/location/lookup id resolution as data_loader's insert_or_ignore
+        encode_dimension_columns(conn, table_name, records, id_caches)
+        # Committed before the fact insert, whose rollback must not undo rows the id caches now point at
+        conn.commit()
+
+    columns = list(records[0].keys())
+    placeholders = ', '.join('?' for _ in columns)
+    # Rows already present (same UNIQUE key) are skipped, so overlapping exports only add new rows
+    query = f"INSERT OR IGNORE INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+    rows = [[record.get(col) for col in columns] for record in records]
+    try:
+        with timer.span("insert", len(rows)), conn:
+            inserted = conn.executemany(query, rows).rowcount
+        return inserted, 0, len(rows) - inserted
+    except sqlite3.Error as e:
+        # Fall back to row-by-row so one bad row does not fail the whole batch
+        logging.warning(f"Batch insert into {table_name} failed ({e}), retrying row by row")
+        processed = skipped = failed = 0
+        for row in rows:
+            cursor = execute_query(conn, query, row)
+            if not cursor:
+                failed += 1
+            elif cursor.rowcount:
+                processed += 1
+            else:
+                skipped += 1
+        return processed, failed, skipped
 
 def fetch_or_create_location(conn: sqlite3.Connection, location_text: str) -> int:
     """Fetches the location ID or creates a new location if it doesn't exist."""
@@ -1,11 +1,105 @@
 import os
-from sqlalchemy import create_engine, text, exc, select, insert, column
-import pandas as pd
+import json
+import hashlib
+import calendar
+import sqlite3
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, text, exc, select, insert, column, table
+from sqlalchemy.pool import QueuePool
 import logging
 
-def create_database_engine(db_path):
-    """Creates a database engine from the given database path."""
-    return create_engine(f"sqlite:///{db_path}")
+# Connection settings per workload. WAL lets /get_data readers run while one writer imports;
+# synchronous=NORMAL is crash-safe in WAL mode and avoids an fsync per commit.
+ENGINE_PRESETS = {
+    "serving": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -64000,  # KiB, i.e. 64 MB per connection
+            "mmap_size": 268435456,
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+        },
+        "pool_size": 5,
+        "max_overflow": 10,
+    },
+    "bulk_import": {
+        "pragmas": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -256000,
+            "mmap_size": 1073741824,
+            "temp_store": "MEMORY",
+            "busy_timeout": 30000,
+        },
+        # A single connection so all writes are serialized through one writer
+        "pool_size": 1,
+        "max_overflow": 0,
+    },
+}
+
+DEFAULT_ID_CACHE_SIZE = 50000
+
+# Tables whose row counts are kept in table_stats for O(1) pagination metadata
+COUNTED_TABLES = ["keylogs", "sms_messages", "chat_messages", "contacts", "calls", "installedapps", "locations"]
+
+# Timestamp columns stored as INTEGER milliseconds since the Unix epoch. Naive times are taken as UTC.
+EPOCH_MS_COLUMNS = ("time_dt", "last_contacted_dt", "last_time_dt")
+_EPOCH = datetime(1970, 1, 1)
+
+# Low-cardinality text columns stored as integer ids into small lookup tables:
+# table -> (text column, lookup table, id column). Reads go through the <table>_decoded views.
+DICTIONARY_COLUMNS = {
+    "keylogs": ("application", "applications", "application_id"),
+    "chat_messages": ("messenger", "messengers", "messenger_id"),
+    "sms_messages": ("sms_type", "sms_types", "sms_type_id"),
+    "calls": ("call_type", "call_types", "call_type_id"),
+}
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Runs PRAGMA statements on a raw sqlite3 connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def create_database_engine(db_path, preset="serving", pragmas=None, **engine_kwargs):
+    """Creates a database engine from the given database path.
+
+    Args:
+        db_path (str): Path to the SQLite database file.
+        preset (str): Connection tuning from ENGINE_PRESETS, "serving" or "bulk_import".
+        pragmas (dict): PRAGMA overrides applied on top of the preset's.
+        **engine_kwargs: Extra arguments for create_engine, e.g. pool_size.
+    Returns:
+        sqlalchemy.engine.Engine: A pooled engine whose connections have the pragmas applied.
+    """
+    if preset not in ENGINE_PRESETS:
+        raise ValueError(f"Unknown engine preset: {preset}")
+    settings = ENGINE_PRESETS[preset]
+    connection_pragmas = dict(settings["pragmas"], **(pragmas or {}))
+    options = {
+        "poolclass": QueuePool,
+        "pool_size": settings["pool_size"],
+        "max_overflow": settings["max_overflow"],
+        "pool_pre_ping": True,
+        # Pooled connections are handed between Flask worker threads
+        "connect_args": {"check_same_thread": False},
+    }
+    options.update(engine_kwargs)
+    engine = create_engine(f"sqlite:///{db_path}", **options)
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, connection_pragmas)
+
+    return engine
 
 
 def create_table(db_engine, table_name, create_sql):
@@ -32,25 +126,416 @@ def table_exists(db_engine, table_name):
          logging.error(f"Error checking if table '{table_name}' exists: {e}")
          raise
 
-def get_or_create_record(db_engine, table_name, column_name, record_text, id_column_name):
-    """Retrieves the id of a record or creates a new one if it does not exist."""
-    if pd.isna(record_text):
+@contextmanager
+def create_connection(db_path):
+    """Yields a DB-API sqlite3 connection to db_path, committed and closed when the block exits."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def execute_query(conn, query, params=()):
+    """Executes one statement on a DB-API connection; returns the cursor, or None if it failed (the error is logged)."""
+    try:
+        return conn.execute(query, params)
+    except sqlite3.Error as e:
+        logging.error(f"Error executing query: {e}")
         return None
+
+
+def fetch_data(conn, query, params=()):
+    """Returns the rows of a query on a DB-API connection as sqlite3.Row objects, readable by column name."""
+    cursor = conn.cursor()
+    cursor.row_factory = sqlite3.Row
+    return cursor.execute(query, params).fetchall()
+
+
+class IdCache:
+    """Bounded LRU map of dimension text (contact name, location text) to its row id.
+
+    One instance is shared across every file of an import run so repeated names
+    do not hit SQLite again. Hit and miss counts are kept for reporting.
+    """
+    def __init__(self, max_size=DEFAULT_ID_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.preloaded = False
+        self._ids = OrderedDict()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def get(self, key):
+        """Returns the cached id for key, or None on a miss."""
+        record_id = self._ids.get(key)
+        if record_id is None:
+            self.misses += 1
+            return None
+        self._ids.move_to_end(key)
+        self.hits += 1
+        return record_id
+
+    def put(self, key, record_id):
+        """Stores an id, evicting the least recently used entry when full."""
+        if key is None or record_id is None:
+            return
+        self._ids[key] = record_id
+        self._ids.move_to_end(key)
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+    def preload(self, rows):
+        """Fills the cache from (key, id) pairs, up to max_size entries."""
+        for key, record_id in rows:
+            if len(self._ids) >= self.max_size:
+                break
+            if key is not None and key not in self._ids:
+                self._ids[key] = record_id
+        self.preloaded = True
+
+    def stats(self):
+        """Returns the cache size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._ids),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+def load_id_cache(db_engine, table_name, column_name, id_column_name, max_size=DEFAULT_ID_CACHE_SIZE):
+    """Creates an IdCache preloaded with the existing rows of a dimension table."""
+    cache = IdCache(max_size)
     try:
         with db_engine.connect() as conn:
-            query = select(column(id_column_name)).where(column(column_name) == record_text).select_from(table_name)
+            result = conn.execute(text(
+                f"SELECT {column_name}, MIN({id_column_name}) FROM {table_name} "
+                f"WHERE {column_name} IS NOT NULL GROUP BY {column_name} LIMIT :limit"
+            ), {"limit": max_size})
+            cache.preload(result)
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error preloading id cache from table {table_name}: {e}")
+        raise
+    return cache
+
+
+def get_or_create_record(db_engine, table_name, column_name, record_text, id_column_name, cache=None):
+    """Retrieves the id of a record or creates a new one if it does not exist.
+
+    If an IdCache is given it is consulted first and updated with the result.
+    """
+    import pandas as pd
+    if pd.isna(record_text):
+        return None
+    if cache is not None:
+        record_id = cache.get(record_text)
+        if record_id is not None:
+            return record_id
+    try:
+        with db_engine.begin() as conn:
+            query = select(column(id_column_name)).where(column(column_name) == record_text).select_from(table(table_name))
             result = conn.execute(query).fetchone()
             if result:
-                return result[0]
+                record_id = result[0]
             else:
-                insert_query = insert(table(table_name)).values({column_name: record_text})
+                insert_query = insert(table(table_name, column(column_name))).values({column_name: record_text})
                 result = conn.execute(insert_query)
-                return result.lastrowid
+                record_id = result.lastrowid
+        if cache is not None:
+            cache.put(record_text, record_id)
+        return record_id
     except exc.SQLAlchemyError as e:
          logging.error(f"Error getting or creating record in table {table_name} column {column_name}: {e}")
          raise
 
 
+def lookup_tables_sql(table_names=DICTIONARY_COLUMNS):
+    """Returns the statements creating the lookup tables of the dictionary-encoded columns of table_names."""
+    statements = []
+    for table_name in table_names:
+        text_column, lookup_table, id_column = DICTIONARY_COLUMNS[table_name.lower()]
+        statements.append(f"""
+            CREATE TABLE IF NOT EXISTS {lookup_table} (
+                {id_column} INTEGER PRIMARY KEY,
+                {text_column} TEXT UNIQUE NOT NULL
+            );
+        """)
+    return statements
+
+
+def decoded_views_sql(table_names=DICTIONARY_COLUMNS):
+    """Returns the statements creating the <table>_decoded views, which join the lookup text back in by id."""
+    statements = []
+    for table_name in table_names:
+        text_column, lookup_table, id_column = DICTIONARY_COLUMNS[table_name.lower()]
+        statements.append(f"""
+            CREATE VIEW IF NOT EXISTS {table_name.lower()}_decoded AS
+            SELECT t.rowid AS rowid, t.*, d.{text_column} AS {text_column}
+            FROM {table_name} t LEFT JOIN {lookup_table} d ON d.{id_column} = t.{id_column};
+        """)
+    return statements
+
+
+def decoded_table_name(table_name):
+    """Name to read table_name through, so dictionary-encoded columns come back as text"""
+    return f"{table_name}_decoded" if table_name.lower() in DICTIONARY_COLUMNS else table_name
+
+
+def resolve_dictionary_ids(dbapi_connection, lookup_table, text_column, id_column, values, cache=None):
+    """Returns {text: id} for values, adding the ones lookup_table does not have yet.
+
+    Runs on a DB-API connection (sqlite3, or SQLAlchemy's conn.connection) so it
+    joins the caller's transaction. Values missing from the cache are resolved
+    with one INSERT OR IGNORE and one SELECT for the whole batch.
+    """
+    ids = {}
+    missing = []
+    for value in set(values):
+        if value is None or value != value:  # None or NaN
+            continue
+        record_id = cache.get(value) if cache is not None else None
+        if record_id is None:
+            missing.append(value)
+        else:
+            ids[value] = record_id
+    if not missing:
+        return ids
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.executemany(f"INSERT OR IGNORE INTO {lookup_table} ({text_column}) VALUES (?)", [(value,) for value in missing])
+        placeholders = ', '.join('?' for _ in missing)
+        cursor.execute(f"SELECT {text_column}, {id_column} FROM {lookup_table} WHERE {text_column} IN ({placeholders})",
+                       missing)
+        for value, record_id in cursor.fetchall():
+            ids[value] = record_id
+            if cache is not None:
+                cache.put(value, record_id)
+    finally:
+        cursor.close()
+    return ids
+
+
+def encode_dictionary_columns(dbapi_connection, table_name, records, cache=None):
+    """Replaces the dictionary-encoded text column of table_name with its lookup id in each record (in place)."""
+    encoding = DICTIONARY_COLUMNS.get(table_name.lower())
+    if encoding is None or not records or encoding[0] not in records[0]:
+        return
+    text_column, lookup_table, id_column = encoding
+    for record in records:
+        # The id is part of the table's UNIQUE key, where a NULL never collides: store '' instead
+        value = record[text_column]
+        if value is None or value != value:
+            record[text_column] = ''
+    ids = resolve_dictionary_ids(dbapi_connection, lookup_table, text_column, id_column,
+                                 (record[text_column] for record in records), cache)
+    for record in records:
+        record[id_column] = ids[record.pop(text_column)]
+
+
+# Text columns of each table's UNIQUE key. NULLs never collide, so missing values are stored
+# as '' (as data_processor.validate_data does) for re-imports to be skipped by INSERT OR IGNORE.
+UNIQUE_KEY_TEXT_COLUMNS = {
+    "keylogs": ("time", "text"),
+    "sms_messages": ("time", "from_to", "text"),
+    "chat_messages": ("time", "sender", "text"),
+    "contacts": ("name", "phone_number", "email_id"),
+    "calls": ("time", "from_to"),
+    "installedapps": ("application_name", "package_name"),
+}
+
+
+def fill_unique_key_text(table_name, records):
+    """Replaces missing values in the UNIQUE key text columns of table_name's records with '' (in place)."""
+    columns = [col for col in UNIQUE_KEY_TEXT_COLUMNS.get(table_name.lower(), ()) if records and col in records[0]]
+    for record in records:
+        for col in columns:
+            if record[col] is None:
+                record[col] = ''
+
+
+# Contact text column of each table, resolved to a contacts row id (contact_id). The text stays
+# in the row as well, since it is part of the table's UNIQUE key.
+CONTACT_COLUMNS = {"sms_messages": "from_to", "calls": "from_to", "chat_messages": "sender"}
+# Location text column of each table, stored as a locations row id (location_id) instead of the text
+LOCATION_COLUMNS = {"sms_messages": "location_text", "calls": "location_text"}
+
+
+def _distinct_text(records, column):
+    """Returns the distinct non-empty text values of column across records."""
+    values = {record.get(column) for record in records}
+    return [value for value in values if isinstance(value, str) and value]
+
+
+def resolve_contact_ids(dbapi_connection, names, cache=None):
+    """Returns {name: contact_id} for names, adding a contacts row for the ones that have none yet."""
+    ids = {}
+    missing = []
+    for name in names:
+        contact_id = cache.get(name) if cache is not None else None
+        if contact_id is None:
+            missing.append(name)
+        else:
+            ids[name] = contact_id
+    if not missing:
+        return ids
+    cursor = dbapi_connection.cursor()
+    try:
+        # UNIQUE(name, phone_number, email_id) never matches NULLs, so guard on name explicitly
+        cursor.executemany("INSERT INTO contacts (name) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM contacts WHERE name = ?)",
+                           [(name, name) for name in missing])
+        placeholders = ', '.join('?' for _ in missing)
+        cursor.execute(f"SELECT name, MIN(contact_id) FROM contacts WHERE name IN ({placeholders}) GROUP BY name",
+                       missing)
+        for name, contact_id in cursor.fetchall():
+            ids[name] = contact_id
+            if cache is not None:
+                cache.put(name, contact_id)
+    finally:
+        cursor.close()
+    return ids
+
+
+def create_id_caches(max_size=DEFAULT_ID_CACHE_SIZE):
+    """Creates the contact, location and lookup-table id caches shared by every file of an import run."""
+    caches = {"contacts": IdCache(max_size), "locations": IdCache(max_size)}
+    for _, lookup_table, _ in DICTIONARY_COLUMNS.values():
+        caches[lookup_table] = IdCache(max_size)
+    return caches
+
+
+def preload_id_caches(dbapi_connection, id_caches):
+    """Preloads the contact and location id caches from their tables, once per run."""
+    preloads = [
+        ("contacts", "SELECT name, MIN(contact_id) FROM contacts WHERE name IS NOT NULL GROUP BY name LIMIT ?"),
+        ("locations", "SELECT location_text, location_id FROM locations WHERE location_text IS NOT NULL LIMIT ?"),
+    ]
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, sql in preloads:
+            cache = id_caches.get(name)
+            if cache is not None and not cache.preloaded:
+                cursor.execute(sql, (cache.max_size,))
+                cache.preload(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def encode_dimension_columns(dbapi_connection, table_name, records, id_caches=None):
+    """Resolves the contact, location and dictionary-encoded columns of table_name's records to ids (in place).
+
+    contact_id is added next to the contact text, the location text is replaced
+    by location_id and the dictionary text by its lookup id. Runs in the
+    caller's transaction; id_caches (see create_id_caches) are optional.
+    """
+    if not records:
+        return
+    id_caches = id_caches or {}
+    table_name = table_name.lower()
+    contact_column = CONTACT_COLUMNS.get(table_name)
+    if contact_column in records[0]:
+        ids = resolve_contact_ids(dbapi_connection, _distinct_text(records, contact_column), id_caches.get("contacts"))
+        for record in records:
+            record["contact_id"] = ids.get(record[contact_column])
+    location_column = LOCATION_COLUMNS.get(table_name)
+    if location_column in records[0]:
+        ids = resolve_dictionary_ids(dbapi_connection, "locations", "location_text", "location_id",
+                                     _distinct_text(records, location_column), id_caches.get("locations"))
+        for record in records:
+            record["location_id"] = ids.get(record.pop(location_column))
+    encoding = DICTIONARY_COLUMNS.get(table_name)
+    encode_dictionary_columns(dbapi_connection, table_name, records, id_caches.get(encoding[1]) if encoding else None)
+
+
+# Id caches of insert_or_ignore per engine, shared by every file imported through it; ids never change once assigned
+_engine_id_caches = weakref.WeakKeyDictionary()
+
+
+def engine_id_caches(db_engine):
+    """Returns the id caches insert_or_ignore uses for db_engine, created on first use."""
+    caches = _engine_id_caches.get(db_engine)
+    if caches is None:
+        caches = _engine_id_caches[db_engine] = create_id_caches()
+    return caches
+
+
+def to_epoch_ms(value):
+    """Converts a datetime (naive times are taken as UTC) to integer epoch milliseconds; None stays None"""
+    if value is None:
+        return None
+    return calendar.timegm(value.utctimetuple()) * 1000 + value.microsecond // 1000
+
+
+def format_epoch_ms(value, fmt="%Y-%m-%d %H:%M:%S"):
+    """Formats integer epoch milliseconds as UTC text; None stays None"""
+    if value is None:
+        return None
+    return (_EPOCH + timedelta(milliseconds=value)).strftime(fmt)
+
+
+def epoch_ms_series(series):
+    """Vectorized to_epoch_ms for a pandas column; values that are not datetimes become None"""
+    import pandas as pd
+    timestamps = pd.to_datetime(series, errors='coerce', utc=True)
+    millis = (timestamps - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(milliseconds=1)
+    return millis.astype('Int64').astype(object).where(timestamps.notna(), None)
+
+
+def _to_sql_values(df):
+    """Converts a DataFrame to parameter dicts: NaN/NaT become None, EPOCH_MS_COLUMNS become epoch
+    milliseconds and other datetimes use the same text format as to_sql."""
+    import pandas as pd
+    df = df.copy()
+    for col in df.columns:
+        if col in EPOCH_MS_COLUMNS:
+            df[col] = epoch_ms_series(df[col])
+        elif pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient='records')
+
+
+def insert_or_ignore(db_engine, table_name, df):
+    """Inserts a DataFrame with INSERT OR IGNORE in a single transaction.
+
+    Rows colliding with a UNIQUE constraint (already imported, or repeated in the
+    file) are skipped instead of failing the whole insert.
+    Returns:
+        tuple: (inserted, skipped) row counts.
+    """
+    if df.empty:
+        return 0, 0
+    records = _to_sql_values(df)
+    fill_unique_key_text(table_name, records)
+    id_caches = engine_id_caches(db_engine)
+    try:
+        with db_engine.begin() as conn:
+            # Contacts, locations and low-cardinality text are stored as ids, resolved in the same transaction
+            preload_id_caches(conn.connection, id_caches)
+            encode_dimension_columns(conn.connection, table_name, records, id_caches)
+            columns = list(records[0])
+            column_list = ', '.join(f'"{col}"' for col in columns)
+            placeholders = ', '.join(f':p{i}' for i in range(len(columns)))
+            sql = text(f'INSERT OR IGNORE INTO {table_name} ({column_list}) VALUES ({placeholders})')
+            params = [{f'p{i}': record[col] for i, col in enumerate(columns)} for record in records]
+            result = conn.execute(sql, params)
+            inserted = result.rowcount
+    except Exception as e:
+        # Ids added in the rolled back transaction may have been cached
+        _engine_id_caches.pop(db_engine, None)
+        logging.error(f"Error inserting into table {table_name}: {e}")
+        raise
+    return inserted, len(params) - inserted
+
+
 def create_indexes(db_engine, index_sql):
     """Creates indexes in the database."""
     try:
@@ -61,4 +546,371 @@ def create_indexes(db_engine, index_sql):
         return True
     except exc.SQLAlchemyError as e:
         logging.error(f"Error creating indexes: {e}")
-        raise
\ No newline at end of file
+        raise
+
+# Indexes the /get_data and /get_conversation queries seek or read in order (see query_plans.py): (name, table, columns)
+SERVING_INDEXES = [
+    ("idx_keylogs_time_dt", "keylogs", ("time_dt",)),
+    ("idx_sms_messages_time_dt", "sms_messages", ("time_dt",)),
+    ("idx_sms_messages_contact_id", "sms_messages", ("contact_id",)),
+    ("idx_chat_messages_time_dt", "chat_messages", ("time_dt",)),
+    ("idx_chat_messages_contact_id", "chat_messages", ("contact_id",)),
+    ("idx_contacts_name", "contacts", ("name",)),
+    ("idx_calls_time_dt", "calls", ("time_dt",)),
+    ("idx_calls_contact_id", "calls", ("contact_id",)),
+    ("idx_installedapps_application_name", "installedapps", ("application_name",)),
+]
+
+
+def missing_serving_indexes_sql(dbapi_connection):
+    """Returns the CREATE INDEX statements for the SERVING_INDEXES a database lacks.
+
+    An index is skipped if its table does not exist, or already has an index on
+    exactly the same columns under another name (e.g. idx_keylogs_by_time,
+    created by older versions of main.py).
+    """
+    cursor = dbapi_connection.cursor()
+    tables = {row[0].lower() for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    statements = []
+    for index_name, table_name, columns in SERVING_INDEXES:
+        if table_name not in tables:
+            continue
+        existing = [row[1] for row in cursor.execute(f'PRAGMA index_list("{table_name}")').fetchall()]
+        if any(tuple(info[2] for info in cursor.execute(f'PRAGMA index_info("{name}")').fetchall()) == columns
+               for name in existing):
+            continue
+        statements.append(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name}({', '.join(columns)});")
+    return statements
+
+
+def create_serving_indexes(db_engine):
+    """Creates the SERVING_INDEXES the database lacks."""
+    try:
+        with db_engine.begin() as conn:
+            for sql in missing_serving_indexes_sql(conn.connection):
+                conn.execute(text(sql))
+        logging.info("Serving indexes created successfully.")
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error creating serving indexes: {e}")
+        raise
+
+
+def table_stats_sql(table_names=COUNTED_TABLES):
+    """Returns the statements creating table_stats and the triggers that keep its counts current."""
+    statements = ["""
+        CREATE TABLE IF NOT EXISTS table_stats (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0
+        );
+    """]
+    for table_name in table_names:
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name}_count_insert AFTER INSERT ON {table_name}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count + 1 WHERE table_name = '{table_name}';
+            END;
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name}_count_delete AFTER DELETE ON {table_name}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count - 1 WHERE table_name = '{table_name}';
+            END;
+        """)
+    return statements
+
+
+def create_table_stats(db_engine, table_names=COUNTED_TABLES):
+    """Creates the table_stats counts table and its triggers, then seeds the counts."""
+    try:
+        with db_engine.begin() as conn:
+            for sql in table_stats_sql(table_names):
+                conn.execute(text(sql))
+        logging.info("Table stats created successfully.")
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error creating table stats: {e}")
+        raise
+    return rebuild_table_stats(db_engine, table_names)
+
+
+def rebuild_table_stats(db_engine, table_names=COUNTED_TABLES):
+    """Recounts every table with count(*) and stores the results in table_stats.
+
+    Returns:
+        dict: The row count per table.
+    """
+    counts = {}
+    try:
+        with db_engine.begin() as conn:
+            for table_name in table_names:
+                if not conn.execute(text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+                                    {"name": table_name}).fetchone():
+                    continue
+                counts[table_name] = conn.execute(text(f"SELECT count(*) FROM {table_name}")).scalar()
+                conn.execute(text("INSERT OR REPLACE INTO table_stats (table_name, row_count) VALUES (:name, :count)"),
+                             {"name": table_name, "count": counts[table_name]})
+        logging.info(f"Table stats rebuilt: {counts}")
+        return counts
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error rebuilding table stats: {e}")
+        raise
+
+
+# Message tables summarised into conversations: section -> (table, column naming the other party)
+CONVERSATION_SOURCES = {
+    "chats": ("chat_messages", "sender"),
+    "sms": ("sms_messages", "from_to"),
+}
+# Conversation of the messages with neither a contact nor a sender (NULL or '')
+UNKNOWN_CONVERSATION = "Unknown"
+
+
+def conversations_sql():
+    """Returns the statements creating the conversations summary table, its indexes and maintenance triggers."""
+    statements = ["""
+        CREATE TABLE IF NOT EXISTS conversations (
+            section TEXT NOT NULL,
+            name TEXT NOT NULL,
+            contact_id INTEGER,
+            last_message TEXT,
+            last_time TEXT,
+            last_time_dt INTEGER,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (section, name)
+        );
+    """, """
+        CREATE INDEX IF NOT EXISTS idx_conversations_by_last_time ON conversations(section, last_time_dt);
+    """]
+    for section, (table_name, name_column) in CONVERSATION_SOURCES.items():
+        statements.append(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table_name}_by_{name_column} ON {table_name}({name_column}, time_dt);
+        """)
+        # A newer message replaces last_*; ties and NULL times keep the existing summary
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name}_conversation_insert AFTER INSERT ON {table_name}
+            BEGIN
+                INSERT INTO conversations (section, name, contact_id, last_message, last_time, last_time_dt, message_count)
+                VALUES ('{section}',
+                        COALESCE((SELECT name FROM contacts WHERE contact_id = NEW.contact_id), NULLIF(NEW.{name_column}, ''),
+                                 '{UNKNOWN_CONVERSATION}'),
+                        NEW.contact_id, NEW.text, NEW.time, NEW.time_dt, 1)
+                ON CONFLICT(section, name) DO UPDATE SET
+                    message_count = message_count + 1,
+                    contact_id = COALESCE(excluded.contact_id, contact_id),
+                    last_message = CASE WHEN last_time_dt IS NULL OR excluded.last_time_dt >= last_time_dt
+                                        THEN excluded.last_message ELSE last_message END,
+                    last_time = CASE WHEN last_time_dt IS NULL OR excluded.last_time_dt >= last_time_dt
+                                     THEN excluded.last_time ELSE last_time END,
+                    last_time_dt = CASE WHEN last_time_dt IS NULL OR excluded.last_time_dt >= last_time_dt
+                                        THEN excluded.last_time_dt ELSE last_time_dt END;
+            END;
+        """)
+    return statements
+
+
+def rebuild_conversations_sql():
+    """Returns the statements recomputing every conversation summary from the message tables."""
+    statements = ["DELETE FROM conversations;"]
+    for section, (table_name, name_column) in CONVERSATION_SOURCES.items():
+        # Bare columns in a max() aggregate come from the row holding the max (SQLite guarantee)
+        statements.append(f"""
+            INSERT INTO conversations (section, name, contact_id, last_message, last_time, last_time_dt, message_count)
+            SELECT '{section}', COALESCE(con.name, NULLIF(m.{name_column}, ''), '{UNKNOWN_CONVERSATION}') AS conversation_name,
+                   m.contact_id, m.text, m.time, MAX(m.time_dt), count(*)
+            FROM {table_name} m LEFT JOIN contacts con ON con.contact_id = m.contact_id
+            GROUP BY conversation_name;
+        """)
+    return statements
+
+
+def create_conversations(db_engine):
+    """Creates the conversations summary table and its triggers, then fills it from existing messages."""
+    try:
+        with db_engine.begin() as conn:
+            for sql in conversations_sql():
+                conn.execute(text(sql))
+        logging.info("Conversations table created successfully.")
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error creating conversations table: {e}")
+        raise
+    rebuild_conversations(db_engine)
+
+
+def rebuild_conversations(db_engine):
+    """Recomputes the conversations summary table from chat_messages and sms_messages."""
+    try:
+        with db_engine.begin() as conn:
+            for sql in rebuild_conversations_sql():
+                conn.execute(text(sql))
+        logging.info("Conversations rebuilt successfully.")
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error rebuilding conversations: {e}")
+        raise
+
+
+# Full-text indexed text columns: section -> (table, column shown as the result's name)
+SEARCH_SOURCES = {
+    "chats": ("chat_messages", "sender"),
+    "sms": ("sms_messages", "from_to"),
+    "keylogs": ("keylogs", "application"),
+}
+
+
+def search_index_sql():
+    """Returns the statements creating the FTS5 indexes over message/keylog text and their sync triggers.
+
+    The indexes are external-content tables keyed on the source rowid, so they
+    store only the index itself; run rebuild_search_index() after a VACUUM.
+    """
+    statements = []
+    for table_name, _ in SEARCH_SOURCES.values():
+        statements.append(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table_name}_fts
+            USING fts5(text, content='{table_name}', content_rowid='rowid');
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name}_fts_insert AFTER INSERT ON {table_name}
+            BEGIN
+                INSERT INTO {table_name}_fts (rowid, text) VALUES (NEW.rowid, NEW.text);
+            END;
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name}_fts_delete AFTER DELETE ON {table_name}
+            BEGIN
+                INSERT INTO {table_name}_fts ({table_name}_fts, rowid, text) VALUES ('delete', OLD.rowid, OLD.text);
+            END;
+        """)
+        statements.append(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table_name}_fts_update AFTER UPDATE OF text ON {table_name}
+            BEGIN
+                INSERT INTO {table_name}_fts ({table_name}_fts, rowid, text) VALUES ('delete', OLD.rowid, OLD.text);
+                INSERT INTO {table_name}_fts (rowid, text) VALUES (NEW.rowid, NEW.text);
+            END;
+        """)
+    return statements
+
+
+def create_search_index(db_engine):
+    """Creates the full-text search indexes and their triggers, then indexes existing rows."""
+    try:
+        with db_engine.begin() as conn:
+            for sql in search_index_sql():
+                conn.execute(text(sql))
+        logging.info("Search index created successfully.")
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error creating search index: {e}")
+        raise
+    rebuild_search_index(db_engine)
+
+
+def rebuild_search_index_sql():
+    """Returns the statements rebuilding every full-text index from its source table."""
+    return [f"INSERT INTO {table_name}_fts ({table_name}_fts) VALUES ('rebuild');" for table_name, _ in SEARCH_SOURCES.values()]
+
+
+def rebuild_search_index(db_engine):
+    """Rebuilds every full-text index from its source table."""
+    try:
+        with db_engine.begin() as conn:
+            for sql in rebuild_search_index_sql():
+                conn.execute(text(sql))
+        logging.info("Search index rebuilt successfully.")
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error rebuilding search index: {e}")
+        raise
+
+
+IMPORT_LEDGER_SQL = """
+    CREATE TABLE IF NOT EXISTS import_ledger (
+        file_hash TEXT PRIMARY KEY,
+        file_name TEXT,
+        table_name TEXT,
+        rows_read INTEGER,
+        rows_inserted INTEGER,
+        rows_rejected INTEGER,
+        duration_sec REAL,
+        status TEXT,
+        imported_at DATETIME,
+        stage_timings TEXT
+    );
+"""
+
+
+def create_import_ledger(db_engine):
+    """Creates the import_ledger table recording which file contents have been imported."""
+    if not create_table(db_engine, "import_ledger", IMPORT_LEDGER_SQL):
+        return False
+    # Ledgers created before per-stage timings were recorded lack the stage_timings column
+    with db_engine.begin() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(import_ledger)"))}
+        if "stage_timings" not in columns:
+            conn.execute(text("ALTER TABLE import_ledger ADD COLUMN stage_timings TEXT"))
+    return True
+
+
+def file_sha256(file_path, block_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file, read in blocks so memory stays constant."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_ledger_entry(db_engine, file_hash):
+    """Returns the import_ledger row for a file hash as a dict, or None if it was never imported."""
+    try:
+        with db_engine.connect() as conn:
+            row = conn.execute(text("SELECT * FROM import_ledger WHERE file_hash = :file_hash"),
+                               {"file_hash": file_hash}).mappings().fetchone()
+            return dict(row) if row else None
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error reading import ledger: {e}")
+        raise
+
+
+def is_already_imported(db_engine, file_hash):
+    """True if a file with this content hash was imported successfully before."""
+    entry = get_ledger_entry(db_engine, file_hash)
+    return entry is not None and entry["status"] == "done"
+
+
+def record_import(db_engine, file_hash, file_path, table_name, rows_read, rows_inserted, rows_rejected,
+                  duration_sec, status, stage_timings=None):
+    """Records (or replaces) the ledger entry for an import attempt of a file.
+
+    stage_timings (the per-stage totals from instrumentation.StageTimer) is stored as JSON.
+    """
+    try:
+        with db_engine.begin() as conn:
+            conn.execute(text("""
+                INSERT OR REPLACE INTO import_ledger
+                    (file_hash, file_name, table_name, rows_read, rows_inserted, rows_rejected,
+                     duration_sec, status, imported_at, stage_timings)
+                VALUES (:file_hash, :file_name, :table_name, :rows_read, :rows_inserted, :rows_rejected,
+                        :duration_sec, :status, datetime('now'), :stage_timings)
+            """), {
+                "file_hash": file_hash,
+                "file_name": os.path.basename(str(file_path)),
+                "table_name": table_name,
+                "rows_read": rows_read,
+                "rows_inserted": rows_inserted,
+                "rows_rejected": rows_rejected,
+                "duration_sec": duration_sec,
+                "status": status,
+                "stage_timings": json.dumps(stage_timings) if stage_timings else None
+            })
+    except exc.SQLAlchemyError as e:
+        logging.error(f"Error writing import ledger: {e}")
+        raise
+
+
+def get_table_count(conn, table_name):
+    """Returns the row count of a table from table_stats, falling back to count(*) when it is not tracked."""
+    try:
+        result = conn.execute(text("SELECT row_count FROM table_stats WHERE table_name = :name"),
+                              {"name": table_name}).fetchone()
+    except exc.OperationalError:
+        result = None
+    if result is not None:
+        return result[0]
+    return conn.execute(text(f"SELECT count(*) FROM {table_name}")).scalar()
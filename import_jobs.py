@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from database_utils import file_sha256, is_already_imported, record_import
+
+# Finished jobs kept for /jobs/<id> before the oldest are forgotten
+MAX_TRACKED_JOBS = 200
+
+
+def _new_import_progress():
+    # data_loader pulls in pandas and openpyxl, so it is only imported once a file is queued
+    from data_loader import new_import_progress
+    return new_import_progress()
+
+
+class ImportJob:
+    """One queued file import and its progress counters."""
+    def __init__(self, file_path, force=False):
+        self.id = uuid.uuid4().hex
+        self.file_path = file_path
+        self.force = force
+        self.file_hash = None
+        self.status = "queued"
+        self.progress = _new_import_progress()
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "file": self.file_path,
+            "status": self.status,
+            "table_name": self.progress["table_name"],
+            "rows_read": self.progress["rows_read"],
+            "rows_transformed": self.progress["rows_transformed"],
+            "rows_inserted": self.progress["rows_inserted"],
+            "rows_rejected": self.progress["rows_rejected"],
+            "schema_match": self.progress["schema_match"],
+            "error": self.progress["error"],
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ImportQueue:
+    """Runs file imports on a background thread pool.
+
+    Parsing and transforming can overlap between workers, but every database
+    write is made while holding a single lock, so SQLite only ever sees one writer.
+    The table and transform mappings default to data_loader's, which is not
+    imported until the first job runs.
+    """
+    def __init__(self, db_engine, table_mapping=None, transform_mapping=None, max_workers=2, on_complete=None):
+        self.db_engine = db_engine
+        self.table_mapping = table_mapping
+        self.transform_mapping = transform_mapping
+        self.on_complete = on_complete
+        self.write_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import")
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+    def submit(self, file_path, force=False):
+        """Queues a file for import and returns its ImportJob immediately.
+
+        Files whose content was already imported are skipped unless force is set.
+        """
+        job = ImportJob(file_path, force)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        """Returns the job with the given id, or None if it is unknown or has been forgotten."""
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = datetime.now()
+        start = time.perf_counter()
+        try:
+            job.file_hash = file_sha256(job.file_path)
+            if not job.force and is_already_imported(self.db_engine, job.file_hash):
+                job.status = "skipped"
+            else:
+                import data_loader
+                data_loader.load_and_clean_data(job.file_path, self.db_engine,
+                                                self.table_mapping or data_loader.table_mapping,
+                                                self.transform_mapping or data_loader.transform_mapping,
+                                                progress=job.progress, write_lock=self.write_lock)
+                job.status = "failed" if job.progress["error"] else "done"
+                progress = job.progress
+                with self.write_lock:
+                    record_import(self.db_engine, job.file_hash, job.file_path, progress["table_name"],
+                                  progress["rows_read"], progress["rows_inserted"], progress["rows_rejected"],
+                                  time.perf_counter() - start, job.status, progress["stage_timings"])
+        except Exception as e:
+            logging.error(f"Import job {job.id} failed: {e}")
+            job.progress["error"] = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now()
+        if self.on_complete is not None:
+            try:
+                self.on_complete(job)
+            except Exception as e:
+                logging.error(f"Import job {job.id} completion hook failed: {e}")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
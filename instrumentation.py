@@ -0,0 +1,122 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then not reported
+    resource = None
+
+# Structured (one JSON object per line) log of per-stage import timings
+timings_logger = logging.getLogger("repldb.timings")
+# Comma-separated profilers to run around each import: "cprofile", "tracemalloc"
+PROFILE_ENV_VAR = "IMPORT_PROFILE"
+PROFILE_DIR = os.environ.get("IMPORT_PROFILE_DIR", "profiles")
+# Allocation sites logged by the tracemalloc hook
+TRACEMALLOC_TOP = 15
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB (None where unsupported)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StageSpan:
+    """Rows handled by one timed stage; add to rows inside the span"""
+    def __init__(self, rows=0):
+        self.rows = rows
+
+
+class StageTimer:
+    """Accumulates wall time, rows, call count and peak RSS per import stage.
+
+    Spans of the same stage (e.g. one per chunk) are summed. The totals are kept
+    in a plain dict, so they can be returned from worker processes, stored in the
+    progress counters and written to the import ledger.
+    """
+    def __init__(self, timings=None):
+        self.timings = {} if timings is None else timings
+
+    @contextmanager
+    def span(self, stage, rows=0):
+        span = StageSpan(rows)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            self._record(stage, time.perf_counter() - start, span.rows)
+
+    def iter_span(self, stage, iterable):
+        """Yields from iterable, timing each step under stage and counting the rows of each item"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._record(stage, time.perf_counter() - start, 0)
+                return
+            self._record(stage, time.perf_counter() - start, len(item))
+            yield item
+
+    def _record(self, stage, seconds, rows):
+        entry = self.timings.setdefault(stage, {"seconds": 0.0, "rows": 0, "calls": 0, "peak_rss_mb": None})
+        entry["seconds"] = round(entry["seconds"] + seconds, 6)
+        entry["rows"] += rows
+        entry["calls"] += 1
+        entry["peak_rss_mb"] = peak_rss_mb()
+
+
+def log_stage_timings(file_path, table_name, timings, **fields):
+    """Writes one structured log record with the stage timings of an import"""
+    record = {"event": "import_timings", "file": os.path.basename(str(file_path)), "table_name": table_name,
+              "stages": timings, **fields}
+    timings_logger.info(json.dumps(record, default=str))
+
+
+@contextmanager
+def profile_import(file_path):
+    """Runs cProfile and/or tracemalloc around an import when IMPORT_PROFILE asks for them.
+
+    cProfile stats are saved to PROFILE_DIR/<file>_<timestamp>.prof (open with
+    pstats or snakeviz); tracemalloc's peak and top allocation sites are logged.
+    """
+    profilers = {name.strip().lower() for name in os.environ.get(PROFILE_ENV_VAR, "").split(",") if name.strip()}
+    profiler = cProfile.Profile() if "cprofile" in profilers else None
+    trace_memory = "tracemalloc" in profilers and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+    if profiler is not None:
+        try:
+            profiler.enable()
+        except ValueError as e:  # another profiler is active, e.g. a concurrent import on Python 3.12+
+            logging.warning(f"cProfile not started for {file_path}: {e}")
+            profiler = None
+    try:
+        yield
+    finally:
+        base_name = os.path.splitext(os.path.basename(str(file_path)))[0]
+        if profiler is not None:
+            profiler.disable()
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            top = [str(stat) for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]]
+            timings_logger.info(json.dumps({"event": "import_tracemalloc", "file": base_name,
+                                            "peak_traced_mb": round(peak / (1024 * 1024), 1), "top": top}))
+        if profiler is not None:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            output = os.path.join(PROFILE_DIR, f"{base_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+            profiler.dump_stats(output)
+            logging.info(f"cProfile stats for {base_name} written to {output}")
@@ -1,35 +1,44 @@
 import os
 import sys
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent))
-from data_loader import load_and_clean_data, table_mapping, transform_mapping
-from database_utils import create_database_engine, create_locations_table, table_exists, create_table
-from sqlalchemy import text
+from data_loader import (table_mapping, transform_mapping, transform_file, iter_transformed_chunks,
+                         write_transformed_chunks, new_import_progress)
+from upload_script import UPLOAD_FOLDER
+from cleaned_output import rebuild_from_cleaned_output
+from instrumentation import log_stage_timings
+from migrations import migrate
+from database_utils import (create_database_engine, table_exists, create_table, create_table_stats, create_conversations, create_search_index,
+                            create_serving_indexes, create_import_ledger, file_sha256, is_already_imported, record_import,
+                            engine_id_caches)
 
 db_path = "my_database.db"
 
 # Table creation SQL statements
 create_keylogs_sql = """
     CREATE TABLE IF NOT EXISTS keylogs (
-        application TEXT,
+        application_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         text TEXT,
         package_id TEXT,
-        UNIQUE(application, time, text)
+        UNIQUE(application_id, time, text)
     );
 """
 
 create_sms_messages_sql = """
     CREATE TABLE IF NOT EXISTS sms_messages (
-        sms_type TEXT,
+        sms_type_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         from_to TEXT,
         text TEXT,
         location_id INTEGER,
         contact_id INTEGER,
-        UNIQUE(sms_type, time, from_to, text),
+        UNIQUE(sms_type_id, time, from_to, text),
         FOREIGN KEY (location_id) REFERENCES locations(location_id),
         FOREIGN KEY (contact_id) REFERENCES contacts(contact_id)
     );
@@ -37,13 +46,13 @@ create_sms_messages_sql = """
 
 create_chat_messages_sql = """
      CREATE TABLE IF NOT EXISTS chat_messages (
-        messenger TEXT,
+        messenger_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         sender TEXT,
         text TEXT,
         contact_id INTEGER,
-        UNIQUE(messenger, time, sender, text)
+        UNIQUE(messenger_id, time, sender, text)
     );
 """
 
@@ -54,21 +63,21 @@ create_contacts_sql = """
         phone_number TEXT,
         email_id TEXT,
         last_contacted TEXT,
-        last_contacted_dt DATETIME,
+        last_contacted_dt INTEGER,
         UNIQUE(name, phone_number, email_id)
     );
 """
 
 create_calls_sql = """
     CREATE TABLE IF NOT EXISTS calls (
-        call_type TEXT,
+        call_type_id INTEGER,
         time TEXT,
-        time_dt DATETIME,
+        time_dt INTEGER,
         from_to TEXT,
         duration INTEGER,
         location_id INTEGER,
         contact_id INTEGER,
-         UNIQUE(call_type, time, from_to),
+         UNIQUE(call_type_id, time, from_to),
         FOREIGN KEY (location_id) REFERENCES locations(location_id),
         FOREIGN KEY (contact_id) REFERENCES contacts(contact_id)
     );
@@ -101,44 +110,156 @@ table_creation_mapping = {
 }
 
 
-def main():
-    """Main function that loops through uploaded files and runs data processing."""
-    #Create engine
-    db_engine = create_database_engine(db_path)
-    # Create the locations table if it doesn't exist
-    if not create_locations_table(db_engine):
-        print("The locations table could not be created. Exiting....")
-        return
+def list_upload_files(upload_folder):
+    """Returns the paths of the exports waiting in the uploads folder."""
+    return [os.path.join(upload_folder, filename) for filename in os.listdir(upload_folder)
+            if not filename.startswith("cleaned") and not filename.endswith(".py")
+            and os.path.isfile(os.path.join(upload_folder, filename))]
+
+
+def files_to_import(db_engine, file_paths, force=False):
+    """Hashes each file and drops those the import ledger says were already imported (unless force).
+
+    Copies of a file within the same run are imported once: the ledger keeps one
+    entry per hash, so it would only remember the last copy's name.
+    Returns:
+        list: (file_path, file_hash) pairs still to import.
+    """
+    pending = []
+    seen = {}
+    for file_path in file_paths:
+        file_hash = file_sha256(file_path)
+        if file_hash in seen:
+            print(f"Skipping {os.path.basename(file_path)}: same content as {os.path.basename(seen[file_hash])}")
+            continue
+        if not force and is_already_imported(db_engine, file_hash):
+            print(f"Skipping {os.path.basename(file_path)}: already imported")
+            continue
+        seen[file_hash] = file_path
+        pending.append((file_path, file_hash))
+    return pending
+
+
+def write_and_record(db_engine, file_path, file_hash, chunks, progress, start, output_format=None):
+    """Write stage of both import modes: inserts a file's transformed chunks and records it in the import ledger."""
+    write_transformed_chunks(db_engine, file_path, chunks, progress, output_format=output_format)
+    duration = time.perf_counter() - start
+    log_stage_timings(file_path, progress["table_name"], progress["stage_timings"],
+                      duration_sec=round(duration, 6), rows_read=progress["rows_read"],
+                      rows_inserted=progress["rows_inserted"])
+    record_import(db_engine, file_hash, file_path, progress["table_name"], progress["rows_read"],
+                  progress["rows_inserted"], progress["rows_rejected"], duration, "done",
+                  progress["stage_timings"])
+
+
+def run_serial(db_engine, files, output_format=None):
+    """Parses, transforms and writes files one at a time in this process, streaming each file in chunks."""
+    for file_path, file_hash in files:
+        start = time.perf_counter()
+        progress = new_import_progress()
+        try:
+            chunks = iter_transformed_chunks(file_path, table_mapping, transform_mapping, progress, db_engine)
+            write_and_record(db_engine, file_path, file_hash, chunks, progress, start, output_format)
+        except Exception as e:
+            print(f"Error processing file {os.path.basename(file_path)}: {e}")
+            record_import(db_engine, file_hash, file_path, None, 0, 0, 0, time.perf_counter() - start, "failed")
+
+
+def run_pipeline(db_engine, files, workers, max_pending=None, output_format=None):
+    """Parses and transforms files in worker processes while this thread, the only writer, inserts them.
 
-    # Create the other tables if they do not exist
+    At most max_pending files are being parsed or waiting to be written at once,
+    so a fast pool cannot run ahead of the writer and hold every file in memory.
+    """
+    max_pending = max_pending or workers * 2
+    files = iter(files)
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            item = next(files, None)
+            if item is not None:
+                future = executor.submit(transform_file, item[0], table_mapping, transform_mapping)
+                pending[future] = item + (time.perf_counter(),)
+
+        for _ in range(max_pending):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path, file_hash, start = pending.pop(future)
+                submit_next()
+                try:
+                    chunks, progress = future.result()
+                except Exception as e:
+                    print(f"Error processing file {os.path.basename(file_path)}: {e}")
+                    record_import(db_engine, file_hash, file_path, None, 0, 0, 0, time.perf_counter() - start, "failed")
+                    continue
+                write_and_record(db_engine, file_path, file_hash, chunks, progress, start, output_format)
+
+
+def main(workers=1, max_pending=None, force=False, output_format=None, rebuild_from=None):
+    """Main function that loops through uploaded files and runs data processing.
+
+    With workers > 1, files are parsed and transformed in parallel processes and
+    written by this process through a single connection (see run_pipeline).
+    The worker count only changes concurrency: both modes run the same
+    data_loader transforms and insert_or_ignore, so they store the same rows.
+    Files already recorded in the import ledger are skipped unless force is set.
+    With rebuild_from set, the database is loaded from the Parquet cleaned outputs
+    in that directory instead of re-parsing the uploads.
+    """
+    #Create engine
+    db_engine = create_database_engine(db_path, preset="bulk_import")
+    # Create the tables (locations included) if they do not exist
     for table_name, create_sql in table_creation_mapping.items():
       if not table_exists(db_engine, table_name):
           if not create_table(db_engine, table_name, create_sql):
             print(f"The {table_name} could not be created. Exiting....")
             return
     
-    with db_engine.connect() as conn:
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_keylogs_by_time ON keylogs(time_dt);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_sms_messages_by_time ON sms_messages(time_dt);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_sms_messages_by_contact ON sms_messages(contact_id);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_chat_messages_by_time ON chat_messages(time_dt);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_chat_messages_by_contact ON chat_messages(contact_id);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_contacts_by_name ON contacts(name);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_calls_by_time ON calls(time_dt);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_calls_by_contact ON calls(contact_id);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_installedapps_by_application ON installedapps(application_name);"""))
-        conn.execute(text("""CREATE INDEX IF NOT EXISTS idx_locations_by_location_text ON locations(location_text);"""))
+    # Indexes the web app's queries are checked against (see query_plans.py)
+    create_serving_indexes(db_engine)
+    # Row counts for /get_data, kept current by triggers on every insert/delete
+    create_table_stats(db_engine)
+    # Per-contact conversation summaries for the chat/SMS lists, kept current by triggers
+    create_conversations(db_engine)
+    # Full-text search over message and keylog text, kept in sync by triggers
+    create_search_index(db_engine)
+    # Content hashes of imported files, so unchanged exports are not imported twice
+    create_import_ledger(db_engine)
+    # Bring a database created by an older version up to the current schema
+    migrate(db_path)
+    if rebuild_from:
+        if not os.path.isdir(rebuild_from):
+            print(f"Error: Directory not found: {rebuild_from}")
+            return
+        rebuild_from_cleaned_output(db_engine, rebuild_from)
+        return
     # Get a list of all files in the uploads folder
-    if os.path.exists(UPLOAD_FOLDER):
-       for filename in os.listdir(UPLOAD_FOLDER):
-           if not filename.startswith("cleaned") and not filename.endswith(".py"):
-             file_path = os.path.join(UPLOAD_FOLDER, filename)
-             try:
-                 process_and_insert_data(Path(file_path))
-             except Exception as e:
-                print(f"Error processing file {filename}: {e}")
-    else:
+    if not os.path.exists(UPLOAD_FOLDER):
         print(f"Error: Directory not found: {UPLOAD_FOLDER}")
+        return
+    files = files_to_import(db_engine, list_upload_files(UPLOAD_FOLDER), force)
+    if workers > 1:
+        run_pipeline(db_engine, files, workers, max_pending, output_format)
+    else:
+        run_serial(db_engine, files, output_format)
+    # Contact/location/lookup ids are cached once per engine for the whole run, across files
+    for name, cache in engine_id_caches(db_engine).items():
+       print(f"Id cache '{name}': {cache.stats()}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser(description="Import every export in the uploads folder.")
+    arg_parser.add_argument("--workers", type=int, default=1,
+                            help="parse/transform files in this many processes (default: 1, serial)")
+    arg_parser.add_argument("--max-pending", type=int, default=None,
+                            help="files parsed ahead of the writer at most (default: 2 x workers)")
+    arg_parser.add_argument("--force", action="store_true",
+                            help="import files even if the import ledger says they were already imported")
+    arg_parser.add_argument("--output-format", choices=["csv", "parquet"], default=None,
+                            help="cleaned-output format (default: CLEANED_OUTPUT_FORMAT or csv)")
+    arg_parser.add_argument("--rebuild-from-cleaned", metavar="DIR", default=None,
+                            help="load the database from the Parquet cleaned outputs in DIR instead of the uploads")
+    args = arg_parser.parse_args()
+    main(workers=args.workers, max_pending=args.max_pending, force=args.force,
+         output_format=args.output_format, rebuild_from=args.rebuild_from_cleaned)
\ No newline at end of file
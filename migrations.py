@@ -0,0 +1,249 @@
+"""Versioned schema migrations for the SQLite database.
+
+Applied migrations are recorded in the schema_version table. migrate() runs
+the ones a database has not seen yet, in order, each in its own transaction.
+Migrations must be safe to run on a freshly created database, which already
+has the current schema.
+
+    python migrations.py my_database.db            # apply pending migrations
+    python migrations.py my_database.db --status   # show applied/pending
+"""
+import argparse
+import logging
+import re
+import sqlite3
+from datetime import datetime
+from database_utils import (EPOCH_MS_COLUMNS, DICTIONARY_COLUMNS, CONVERSATION_SOURCES, SEARCH_SOURCES, lookup_tables_sql,
+                            decoded_views_sql, conversations_sql, rebuild_conversations_sql, search_index_sql,
+                            rebuild_search_index_sql, missing_serving_indexes_sql)
+
+SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    );
+"""
+# Tables holding EPOCH_MS_COLUMNS, by their (case-insensitive) name in either schema
+EPOCH_MS_TABLES = ("keylogs", "sms_messages", "chat_messages", "calls", "contacts", "conversations")
+# julianday() of 1970-01-01 00:00:00 UTC
+UNIX_EPOCH_JULIANDAY = 2440587.5
+
+
+def _table_columns(conn, table_name):
+    """Returns [(name, declared type)] of a table's columns"""
+    return [(row[1], row[2]) for row in conn.execute(f'PRAGMA table_info("{table_name}")')]
+
+
+def _missing_tables(conn, table_names):
+    """Returns the names in table_names the database has no table for"""
+    existing = {row[0].lower() for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return [name for name in table_names if name.lower() not in existing]
+
+
+def _epoch_ms_expression(column_name):
+    """SQL converting a stored datetime text value to epoch milliseconds; numbers and NULLs are kept"""
+    return (f'CASE WHEN typeof("{column_name}") = \'text\' '
+            f'THEN CAST(round((julianday("{column_name}") - {UNIX_EPOCH_JULIANDAY}) * 86400000) AS INTEGER) '
+            f'ELSE "{column_name}" END')
+
+
+def _rebuild_table(conn, table_name, create_sql, expressions=None, renames=None):
+    """Recreates a table from a rewritten CREATE statement, keeping rowids, indexes and triggers.
+
+    SQLite cannot change a column in place, so this follows its documented
+    procedure: copy into a new table, drop, rename, then recreate the table's
+    indexes and triggers (which also rebuilds them). expressions maps a column
+    of the new table to the SQL computing it from the old row (default: the
+    same column); renames maps old column names to new ones in index definitions.
+    """
+    expressions = expressions or {}
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table_name,)
+    )]
+    new_name = f"{table_name}__migrating"
+    conn.execute(re.sub(r'^(\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?)("[^"]+"|`[^`]+`|\[[^\]]+\]|\w+)',
+                        lambda match: f'{match.group(1)}"{new_name}"', create_sql, count=1, flags=re.IGNORECASE))
+    columns = [name for name, _ in _table_columns(conn, new_name)]
+    column_list = ", ".join(f'"{name}"' for name in columns)
+    select_list = ", ".join(expressions.get(name, f'"{name}"') for name in columns)
+    conn.execute(f'INSERT INTO "{new_name}" (rowid, {column_list}) SELECT rowid, {select_list} FROM "{table_name}"')
+    conn.execute(f'DROP TABLE "{table_name}"')
+    conn.execute(f'ALTER TABLE "{new_name}" RENAME TO "{table_name}"')
+    for sql in dependents:
+        if sql.lstrip().upper().startswith("CREATE INDEX") or sql.lstrip().upper().startswith("CREATE UNIQUE INDEX"):
+            for old_column, new_column in (renames or {}).items():
+                sql = re.sub(rf'\b{old_column}\b', new_column, sql)
+        conn.execute(sql)
+
+
+def migrate_epoch_ms_times(conn):
+    """Stores time_dt, last_contacted_dt and last_time_dt as INTEGER epoch milliseconds instead of DATETIME text"""
+    for table_name, create_sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND lower(name) IN "
+            f"({', '.join('?' for _ in EPOCH_MS_TABLES)})", EPOCH_MS_TABLES).fetchall():
+        columns = dict(_table_columns(conn, table_name))
+        converted = [name for name in EPOCH_MS_COLUMNS if name in columns]
+        if not converted:
+            continue
+        if all(columns[name].upper() == "INTEGER" for name in converted):
+            # Already created with the new schema; only convert any text values written by older code
+            for name in converted:
+                conn.execute(f'UPDATE "{table_name}" SET "{name}" = {_epoch_ms_expression(name)} '
+                             f'WHERE typeof("{name}") = \'text\'')
+            continue
+        for name in converted:
+            create_sql = re.sub(rf'(["`\[]?\b{name}\b["`\]]?\s+)DATETIME\b', r'\1INTEGER', create_sql,
+                                flags=re.IGNORECASE)
+        _rebuild_table(conn, table_name, create_sql, {name: _epoch_ms_expression(name) for name in converted})
+        logging.info(f"Migrated {table_name}.{', '.join(converted)} to INTEGER epoch milliseconds")
+
+
+def migrate_dictionary_columns(conn):
+    """Moves application, messenger, sms_type and call_type into lookup tables referenced by integer ids"""
+    tables = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND lower(name) IN "
+        f"({', '.join('?' for _ in DICTIONARY_COLUMNS)})", list(DICTIONARY_COLUMNS)).fetchall()
+    table_names = [table_name for table_name, _ in tables]
+    for table_name in DICTIONARY_COLUMNS:
+        conn.execute(f"DROP VIEW IF EXISTS {table_name}_decoded")
+    for sql in lookup_tables_sql(table_names):
+        conn.execute(sql)
+    for table_name, create_sql in tables:
+        text_column, lookup_table, id_column = DICTIONARY_COLUMNS[table_name.lower()]
+        if text_column not in dict(_table_columns(conn, table_name)):
+            continue
+        conn.execute(f'INSERT OR IGNORE INTO {lookup_table} ({text_column}) '
+                     f'SELECT DISTINCT "{text_column}" FROM "{table_name}" WHERE "{text_column}" IS NOT NULL')
+        # The text column's definition becomes an integer id, and the UNIQUE key uses the id
+        create_sql = re.sub(rf'\b{text_column}\b(["`\]]?\s+)TEXT\b', rf'{id_column}\1INTEGER', create_sql, count=1,
+                            flags=re.IGNORECASE)
+        create_sql = re.sub(rf'\b{text_column}\b', id_column, create_sql)
+        _rebuild_table(conn, table_name, create_sql,
+                       {id_column: f'(SELECT d.{id_column} FROM {lookup_table} d '
+                                   f'WHERE d.{text_column} = "{table_name}"."{text_column}")'},
+                       {text_column: id_column})
+        logging.info(f"Migrated {table_name}.{text_column} to {lookup_table}.{id_column}")
+    # Created last, as they select from the rebuilt tables
+    for sql in decoded_views_sql(table_names):
+        conn.execute(sql)
+
+
+def migrate_conversations(conn):
+    """Adds the conversations summary table, its triggers and indexes, and fills it from the existing messages"""
+    missing = _missing_tables(conn, [table_name for table_name, _ in CONVERSATION_SOURCES.values()] + ["contacts"])
+    if missing:
+        # Nothing to summarise yet; create_db.py and main.py create conversations with the message tables
+        logging.info(f"Skipped conversations: no {', '.join(missing)} table")
+        return
+    for sql in conversations_sql() + rebuild_conversations_sql():
+        conn.execute(sql)
+    logging.info("Created and filled the conversations table")
+
+
+def migrate_search_index(conn):
+    """Adds the full-text search indexes over message and keylog text and their triggers, then indexes existing rows"""
+    missing = _missing_tables(conn, [table_name for table_name, _ in SEARCH_SOURCES.values()])
+    if missing:
+        # Nothing to index yet; create_db.py and main.py create the indexes with the source tables
+        logging.info(f"Skipped search index: no {', '.join(missing)} table")
+        return
+    for sql in search_index_sql() + rebuild_search_index_sql():
+        conn.execute(sql)
+    logging.info("Created and filled the search index")
+
+
+def migrate_unknown_conversation(conn):
+    """Moves messages with an empty sender into the 'Unknown' conversation, like those with a NULL sender"""
+    missing = _missing_tables(conn, [table_name for table_name, _ in CONVERSATION_SOURCES.values()] +
+                              ["contacts", "conversations"])
+    if missing:
+        logging.info(f"Skipped unknown conversation: no {', '.join(missing)} table")
+        return
+    for table_name, _ in CONVERSATION_SOURCES.values():
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_{table_name}_conversation_insert")
+    for sql in conversations_sql() + rebuild_conversations_sql():
+        conn.execute(sql)
+    logging.info("Recreated the conversation triggers and refilled the conversations table")
+
+
+def migrate_serving_indexes(conn):
+    """Adds the indexes the /get_data and /get_conversation queries rely on (see query_plans.py)"""
+    for sql in missing_serving_indexes_sql(conn):
+        conn.execute(sql)
+        logging.info(f"Created index: {sql}")
+
+
+# (version, name, function) in the order they are applied; never renumber or remove an entry
+MIGRATIONS = [
+    (1, "epoch_ms_times", migrate_epoch_ms_times),
+    (2, "dictionary_columns", migrate_dictionary_columns),
+    (3, "conversations", migrate_conversations),
+    (4, "search_index", migrate_search_index),
+    (5, "serving_indexes", migrate_serving_indexes),
+    (6, "unknown_conversation", migrate_unknown_conversation),
+]
+
+
+def applied_versions(conn):
+    conn.execute(SCHEMA_VERSION_SQL)
+    return {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+
+
+def migrate(db_path, target_version=None):
+    """Applies the pending migrations up to target_version (default: all) and returns the versions applied.
+
+    Each migration and its schema_version row commit together, so a failed
+    migration leaves the database at the previous version.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        # Renaming must not rewrite or validate other tables' triggers while a table is being rebuilt
+        conn.execute("PRAGMA legacy_alter_table = ON")
+        done = applied_versions(conn)
+        for version, name, upgrade in MIGRATIONS:
+            if version in done or (target_version is not None and version > target_version):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process (e.g. a second web worker) may have applied it since done was read
+                if version in applied_versions(conn):
+                    conn.execute("ROLLBACK")
+                    continue
+                upgrade(conn)
+                conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                             (version, name, datetime.now().isoformat(timespec="seconds")))
+                conn.execute("COMMIT")
+            except Exception as e:
+                conn.execute("ROLLBACK")
+                logging.error(f"Migration {version} ({name}) failed: {e}")
+                raise
+            logging.info(f"Applied migration {version} ({name})")
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+def migration_status(db_path):
+    """Returns [(version, name, applied)] for every known migration"""
+    with sqlite3.connect(db_path) as conn:
+        done = applied_versions(conn)
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    arg_parser = argparse.ArgumentParser(description="Apply pending schema migrations to a database.")
+    arg_parser.add_argument("db_path", nargs="?", default="my_database.db")
+    arg_parser.add_argument("--status", action="store_true", help="list migrations instead of applying them")
+    arg_parser.add_argument("--to", type=int, default=None, help="stop after this version")
+    args = arg_parser.parse_args()
+    if args.status:
+        for version, name, is_applied in migration_status(args.db_path):
+            print(f"{version:4d}  {name:30s} {'applied' if is_applied else 'pending'}")
+    else:
+        versions = migrate(args.db_path, args.to)
+        print(f"Applied migrations: {versions}" if versions else "Database is up to date")
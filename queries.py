@@ -0,0 +1,351 @@
+"""Statements behind /get_data and /get_conversation, compiled once at import.
+
+Every query is built in each form a page can be read with (page number, or a
+keyset cursor going forwards or backwards) and compiled to SQLite SQL with
+named parameters. A request only binds values, so nothing is rebuilt or
+recompiled per request, and query_plans.py can run EXPLAIN QUERY PLAN on
+exactly the SQL that is served.
+"""
+import base64
+import json
+from sqlalchemy import select, func, text, bindparam, tuple_, and_, or_
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.sql import table, column
+from serialization import STREAM_FETCH_SIZE
+from database_utils import UNKNOWN_CONVERSATION
+
+# SQLite, rendering :name parameters so the compiled SQL can be executed as text()
+DIALECT = sqlite.dialect(paramstyle="named")
+
+# Lightweight table definitions. Where a section shows a dictionary-encoded column
+# (application, call_type), the table is read through its <table>_decoded view.
+chat_messages_table = table("chat_messages", column("rowid"), column("messenger_id"), column("time"), column("time_dt"),
+                            column("sender"), column("text"), column("contact_id"))
+contacts_table = table("contacts", column("rowid"), column("contact_id"), column("name"), column("phone_number"),
+                       column("email_id"), column("last_contacted"), column("last_contacted_dt"))
+calls_table = table("calls_decoded", column("rowid"), column("call_type"), column("time"), column("time_dt"), column("from_to"),
+                    column("duration"), column("location_id"), column("contact_id"))
+locations_table = table("locations", column("location_id"), column("location_text"))
+keylogs_table = table("keylogs_decoded", column("rowid"), column("application"), column("time"), column("time_dt"), column("text"))
+sms_messages_table = table("sms_messages", column("rowid"), column("sms_type_id"), column("time"), column("time_dt"),
+                           column("from_to"), column("text"), column("location_id"), column("contact_id"))
+conversations_table = table("conversations", column("rowid"), column("section"), column("name"), column("contact_id"),
+                            column("last_message"), column("last_time"), column("last_time_dt"), column("message_count"))
+installedapps_table = table("installedapps", column("rowid"), column("application_name"), column("package_name"),
+                            column("installed_date"))
+
+USER_PIC = {'profile_pic': '/static/images/user.png'}
+APP_ICON = {'icon': '/static/images/app_icon.png', 'version': '1.0'}
+
+
+class CompiledStatement:
+    """SQL compiled once from a SQLAlchemy statement, with the values of its literal parameters"""
+
+    def __init__(self, statement):
+        compiled = statement.compile(dialect=DIALECT)
+        self.sql = str(compiled)
+        self.text = text(self.sql)
+        # Parameters without a value (e.g. bindparam("limit")) are supplied on every execute
+        self.defaults = {name: value for name, value in compiled.params.items() if value is not None}
+
+    def params(self, **params):
+        return dict(self.defaults, **params)
+
+    def execute(self, conn, **params):
+        return conn.execute(self.text, self.params(**params))
+
+
+def encode_cursor(direction, sort_value, row_id):
+    """Encodes a keyset position as an opaque, URL-safe cursor string."""
+    payload = json.dumps([direction, sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor from encode_cursor, raising ValueError if it is malformed."""
+    try:
+        direction, sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if direction not in ('next', 'prev') or not isinstance(row_id, int):
+        raise ValueError('Invalid cursor')
+    return direction, sort_value, row_id
+
+
+def _rows_after(sort_column, rowid_column, sort_value, row_id):
+    """Rows after (sort_value, row_id) in (sort DESC, rowid DESC) order that share its NULL-ness.
+
+    A row-value comparison, so SQLite seeks the (sort, rowid) index instead of
+    walking it from the top. NULL sort values come last: the rows after a
+    non-NULL key are followed by the NULL tail, which is read separately.
+    """
+    if sort_value is None:
+        return and_(sort_column.is_(None), rowid_column < row_id)
+    return tuple_(sort_column, rowid_column) < tuple_(sort_value, row_id)
+
+
+def _rows_before(sort_column, rowid_column, sort_value, row_id):
+    """Rows before (sort_value, row_id) in (sort DESC, rowid DESC) order that share its NULL-ness (see _rows_after)."""
+    if sort_value is None:
+        return and_(sort_column.is_(None), rowid_column > row_id)
+    return tuple_(sort_column, rowid_column) > tuple_(sort_value, row_id)
+
+
+class PagedQuery:
+    """A query read a page at a time, newest first by (sort_column, rowid).
+
+    It is compiled once per variant: 'page' (LIMIT/OFFSET by page number, kept
+    for backward compatibility), 'next'/'prev' (keyset from a cursor, so deep
+    pages cost the same as the first one) and 'next_null'/'prev_null' (keyset
+    from a row whose sort value is NULL). A keyset page that crosses from the
+    non-NULL keys into the NULL tail (or back) is finished by 'null_tail' or
+    'key_head'. Every page selects one extra row, to tell whether it has a
+    successor, and appends the sort key and rowid as the last two columns.
+    'prev' pages return their rows oldest first.
+
+    The row count comes from count_query if given, else from table_stats for
+    count_table. allow lists the query_plans.py problems accepted for this query.
+    """
+
+    def __init__(self, name, base_query, sort_column, rowid_column, fields, extra=None, count_query=None,
+                 count_table=None, allow=()):
+        self.name = name
+        self.fields = fields
+        self.extra = extra
+        self.count_table = count_table
+        self.allow = tuple(allow)
+        self.count_statement = CompiledStatement(count_query) if count_query is not None else None
+        query = base_query.add_columns(sort_column.label("sort_key"), rowid_column.label("row_id"))
+        newest_first = query.order_by(sort_column.desc(), rowid_column.desc())
+        oldest_first = query.order_by(sort_column.asc(), rowid_column.asc())
+        limit = bindparam("limit")
+        sort_value, row_id = bindparam("sort_value"), bindparam("row_id")
+        variants = {
+            'page': newest_first.limit(limit).offset(bindparam("offset")),
+            'next': newest_first.where(_rows_after(sort_column, rowid_column, sort_value, row_id)).limit(limit),
+            'next_null': newest_first.where(_rows_after(sort_column, rowid_column, None, row_id)).limit(limit),
+            # First rows with a NULL sort value, read once 'next' runs out of non-NULL keys
+            'null_tail': newest_first.where(sort_column.is_(None)).limit(limit),
+            'prev': oldest_first.where(_rows_before(sort_column, rowid_column, sort_value, row_id)).limit(limit),
+            'prev_null': oldest_first.where(_rows_before(sort_column, rowid_column, None, row_id)).limit(limit),
+            # Lowest non-NULL keys, read once 'prev_null' runs out of NULL rows
+            'key_head': oldest_first.where(sort_column.isnot(None)).limit(limit)
+        }
+        self.statements = {variant: CompiledStatement(statement) for variant, statement in variants.items()}
+
+    def page_query(self, page, per_page, cursor=None, **params):
+        """Picks the statements that read one page.
+
+        Returns:
+            tuple: (steps, direction). steps is a list of (statement, parameters),
+            each continuing the page where the previous one ran out of rows (see
+            iter_page_rows); direction is None (page number), 'next' or 'prev'.
+        """
+        params['limit'] = per_page + 1
+        if cursor is None:
+            return [(self.statements['page'], dict(params, offset=(page - 1) * per_page))], None
+        direction, sort_value, row_id = decode_cursor(cursor)
+        if sort_value is None:
+            steps = [(self.statements[f'{direction}_null'], dict(params, row_id=row_id))]
+            if direction == 'prev':
+                steps.append((self.statements['key_head'], params))
+            return steps, direction
+        steps = [(self.statements[direction], dict(params, sort_value=sort_value, row_id=row_id))]
+        if direction == 'next':
+            steps.append((self.statements['null_tail'], params))
+        return steps, direction
+
+
+def iter_page_rows(conn, steps):
+    """Yields the rows of a page's steps (see PagedQuery.page_query), fetched in batches.
+
+    A step only runs if the ones before it returned fewer rows than the page's
+    limit, and is limited to the rows still missing.
+    """
+    remaining = steps[0][1]['limit']
+    for statement, params in steps:
+        result = statement.execute(conn, **dict(params, limit=remaining))
+        try:
+            for batch in iter(lambda: result.fetchmany(STREAM_FETCH_SIZE), []):
+                remaining -= len(batch)
+                yield from batch
+        finally:
+            result.close()
+        if remaining == 0:
+            return
+
+
+def page_cursors(first_row, last_row, has_next, has_prev):
+    """Returns (next_cursor, prev_cursor) for a page whose first and last rows come from a PagedQuery."""
+    next_cursor = encode_cursor('next', last_row[-2], last_row[-1]) if last_row is not None and has_next else None
+    prev_cursor = encode_cursor('prev', first_row[-2], first_row[-1]) if first_row is not None and has_prev else None
+    return next_cursor, prev_cursor
+
+
+def fetch_page(conn, paged_query, page, per_page, cursor=None, **params):
+    """Fetches one page of paged_query (see PagedQuery.page_query).
+
+    Returns:
+        tuple: (rows, next_cursor, prev_cursor). The sort key and rowid are
+        appended as the last two columns of each row.
+    """
+    steps, direction = paged_query.page_query(page, per_page, cursor, **params)
+    rows = list(iter_page_rows(conn, steps))
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, direction == 'next' or page > 1
+    next_cursor, prev_cursor = page_cursors(rows[0] if rows else None, rows[-1] if rows else None, has_next, has_prev)
+    return rows, next_cursor, prev_cursor
+
+
+def stream_page_rows(conn, steps, per_page, state):
+    """Yields up to per_page rows of a page's steps, fetched from the database in batches.
+
+    The first and last rows and whether more rows follow are recorded in state,
+    for page_cursors once the page has been streamed.
+    """
+    rows = iter_page_rows(conn.execution_options(stream_results=True), steps)
+    count = 0
+    for row in rows:
+        if count == per_page:
+            state['has_more'] = True
+            rows.close()
+            return
+        if count == 0:
+            state['first'] = row
+        state['last'] = row
+        count += 1
+        yield row
+
+
+def _conversations_section(section):
+    conv = conversations_table
+    return PagedQuery(
+        section,
+        select(conv.c.name, conv.c.last_message, conv.c.last_time, conv.c.message_count)
+        .select_from(conv).where(conv.c.section == section),
+        conv.c.last_time_dt, conv.c.rowid,
+        fields=('name', 'last_message', 'time', 'message_count'),
+        extra=USER_PIC,
+        count_query=select(func.count()).select_from(conv).where(conv.c.section == section)
+    )
+
+
+def _calls_section():
+    c = calls_table.alias("c")
+    l = locations_table.alias("l")
+    con = contacts_table.alias("con")
+    return PagedQuery(
+        'calls',
+        select(
+            c.c.call_type,
+            c.c.time,
+            # The contact's name where the number is linked to one, as in the conversation lists
+            func.coalesce(con.c.name, func.nullif(c.c.from_to, ''), 'Unknown'),
+            c.c.duration,
+            func.coalesce(func.nullif(l.c.location_text, ''), 'Unknown')
+        ).select_from(
+            c.outerjoin(l, c.c.location_id == l.c.location_id)
+             .outerjoin(con, c.c.contact_id == con.c.contact_id)
+        ),
+        c.c.time_dt, c.c.rowid,
+        fields=('call_type', 'time', 'name', 'duration', 'location'),
+        extra=USER_PIC,
+        count_table='calls'
+    )
+
+
+# Query, sort key and output fields of each /get_data section
+DATA_SECTIONS = {
+    'chats': _conversations_section('chats'),
+    'sms': _conversations_section('sms'),
+    'calls': _calls_section(),
+    'keylogs': PagedQuery(
+        'keylogs',
+        select(keylogs_table.c.application, keylogs_table.c.time, keylogs_table.c.text).select_from(keylogs_table),
+        keylogs_table.c.time_dt, keylogs_table.c.rowid,
+        fields=('application', 'time', 'text'),
+        count_table='keylogs'
+    ),
+    'contacts': PagedQuery(
+        'contacts',
+        select(contacts_table.c.name, contacts_table.c.phone_number, contacts_table.c.email_id).select_from(contacts_table),
+        contacts_table.c.name, contacts_table.c.rowid,
+        fields=('name', 'phone_number', 'email_id'),
+        extra=USER_PIC,
+        count_table='contacts'
+    ),
+    'installed_apps': PagedQuery(
+        'installed_apps',
+        select(installedapps_table.c.application_name, installedapps_table.c.package_name,
+               installedapps_table.c.installed_date).select_from(installedapps_table),
+        installedapps_table.c.application_name, installedapps_table.c.rowid,
+        fields=('name', 'package_name', 'installed_date'),
+        extra=APP_ICON,
+        count_table='installedapps'
+    )
+}
+
+# A conversation's contact_id and message count, by (section, name)
+CONVERSATION_LOOKUP = CompiledStatement(
+    select(conversations_table.c.contact_id, conversations_table.c.message_count)
+    .where(and_(conversations_table.c.section == bindparam("section"), conversations_table.c.name == bindparam("name")))
+)
+
+
+def _conversation_messages(section, by_contact, unknown):
+    """Messages of one conversation: sent by :name, or (by_contact) linked to :contact_id.
+
+    The unknown conversation (UNKNOWN_CONVERSATION) also holds the messages with no sender.
+    """
+    if section == 'chats':
+        m = chat_messages_table
+        name_column = m.c.sender
+    else:
+        m = sms_messages_table
+        name_column = m.c.from_to
+    condition = name_column == bindparam("name")
+    if unknown:
+        # Same rule as the conversations triggers: COALESCE(contact name, NULLIF(sender, ''), 'Unknown')
+        condition = or_(condition, name_column.is_(None), name_column == '')
+    allow = ()
+    if by_contact:
+        condition = or_(condition, m.c.contact_id == bindparam("contact_id"))
+    if by_contact or unknown:
+        # Rows come from several index lookups and are merged, so they are sorted;
+        # the sort only ever holds one conversation's messages
+        allow = ('temp_sort',)
+    return PagedQuery(f"{section} {'unknown ' if unknown else ''}conversation{' by contact' if by_contact else ''}",
+                      select(name_column, m.c.text, m.c.time).select_from(m).where(condition),
+                      m.c.time_dt, m.c.rowid, fields=('sender', 'content', 'time'), allow=allow)
+
+
+# /get_conversation queries by (section, whether the conversation has a contact_id, whether it is the unknown one)
+CONVERSATION_MESSAGES = {(section, by_contact, unknown): _conversation_messages(section, by_contact, unknown)
+                         for section in ('chats', 'sms') for by_contact in (False, True) for unknown in (False, True)}
+
+
+def conversation_messages(section, name, contact_id):
+    """The CONVERSATION_MESSAGES query of the conversation section/name"""
+    return CONVERSATION_MESSAGES[(section, contact_id is not None, name == UNKNOWN_CONVERSATION)]
+
+
+# PagedQuery variants that locate their rows by key, so must seek an index rather than walk it
+SEEK_VARIANTS = ('next', 'next_null', 'null_tail', 'prev', 'prev_null', 'key_head')
+
+
+def iter_statements():
+    """Yields (label, statement, allow, seek) for every compiled statement served by the app.
+
+    seek is True for statements that look rows up by key (see query_plans.plan_problems).
+    """
+    for paged_query in list(DATA_SECTIONS.values()) + list(CONVERSATION_MESSAGES.values()):
+        for variant, statement in paged_query.statements.items():
+            yield f"{paged_query.name} ({variant})", statement, paged_query.allow, variant in SEEK_VARIANTS
+        if paged_query.count_statement is not None:
+            yield f"{paged_query.name} (count)", paged_query.count_statement, paged_query.allow, False
+    yield "conversation lookup", CONVERSATION_LOOKUP, (), True
@@ -0,0 +1,103 @@
+"""Checks the plans SQLite picks for the statements in queries.py.
+
+Each statement is run through EXPLAIN QUERY PLAN. It fails the check if a
+table is read with a full scan, rows are sorted in a temporary B-tree, or a
+statement that looks rows up by key (a cursor page) walks an index from one
+end instead of seeking it; a query may accept any of these via its allow list. The web app runs the check at startup (see QUERY_PLAN_CHECK in
+app.py); run it against a database to catch a regression before deploying:
+
+    python query_plans.py my_database.db            # exits 1 if a plan fails
+    python query_plans.py my_database.db --verbose  # also prints every plan
+"""
+import argparse
+import logging
+import sys
+from sqlalchemy import text
+from database_utils import create_database_engine
+import queries
+
+# Bound when explaining a statement; the plan does not depend on the values
+EXPLAIN_PARAMS = {'limit': 11, 'offset': 0, 'sort_value': 0, 'row_id': 0, 'section': '', 'name': '', 'contact_id': 0}
+# Values of QUERY_PLAN_CHECK: skip the check, log failing plans, or refuse to start
+CHECK_MODES = ("off", "warn", "strict")
+
+
+def explain(conn, statement):
+    """Returns the detail lines of EXPLAIN QUERY PLAN for a queries.CompiledStatement"""
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {statement.sql}"), statement.params(**EXPLAIN_PARAMS))
+    return [row[3] for row in rows]
+
+
+def plan_problems(details, allow=(), seek=False):
+    """Returns [(kind, detail)] for the plan lines that read a table or sort the wrong way.
+
+    kind is 'full_scan' for a table read without an index (SQLite shows
+    "SCAN <table>"), 'temp_sort' for "USE TEMP B-TREE FOR ...", and, when seek
+    is set, 'index_walk' for "SCAN <table> USING INDEX ...": the index is read
+    from one end, so the cost grows with how deep the wanted rows are, where
+    a seek ("SEARCH <table> USING INDEX ... (col<?)") goes straight to them.
+    Kinds in allow are skipped.
+    """
+    problems = []
+    for detail in details:
+        if detail.startswith("SCAN ") and "CONSTANT ROW" not in detail:
+            if " USING " not in detail:
+                if "full_scan" not in allow:
+                    problems.append(("full_scan", detail))
+            elif seek and "index_walk" not in allow:
+                problems.append(("index_walk", detail))
+        if "USE TEMP B-TREE" in detail and "temp_sort" not in allow:
+            problems.append(("temp_sort", detail))
+    return problems
+
+
+def check_query_plans(db_engine):
+    """Explains every statement in queries.py.
+
+    Returns:
+        list: (label, plan detail lines, problems) per statement. A statement
+        that cannot be explained (e.g. a missing table) has an 'error' problem.
+    """
+    results = []
+    with db_engine.connect() as conn:
+        for label, statement, allow, seek in queries.iter_statements():
+            try:
+                details = explain(conn, statement)
+            except Exception as e:
+                results.append((label, [], [("error", str(e))]))
+                continue
+            results.append((label, details, plan_problems(details, allow, seek)))
+    return results
+
+
+def startup_check(db_engine, mode="warn"):
+    """Runs check_query_plans at startup: mode 'off' skips it, 'warn' logs failing plans, 'strict' raises"""
+    if mode not in CHECK_MODES:
+        raise ValueError(f"Unknown query plan check mode: {mode}")
+    if mode == "off":
+        return
+    failed = [(label, problems) for label, _, problems in check_query_plans(db_engine) if problems]
+    for label, problems in failed:
+        for kind, detail in problems:
+            logging.warning(f"Query plan check: {label}: {kind}: {detail}")
+    if failed and mode == "strict":
+        raise RuntimeError(f"Query plan check failed for: {', '.join(label for label, _ in failed)}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Check the query plans of the /get_data and /get_conversation statements.")
+    arg_parser.add_argument("db_path", nargs="?", default="my_database.db")
+    arg_parser.add_argument("--verbose", action="store_true", help="print the SQL and plan of every statement")
+    args = arg_parser.parse_args()
+    failures = 0
+    for label, details, problems in check_query_plans(create_database_engine(args.db_path)):
+        failures += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':4s}  {label}")
+        for kind, detail in problems:
+            print(f"      {kind}: {detail}")
+        if args.verbose:
+            for detail in details:
+                print(f"      | {detail}")
+    if failures:
+        print(f"{failures} statement(s) failed the query plan check", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Serialized pages kept in memory; the whole cache is dropped when the data generation changes
+MAX_CACHED_PAGES = 256
+
+
+class DataGeneration:
+    """Version number of the data the app serves.
+
+    Bumped after every successful import, and whenever the database files are
+    modified by another process (e.g. main.py), detected with os.stat so that
+    checking the generation never touches SQLite. Each app start gets its own
+    ETag prefix, so cached responses from a previous run are never reused.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self.value = 0
+        self.last_modified = time.time()
+        self._prefix = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._file_state = self._stat_files()
+
+    def _stat_files(self):
+        if not self.db_path:
+            return None
+        state = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                state.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                state.append(None)
+        return tuple(state)
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+            self.last_modified = time.time()
+            return self.value
+
+    def current(self):
+        """Returns the current generation, bumping it first if the database files changed"""
+        file_state = self._stat_files()
+        if file_state != self._file_state:
+            with self._lock:
+                if file_state != self._file_state:
+                    self._file_state = file_state
+                    self.value += 1
+                    self.last_modified = time.time()
+        return self.value
+
+    def etag(self, generation):
+        return f"{self._prefix}-{generation}"
+
+
+class PageCache:
+    """Bounded LRU of serialized response bodies for one data generation"""
+    def __init__(self, max_size=MAX_CACHED_PAGES):
+        self.max_size = max_size
+        self.generation = None
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generation):
+        with self._lock:
+            if generation != self.generation:
+                self._pages.clear()
+                self.generation = generation
+            payload = self._pages.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, generation, payload):
+        with self._lock:
+            if generation != self.generation:
+                # The data changed while this page was being built
+                return
+            self._pages[key] = payload
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_size:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        return {"size": len(self._pages), "generation": self.generation, "hits": self.hits, "misses": self.misses}
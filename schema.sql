@@ -1,36 +1,36 @@
 CREATE TABLE IF NOT EXISTS keylogs (
-    application TEXT,
+    application_id INTEGER,
     time TEXT,
-    time_dt DATETIME,
+    time_dt INTEGER,
     text TEXT,
     package_id TEXT,
-    UNIQUE(application, time, text)
+    UNIQUE(application_id, time, text)
 );
 
 CREATE INDEX IF NOT EXISTS idx_keylogs_time_dt ON keylogs(time_dt);
 
 CREATE TABLE IF NOT EXISTS sms_messages (
-    sms_type TEXT,
+    sms_type_id INTEGER,
     time TEXT,
-    time_dt DATETIME,
+    time_dt INTEGER,
     from_to TEXT,
     text TEXT,
     location_id INTEGER,
     contact_id INTEGER,
-    UNIQUE(sms_type, time, from_to, text)
+    UNIQUE(sms_type_id, time, from_to, text)
 );
 
 CREATE INDEX IF NOT EXISTS idx_sms_messages_time_dt ON sms_messages(time_dt);
 CREATE INDEX IF NOT EXISTS idx_sms_messages_contact_id ON sms_messages(contact_id);
 
 CREATE TABLE IF NOT EXISTS chat_messages (
-    messenger TEXT,
+    messenger_id INTEGER,
     time TEXT,
-    time_dt DATETIME,
+    time_dt INTEGER,
     sender TEXT,
     text TEXT,
     contact_id INTEGER,
-    UNIQUE(messenger, time, sender, text)
+    UNIQUE(messenger_id, time, sender, text)
 );
 
 CREATE INDEX IF NOT EXISTS idx_chat_messages_time_dt ON chat_messages(time_dt);
@@ -44,21 +44,21 @@ CREATE TABLE IF NOT EXISTS contacts (
     phone_number TEXT,
     email_id TEXT,
     last_contacted TEXT,
-    last_contacted_dt DATETIME,
+    last_contacted_dt INTEGER,
     UNIQUE(name, phone_number, email_id)
 );
 CREATE INDEX IF NOT EXISTS idx_contacts_name ON contacts(name);
 
 
 CREATE TABLE IF NOT EXISTS calls (
-    call_type TEXT,
+    call_type_id INTEGER,
     time TEXT,
-    time_dt DATETIME,
+    time_dt INTEGER,
     from_to TEXT,
     duration INTEGER,
     location_id INTEGER,
     contact_id INTEGER,
-     UNIQUE(call_type, time, from_to)
+     UNIQUE(call_type_id, time, from_to)
 );
 
 CREATE INDEX IF NOT EXISTS idx_calls_time_dt ON calls(time_dt);
@@ -78,4 +78,68 @@ CREATE TABLE IF NOT EXISTS locations (
     location_id INTEGER PRIMARY KEY AUTOINCREMENT,
     location_text TEXT UNIQUE
 );
-CREATE INDEX IF NOT EXISTS idx_locations_location_text ON locations(location_text);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_locations_location_text ON locations(location_text);
+
+-- Cached row counts for /get_data; the count triggers are created by database_utils.create_table_stats
+CREATE TABLE IF NOT EXISTS table_stats (
+    table_name TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL DEFAULT 0
+);
+
+
+-- Per-contact chat/SMS summaries; maintained by triggers created in database_utils.create_conversations
+CREATE TABLE IF NOT EXISTS conversations (
+    section TEXT NOT NULL,
+    name TEXT NOT NULL,
+    contact_id INTEGER,
+    last_message TEXT,
+    last_time TEXT,
+    last_time_dt INTEGER,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (section, name)
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_by_last_time ON conversations(section, last_time_dt);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_by_sender ON chat_messages(sender, time_dt);
+CREATE INDEX IF NOT EXISTS idx_sms_messages_by_from_to ON sms_messages(from_to, time_dt);
+
+
+-- Lookup tables of the dictionary-encoded columns, and views reading them back as text
+CREATE TABLE IF NOT EXISTS applications (application_id INTEGER PRIMARY KEY, application TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS messengers (messenger_id INTEGER PRIMARY KEY, messenger TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS sms_types (sms_type_id INTEGER PRIMARY KEY, sms_type TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS call_types (call_type_id INTEGER PRIMARY KEY, call_type TEXT UNIQUE NOT NULL);
+CREATE VIEW IF NOT EXISTS keylogs_decoded AS
+    SELECT t.rowid AS rowid, t.*, d.application AS application
+    FROM keylogs t LEFT JOIN applications d ON d.application_id = t.application_id;
+CREATE VIEW IF NOT EXISTS chat_messages_decoded AS
+    SELECT t.rowid AS rowid, t.*, d.messenger AS messenger
+    FROM chat_messages t LEFT JOIN messengers d ON d.messenger_id = t.messenger_id;
+CREATE VIEW IF NOT EXISTS sms_messages_decoded AS
+    SELECT t.rowid AS rowid, t.*, d.sms_type AS sms_type
+    FROM sms_messages t LEFT JOIN sms_types d ON d.sms_type_id = t.sms_type_id;
+CREATE VIEW IF NOT EXISTS calls_decoded AS
+    SELECT t.rowid AS rowid, t.*, d.call_type AS call_type
+    FROM calls t LEFT JOIN call_types d ON d.call_type_id = t.call_type_id;
+
+
+-- Files already imported, keyed by the SHA-256 of their contents
+CREATE TABLE IF NOT EXISTS import_ledger (
+    file_hash TEXT PRIMARY KEY,
+    file_name TEXT,
+    table_name TEXT,
+    rows_read INTEGER,
+    rows_inserted INTEGER,
+    rows_rejected INTEGER,
+    duration_sec REAL,
+    status TEXT,
+    imported_at DATETIME,
+    stage_timings TEXT
+);
+
+
+-- Migrations applied to this database (see migrations.py)
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TEXT NOT NULL
+);
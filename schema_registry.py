@@ -0,0 +1,143 @@
+import logging
+
+# Minimum share of headers a file must have in common with a table to be imported into it
+MIN_MATCH_SCORE = 0.6
+# Distinct header rows remembered per registry; banner scans also score a few data rows
+MATCH_CACHE_SIZE = 1024
+# Export headers that differ from the column name the table expects, after normalization
+HEADER_ALIASES = {
+    "from/to": "from_to",
+    "email": "email_id",
+    "duration_(sec)": "duration",
+    "location": "location_text"
+}
+
+
+def normalize_header(col):
+    """Normalizes a header for comparison: lower case, stripped, spaces as underscores"""
+    return str(col).lower().strip().replace(' ', '_')
+
+
+class SchemaMatch:
+    """The table chosen for a set of file headers and why.
+
+    score is the share of the combined (file + expected) headers that matched,
+    1.0 for an exact match. renames maps file headers to the column names the
+    table expects, for headers that only matched through HEADER_ALIASES.
+    """
+    def __init__(self, table_name, score, matched, missing, unexpected, renames):
+        self.table_name = table_name
+        self.score = score
+        self.matched = matched
+        self.missing = missing
+        self.unexpected = unexpected
+        self.renames = renames
+
+    def to_dict(self):
+        return {
+            "table_name": self.table_name,
+            "score": round(self.score, 3),
+            "matched": sorted(self.matched),
+            "missing": sorted(self.missing),
+            "unexpected": sorted(self.unexpected),
+            "renames": self.renames
+        }
+
+    def __repr__(self):
+        return f"SchemaMatch({self.table_name!r}, score={self.score:.2f}, missing={sorted(self.missing)})"
+
+
+class SchemaRegistry:
+    """Header signatures of every table, compiled once from a table mapping.
+
+    Files are matched against all tables in a single pass over their headers;
+    results are cached per header row, so the chunks and files of one export
+    layout are only ever scored once.
+    """
+    def __init__(self, table_mapping, aliases=None, min_score=MIN_MATCH_SCORE):
+        self.aliases = HEADER_ALIASES if aliases is None else aliases
+        self.min_score = min_score
+        self.signatures = {table_name: frozenset(normalize_header(col) for col in columns)
+                           for table_name, columns in table_mapping.items()}
+        # Normalized header -> tables expecting it
+        self._tables_by_header = {}
+        for table_name, signature in self.signatures.items():
+            for header in signature:
+                self._tables_by_header.setdefault(header, []).append(table_name)
+        self._cache = {}
+
+    def canonical_header(self, col):
+        header = normalize_header(col)
+        return self.aliases.get(header, header)
+
+    def match(self, headers):
+        """Returns the best SchemaMatch for a list of file headers, or None if no table scores high enough"""
+        headers = tuple(str(col) for col in headers if col is not None and not str(col).startswith('Unnamed:'))
+        if headers in self._cache:
+            return self._cache[headers]
+        canonical = {}
+        for col in headers:
+            canonical.setdefault(self.canonical_header(col), col)
+        hits = {}
+        for header in canonical:
+            for table_name in self._tables_by_header.get(header, ()):
+                hits[table_name] = hits.get(table_name, 0) + 1
+        best = None
+        for table_name, hit_count in hits.items():
+            signature = self.signatures[table_name]
+            score = hit_count / len(signature | canonical.keys())
+            if best is None or score > best[1]:
+                best = (table_name, score)
+        result = None
+        if best is not None and best[1] >= self.min_score:
+            table_name, score = best
+            signature = self.signatures[table_name]
+            matched = signature & canonical.keys()
+            result = SchemaMatch(table_name, score, matched, signature - matched, canonical.keys() - signature,
+                                 {canonical[h]: h for h in matched if normalize_header(canonical[h]) != h})
+        if len(self._cache) >= MATCH_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[headers] = result
+        return result
+
+    def find_header_row(self, rows):
+        """Returns (index, SchemaMatch) of the header row among the first rows of a sheet.
+
+        Exports start with a one-cell banner ("Tracking Smartphone - ...") above the
+        real header. The row that best matches a table is the header; if none does,
+        the first row with more than one non-empty cell is used and the match is None.
+        """
+        fallback = None
+        best = (None, None)
+        for index, row in enumerate(rows):
+            cells = [str(value).strip() for value in row if value is not None and str(value).strip() != '']
+            if len(cells) > 1 and fallback is None:
+                fallback = index
+            if not cells:
+                continue
+            result = self.match(cells)
+            if result is not None and (best[1] is None or result.score > best[1].score):
+                best = (index, result)
+        if best[0] is not None:
+            return best
+        return (fallback or 0), None
+
+    def identify(self, headers):
+        """Returns the table name for a list of file headers and logs the decision"""
+        result = self.match(headers)
+        if result is None:
+            logging.error(f"No matching table schema found for headers: {list(headers)}")
+            return None
+        logging.info(f"Matched {result.table_name} table with score {result.score:.2f}")
+        return result.table_name
+
+
+_registries = {}
+
+
+def get_schema_registry(table_mapping):
+    """Returns the compiled SchemaRegistry for a table mapping, compiling it on first use"""
+    key = tuple((table_name, tuple(columns)) for table_name, columns in table_mapping.items())
+    if key not in _registries:
+        _registries[key] = SchemaRegistry(table_mapping)
+    return _registries[key]
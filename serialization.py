@@ -0,0 +1,45 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is used without it
+    orjson = None
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Rows fetched from the database per round trip while streaming
+STREAM_FETCH_SIZE = 1000
+
+
+def dumps(obj):
+    """Serializes obj to JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode()
+
+
+def rows_to_records(rows, fields, extra=None):
+    """Turns cursor tuples into response records.
+
+    fields names the leading columns of each row; any columns after them (e.g.
+    the sort key appended by fetch_page) are dropped. extra holds constant keys
+    added to every record.
+    """
+    if extra:
+        return [dict(zip(fields, row), **extra) for row in rows]
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def iter_ndjson(rows, fields, extra=None, meta=None):
+    """Yields one NDJSON line per row, then a final {"meta": ...} line.
+
+    meta may be a callable, evaluated after the last row so it can report
+    values (like the next-page cursor) that are only known at the end.
+    """
+    newline = b'\n'
+    for row in rows:
+        record = dict(zip(fields, row))
+        if extra:
+            record.update(extra)
+        yield dumps(record) + newline
+    if meta is not None:
+        yield dumps({'meta': meta() if callable(meta) else meta}) + newline
@@ -24,97 +24,344 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentPage = 1;
     let perPage = 10;
 
-     // Generic function to fetch and load data
-    async function fetchData(sectionId, page = 1, perPage = 10) {
+     // Pages already fetched, by url, with their ETag; revisiting a page only revalidates it (304 Not Modified).
+     // Kept in least recently used order (a Map iterates in insertion order) and capped at PAGE_CACHE_SIZE pages.
+     const PAGE_CACHE_SIZE = 50;
+     const pageCache = new Map();
+     // The ETag is the server's data generation, shared by every page; a new one means every cached page is stale
+     let pageCacheEtag = null;
+
+     function cachePage(url, etag, data) {
+         if (etag !== pageCacheEtag) {
+             pageCache.clear();
+             pageCacheEtag = etag;
+         }
+         pageCache.delete(url);
+         pageCache.set(url, { etag, data });
+         if (pageCache.size > PAGE_CACHE_SIZE) {
+             pageCache.delete(pageCache.keys().next().value);
+         }
+     }
+
+     // Reads an NDJSON page (one record per line, then a {"meta": ...} line) into the same shape as a JSON page;
+     // a final {"error": ...} line (the server failed mid-stream) is thrown
+     async function readNdjson(response) {
+         const reader = response.body.getReader();
+         const decoder = new TextDecoder();
+         const page = { data: [] };
+         let buffer = '';
+         const handleLine = line => {
+             if (!line) return;
+             const item = JSON.parse(line);
+             if (item.error) {
+                 // The server failed part way through the page
+                 throw new Error(item.error);
+             }
+             if (item.meta) {
+                 Object.assign(page, item.meta);
+             } else {
+                 page.data.push(item);
+             }
+         };
+         while (true) {
+             const { done, value } = await reader.read();
+             if (done) break;
+             buffer += decoder.decode(value, { stream: true });
+             const lines = buffer.split('\n');
+             buffer = lines.pop();
+             lines.forEach(handleLine);
+         }
+         handleLine(buffer + decoder.decode());
+         return page;
+     }
+
+     async function fetchJsonCached(url) {
+         const cached = pageCache.get(url);
+         const headers = cached ? { 'If-None-Match': cached.etag } : {};
+         const response = await fetch(url, { headers, cache: 'no-store' });
+         if (response.status === 304 && cached) {
+             cachePage(url, cached.etag, cached.data);
+             return cached.data;
+         }
+         if (!response.ok) {
+             throw new Error(`HTTP error! status: ${response.status}`);
+         }
+         if ((response.headers.get('Content-Type') || '').includes('application/x-ndjson')) {
+             // Streamed pages are large; they are not kept in pageCache
+             return await readNdjson(response);
+         }
+         const data = await response.json();
+         const etag = response.headers.get('ETag');
+         if (etag) {
+             cachePage(url, etag, data);
+         }
+         return data;
+     }
+
+     // Generic function to fetch and load data; a cursor (from next_cursor/prev_cursor) takes precedence over the page number
+    async function fetchData(sectionId, page = 1, perPage = 10, cursor = null) {
       try {
-          const response = await fetch(`/get_data?section=${sectionId}&page=${page}&per_page=${perPage}`);
-          if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-           }
-           return await response.json();
+          let url = `/get_data?section=${sectionId}&page=${page}&per_page=${perPage}`;
+          if (cursor) {
+              url += `&cursor=${encodeURIComponent(cursor)}`;
+          }
+          return await fetchJsonCached(url);
       } catch (error) {
           console.error(`Error loading data for ${sectionId}:`, error);
            return null;
       }
    }
 
-     // Generic function to display data
-    function displayData(sectionId, data) {
-       const container = document.getElementById(`${sectionId}-list`) || document.querySelector(`#${sectionId}-table tbody`);
+     // Renders only the rows of a long list that are in (or near) the viewport, reusing their DOM nodes while
+     // scrolling. Rows may differ in height: each is measured once rendered, unmeasured rows use the estimate.
+     class VirtualList {
+         constructor(scrollElement, container, options) {
+             this.scrollElement = scrollElement;
+             this.container = container;
+             this.createRow = options.createRow;
+             this.renderRow = options.renderRow;
+             this.estimatedRowHeight = options.estimatedRowHeight || 60;
+             this.overscan = options.overscan || 10;
+             this.onNearEnd = options.onNearEnd || null;
+             this.onNearStart = options.onNearStart || null;
+             this.items = [];
+             this.rows = [];
+             this.heights = new WeakMap();
+             this.frame = null;
+             const spacerTag = options.spacerTag || 'div';
+             this.topSpacer = this.createSpacer(spacerTag);
+             this.bottomSpacer = this.createSpacer(spacerTag);
+             this.container.replaceChildren(this.topSpacer, this.bottomSpacer);
+             // Flex gap between rows, added to each measured row height
+             this.gap = parseFloat(getComputedStyle(container).rowGap) || 0;
+             this.onScroll = () => {
+                 if (this.frame === null) {
+                     this.frame = requestAnimationFrame(() => {
+                         this.frame = null;
+                         this.render();
+                     });
+                 }
+             };
+             this.scrollElement.addEventListener('scroll', this.onScroll, { passive: true });
+             window.addEventListener('resize', this.onScroll);
+         }
 
-        if(!container){
-            console.error(`Container not found for section: ${sectionId}`)
-             return;
-        }
-         container.innerHTML = '';
+         createSpacer(tag) {
+             const spacer = document.createElement(tag);
+             spacer.classList.add('virtual-spacer');
+             if (tag === 'tr') {
+                 const cell = document.createElement('td');
+                 cell.colSpan = 100;
+                 spacer.appendChild(cell);
+             }
+             return spacer;
+         }
 
-        if (!data || data.length === 0){
-           return;
-        }
+         destroy() {
+             this.scrollElement.removeEventListener('scroll', this.onScroll);
+             window.removeEventListener('resize', this.onScroll);
+             if (this.frame !== null) {
+                 cancelAnimationFrame(this.frame);
+             }
+         }
 
-        if (sectionId === 'keylogs') {
-             data.forEach(item => {
-                const row = document.createElement('tr');
-                 row.innerHTML = `
-                      <td>${item.application}</td>
-                       <td>${item.time}</td>
-                      <td>${item.text}</td>
-                   `;
-                   container.appendChild(row);
-            });
-            return;
-        }
+         heightOf(item) {
+             return this.heights.get(item) || this.estimatedRowHeight;
+         }
 
-        data.forEach(item => {
-           const element = document.createElement('div');
-           element.classList.add(`${sectionId.slice(0, -1)}-item`);
-
-           let content;
-              if(sectionId === 'chats' || sectionId === 'sms'){
-                content = `
-                     <img src="${item.profile_pic}" alt="${item.name}">
-                    <div>
-                        <h3>${item.name}</h3>
-                        <p>${item.last_message}</p>
-                    </div>
-                 `;
-
-                 element.addEventListener('click', () => {
-                   if (sectionId === 'chats') {
-                     openChatWindow(item.name, item.messages);
-                    } else if (sectionId === 'sms') {
-                       openSmsWindow(item.name, item.messages);
-                    }
-                });
-              } else if (sectionId === 'calls') {
-                content = `
-                  <img src="${item.profile_pic}" alt="${item.name}">
-                   <div>
-                        <h3>${item.name}</h3>
-                        <p>${item.time}</p>
-                    </div>
-                 `;
-              }else if (sectionId === 'contacts') {
-               content = `
-                   <img src="${item.profile_pic}" alt="${item.name}">
-                    <div>
-                        <h3>${item.name}</h3>
-                        <p>${item.phone_number}</p>
-                    </div>
-                  `;
-                } else if(sectionId === 'installed_apps'){
-                   content = `
-                      <img src="${item.icon}" alt="${item.name}">
-                     <div>
-                        <h3>${item.name}</h3>
-                         <p>${item.version}</p>
-                     </div>
-                    `;
-                }
+         // Distance from the top of the scrolled content to the top of the list
+         listOffset() {
+             if (this.container === this.scrollElement) return 0;
+             return this.container.getBoundingClientRect().top - this.scrollElement.getBoundingClientRect().top
+                 + this.scrollElement.scrollTop;
+         }
 
-            element.innerHTML = content;
-             container.appendChild(element);
-         })
+         setItems(items) {
+             this.items = items;
+             this.render();
+         }
+
+         appendItems(items) {
+             this.items = this.items.concat(items);
+             this.render();
+         }
+
+         // Adds rows above the current ones, keeping the rows on screen where they are
+         prependItems(items) {
+             this.items = items.concat(this.items);
+             this.scrollElement.scrollTop += items.reduce((total, item) => total + this.heightOf(item), 0);
+             this.render();
+         }
+
+         scrollToEnd() {
+             this.scrollElement.scrollTop = this.scrollElement.scrollHeight;
+             this.render();
+             // Rows measured by the render above may have changed the total height
+             this.scrollElement.scrollTop = this.scrollElement.scrollHeight;
+             this.render();
+         }
+
+         render() {
+             const items = this.items;
+             const viewTop = Math.max(0, this.scrollElement.scrollTop - this.listOffset());
+             const viewBottom = viewTop + this.scrollElement.clientHeight;
+
+             // First and last visible rows, widened by the overscan on both sides
+             let first = 0;
+             let top = 0;
+             while (first < items.length && top + this.heightOf(items[first]) <= viewTop) {
+                 top += this.heightOf(items[first]);
+                 first++;
+             }
+             let last = first;
+             let bottom = top;
+             while (last < items.length && bottom < viewBottom) {
+                 bottom += this.heightOf(items[last]);
+                 last++;
+             }
+             for (let i = 0; i < this.overscan && first > 0; i++) {
+                 first--;
+                 top -= this.heightOf(items[first]);
+             }
+             last = Math.min(items.length, last + this.overscan);
+             let below = 0;
+             for (let i = last; i < items.length; i++) {
+                 below += this.heightOf(items[i]);
+             }
+
+             while (this.rows.length < last - first) {
+                 const row = this.createRow();
+                 this.container.insertBefore(row, this.bottomSpacer);
+                 this.rows.push(row);
+             }
+             const rendered = [];
+             this.rows.forEach((row, i) => {
+                 const item = items[first + i];
+                 if (first + i < last) {
+                     if (row._item !== item) {
+                         row._item = item;
+                         this.renderRow(row, item);
+                         rendered.push(row);
+                     }
+                     row.style.display = '';
+                 } else {
+                     row._item = undefined;
+                     row.style.display = 'none';
+                 }
+             });
+             this.topSpacer.style.height = `${Math.max(0, top)}px`;
+             this.bottomSpacer.style.height = `${below}px`;
+
+             // Measured after all rows are updated, so layout is computed once
+             rendered.forEach(row => {
+                 const style = getComputedStyle(row);
+                 const height = row.offsetHeight + this.gap + (parseFloat(style.marginTop) || 0)
+                     + (parseFloat(style.marginBottom) || 0);
+                 this.heights.set(row._item, height);
+             });
+
+             if (this.onNearEnd && items.length > 0 && last === items.length) {
+                 this.onNearEnd();
+             }
+             if (this.onNearStart && items.length > 0 && first === 0) {
+                 this.onNearStart();
+             }
+         }
+     }
+
+     // List element and row class of each section, as in base.html and style.css
+     const LIST_CONTAINERS = {
+         chats: '#chat-list',
+         calls: '#calls-list',
+         keylogs: '#keylogs-table tbody',
+         contacts: '#contacts-list',
+         sms: '#sms-list',
+         installed_apps: '#apps-list'
+     };
+     const ITEM_CLASSES = {
+         chats: 'chat-item',
+         calls: 'call-item',
+         contacts: 'contact-item',
+         sms: 'sms-item',
+         installed_apps: 'app-item'
+     };
+
+     function createItemRow(sectionId) {
+         if (sectionId === 'keylogs') {
+             const row = document.createElement('tr');
+             row.append(document.createElement('td'), document.createElement('td'), document.createElement('td'));
+             return row;
+         }
+         const element = document.createElement('div');
+         element.classList.add(ITEM_CLASSES[sectionId]);
+         const details = document.createElement('div');
+         details.append(document.createElement('h3'), document.createElement('p'));
+         element.append(document.createElement('img'), details);
+         if (sectionId === 'chats' || sectionId === 'sms') {
+             // Rows are reused, so the handler opens whichever conversation the row shows when clicked
+             element.addEventListener('click', () => {
+                 if (sectionId === 'chats') {
+                     openChatWindow(element._item.name);
+                 } else {
+                     openSmsWindow(element._item.name);
+                 }
+             });
+         }
+         return element;
+     }
+
+     function renderItemRow(sectionId, row, item) {
+         if (sectionId === 'keylogs') {
+             const [application, time, text] = row.children;
+             application.textContent = item.application;
+             time.textContent = item.time;
+             text.textContent = item.text;
+             return;
+         }
+         const image = row.querySelector('img');
+         image.src = sectionId === 'installed_apps' ? item.icon : item.profile_pic;
+         image.alt = item.name;
+         row.querySelector('h3').textContent = item.name;
+         let detail;
+         if (sectionId === 'chats' || sectionId === 'sms') {
+             detail = item.last_message;
+         } else if (sectionId === 'calls') {
+             detail = item.time;
+         } else if (sectionId === 'contacts') {
+             detail = item.phone_number;
+         } else if (sectionId === 'installed_apps') {
+             detail = item.version;
+         }
+         row.querySelector('p').textContent = detail;
+     }
+
+     // One virtual list per section, created on first display
+     const sectionLists = {};
+
+     function getSectionList(sectionId) {
+         if (!sectionLists[sectionId]) {
+             const container = document.querySelector(LIST_CONTAINERS[sectionId]);
+             if (!container) {
+                 console.error(`Container not found for section: ${sectionId}`);
+                 return null;
+             }
+             sectionLists[sectionId] = new VirtualList(document.getElementById(sectionId), container, {
+                 createRow: () => createItemRow(sectionId),
+                 renderRow: (row, item) => renderItemRow(sectionId, row, item),
+                 estimatedRowHeight: sectionId === 'keylogs' ? 40 : 60,
+                 spacerTag: sectionId === 'keylogs' ? 'tr' : 'div',
+                 onNearEnd: () => loadMoreData(sectionId)
+             });
+         }
+         return sectionLists[sectionId];
+     }
+
+     // Generic function to display data
+    function displayData(sectionId, data) {
+        const list = getSectionList(sectionId);
+        if (list) {
+            list.setItems(data || []);
+        }
    }
 
 
@@ -124,70 +371,237 @@ document.addEventListener('DOMContentLoaded', function() {
         document.getElementById(sectionId).classList.add('active');
     }
 
+     // Fetches one page of a conversation's messages (newest first) from the server
+     async function fetchConversation(sectionId, name, cursor = null) {
+        let url = `/get_conversation?section=${sectionId}&name=${encodeURIComponent(name)}`;
+        if (cursor) {
+            url += `&cursor=${encodeURIComponent(cursor)}`;
+        }
+        try {
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return await response.json();
+        } catch (error) {
+            console.error(`Error loading conversation ${name}:`, error);
+            return null;
+        }
+     }
+
+     function createMessageRow() {
+        const messageDiv = document.createElement('div');
+        messageDiv.classList.add('message');
+        const sender = document.createElement('div');
+        sender.classList.add('sender');
+        const content = document.createElement('div');
+        content.classList.add('content');
+        messageDiv.append(sender, content);
+        return messageDiv;
+     }
+
+     function renderMessageRow(row, message) {
+        row.querySelector('.sender').textContent = message.sender;
+        row.querySelector('.content').textContent = message.content;
+     }
+
+     // Virtual list of the conversation open in each window
+     const conversationLists = {};
+
+     // Renders a conversation oldest-to-newest, scrolled to the newest message. The next older page is
+     // fetched in the background and prepended when the list is scrolled near its top.
+     async function loadConversation(sectionId, name, messagesContainer) {
+        if (conversationLists[sectionId]) {
+            conversationLists[sectionId].destroy();
+        }
+        const list = new VirtualList(messagesContainer, messagesContainer, {
+            createRow: createMessageRow,
+            renderRow: renderMessageRow,
+            estimatedRowHeight: 70
+        });
+        conversationLists[sectionId] = list;
+
+        const response = await fetchConversation(sectionId, name);
+        if (!response || conversationLists[sectionId] !== list) return;
+        let older = response.next_cursor ? fetchConversation(sectionId, name, response.next_cursor) : null;
+        let loading = false;
+        list.setItems(response.data.slice().reverse());
+        list.scrollToEnd();
+
+        list.onNearStart = async () => {
+            if (loading || !older) return;
+            loading = true;
+            const page = await older;
+            // Another conversation was opened in this window meanwhile
+            if (conversationLists[sectionId] !== list) return;
+            older = page && page.next_cursor ? fetchConversation(sectionId, name, page.next_cursor) : null;
+            if (page) {
+                list.prependItems(page.data.slice().reverse());
+            }
+            loading = false;
+            list.render();
+        };
+        list.render();
+     }
+
      // Function to open chat window
-     function openChatWindow(name, messages) {
+     function openChatWindow(name) {
         document.getElementById('chat-window-name').textContent = name;
-        const chatMessages = document.getElementById('chat-messages');
-         chatMessages.innerHTML = '';
-        messages.forEach(message => {
-            const messageDiv = document.createElement('div');
-            messageDiv.classList.add('message');
-            messageDiv.innerHTML = `
-               <div class="sender">${message.sender}</div>
-                <div class="content">${message.content}</div>
-            `;
-            chatMessages.appendChild(messageDiv);
-        });
         chatWindow.classList.remove('hidden');
+        loadConversation('chats', name, document.getElementById('chat-messages'));
     }
 
     // Function to open sms window
-    function openSmsWindow(name, messages) {
+    function openSmsWindow(name) {
        document.getElementById('sms-window-name').textContent = name;
-         const smsMessages = document.getElementById('sms-messages');
-         smsMessages.innerHTML = '';
-        messages.forEach(message => {
-            const messageDiv = document.createElement('div');
-           messageDiv.classList.add('message');
-            messageDiv.innerHTML = `
-               <div class="sender">${message.sender}</div>
-               <div class="content">${message.content}</div>
-           `;
-            smsMessages.appendChild(messageDiv);
-       });
-         smsWindow.classList.remove('hidden');
+        smsWindow.classList.remove('hidden');
+        loadConversation('sms', name, document.getElementById('sms-messages'));
     }
 
+     // Keeps the loaded rows of a section for search and the inspector
+     function storeSectionData(sectionId, data) {
+        if (sectionId === 'chats') {
+            chatData = data;
+        } else if (sectionId === 'calls') {
+            callData = data;
+        } else if (sectionId === 'keylogs') {
+            keylogData = data;
+        } else if (sectionId === 'contacts') {
+            contactData = data;
+        } else if (sectionId === 'sms') {
+            smsData = data;
+        } else if (sectionId === 'installed_apps') {
+            appData = data;
+        }
+     }
+
+     // Paging position of each displayed section: last loaded page and the cursor after it
+     const sectionPaging = {};
+     // Next page of each section, requested in the background while the current one is displayed
+     const prefetchedPages = {};
+
+     function prefetchNextPage(sectionId, page, perPage, cursor) {
+        if (cursor) {
+            prefetchedPages[sectionId] = { cursor, promise: fetchData(sectionId, page, perPage, cursor) };
+        } else {
+            delete prefetchedPages[sectionId];
+        }
+     }
+
+     // Returns the prefetched page if it is the one asked for, otherwise fetches it
+     function takePage(sectionId, page, perPage, cursor) {
+        const prefetched = prefetchedPages[sectionId];
+        delete prefetchedPages[sectionId];
+        if (cursor && prefetched && prefetched.cursor === cursor) {
+            return prefetched.promise;
+        }
+        return fetchData(sectionId, page, perPage, cursor);
+     }
 
      // Function to load and display data
-      async function loadData(sectionId, page = 1, perPage = 10) {
-          const response = await fetchData(sectionId, page, perPage);
+      async function loadData(sectionId, page = 1, perPage = 10, cursor = null) {
+          const response = await takePage(sectionId, page, perPage, cursor);
             if (response && response.data) {
-                 if (sectionId === 'chats') {
-                        chatData = response.data;
-                    } else if (sectionId === 'calls') {
-                        callData = response.data;
-                     } else if (sectionId === 'keylogs') {
-                         keylogData = response.data;
-                     } else if (sectionId === 'contacts') {
-                        contactData = response.data;
-                    } else if (sectionId === 'sms') {
-                        smsData = response.data;
-                    } else if (sectionId === 'installed_apps') {
-                        appData = response.data;
-                    }
+                storeSectionData(sectionId, response.data);
+                sectionPaging[sectionId] = {
+                    page: response.page,
+                    perPage: response.per_page,
+                    nextCursor: response.next_cursor,
+                    loading: false
+                };
+                prefetchNextPage(sectionId, response.page + 1, response.per_page, response.next_cursor);
                 displayData(sectionId, response.data);
                 updateSearchResults(sectionId, '');
                 // Update pagination info
                 currentPage = response.page;
                 perPage = response.per_page;
                 const totalPages = response.total_pages;
-                 updatePagination(sectionId, currentPage, totalPages);
+                 updatePagination(sectionId, currentPage, totalPages, response.next_cursor, response.prev_cursor);
             }
        }
 
+     // Appends the next page when a section's list is scrolled near its end
+     async function loadMoreData(sectionId) {
+        const paging = sectionPaging[sectionId];
+        if (!paging || paging.loading || !paging.nextCursor) return;
+        paging.loading = true;
+        const response = await takePage(sectionId, paging.page + 1, paging.perPage, paging.nextCursor);
+        // The section was reloaded meanwhile
+        if (sectionPaging[sectionId] !== paging) return;
+        paging.loading = false;
+        if (!response || !response.data) {
+            paging.nextCursor = null;
+            return;
+        }
+        paging.page = response.page;
+        paging.nextCursor = response.next_cursor;
+        prefetchNextPage(sectionId, response.page + 1, paging.perPage, response.next_cursor);
+        const list = getSectionList(sectionId);
+        list.appendItems(response.data);
+        storeSectionData(sectionId, list.items);
+        currentPage = response.page;
+        updatePagination(sectionId, currentPage, response.total_pages, response.next_cursor, response.prev_cursor);
+     }
+
+
+    // Sections searched with the server-side full-text index rather than the loaded page
+    const serverSearchSections = ['chats', 'sms', 'keylogs'];
+    let searchTimer = null;
+
+    async function searchServer(sectionId, searchTerm) {
+        const resultsContainer = document.getElementById(`search-results-${sectionId}`);
+        let response;
+        try {
+            const res = await fetch(`/search?q=${encodeURIComponent(searchTerm)}&sections=${sectionId}&per_page=20`);
+            if (!res.ok) {
+                throw new Error(`HTTP error! status: ${res.status}`);
+            }
+            response = await res.json();
+        } catch (error) {
+            console.error(`Error searching ${sectionId}:`, error);
+            return;
+        }
+
+        resultsContainer.innerHTML = '';
+        if (!response.data || response.data.length === 0) {
+            resultsContainer.classList.remove('active');
+            return;
+        }
+        resultsContainer.classList.add('active');
+        response.data.forEach(item => {
+            const resultDiv = document.createElement('div');
+            const name = document.createElement('strong');
+            name.textContent = item.name;
+            const time = document.createElement('span');
+            time.textContent = item.time;
+            const snippet = document.createElement('p');
+            // The server HTML-escapes the snippet; its only markup is the <mark> around each match
+            snippet.innerHTML = item.snippet;
+            resultDiv.append(name, ' ', time, snippet);
+            resultDiv.addEventListener('click', () => {
+                if (sectionId === 'chats') {
+                    openChatWindow(item.name);
+                } else if (sectionId === 'sms') {
+                    openSmsWindow(item.name);
+                }
+            });
+            resultsContainer.appendChild(resultDiv);
+        });
+    }
 
     function updateSearchResults(sectionId, searchTerm) {
+      if (serverSearchSections.includes(sectionId)) {
+          const resultsContainer = document.getElementById(`search-results-${sectionId}`);
+          clearTimeout(searchTimer);
+          if (searchTerm.trim() === '') {
+              resultsContainer.innerHTML = '';
+              resultsContainer.classList.remove('active');
+              return;
+          }
+          searchTimer = setTimeout(() => searchServer(sectionId, searchTerm), 250);
+          return;
+      }
+
       let data;
        const resultsContainer = document.getElementById(`search-results-${sectionId}`);
         if (sectionId === 'chats') {
@@ -229,16 +643,10 @@ document.addEventListener('DOMContentLoaded', function() {
                       resultDiv.textContent = item.name;
                      resultDiv.addEventListener('click', () => {
                          if (sectionId === 'chats') {
-                              const selectedChat = chatData.find(chat => chat.name === item.name);
-                             if(selectedChat){
-                                openChatWindow(selectedChat.name, selectedChat.messages);
-                             }
+                                openChatWindow(item.name);
                           }
                             if (sectionId === 'sms') {
-                              const selectedSms = smsData.find(sms => sms.name === item.name);
-                             if(selectedSms){
-                                openSmsWindow(selectedSms.name, selectedSms.messages);
-                            }
+                                openSmsWindow(item.name);
                           }
                       });
                    }
@@ -278,7 +686,7 @@ document.addEventListener('DOMContentLoaded', function() {
           // Add any additional property if needed
         inspectorPanel.classList.remove('hidden');
      }
-     function updatePagination(sectionId, currentPage, totalPages) {
+     function updatePagination(sectionId, currentPage, totalPages, nextCursor = null, prevCursor = null) {
         const paginationContainer = document.getElementById(`pagination-${sectionId}`);
         if (!paginationContainer) return;
 
@@ -288,9 +696,9 @@ document.addEventListener('DOMContentLoaded', function() {
 
         const prevButton = document.createElement('button');
         prevButton.textContent = 'Previous';
-        prevButton.disabled = currentPage === 1;
+        prevButton.disabled = currentPage === 1 || !prevCursor;
         prevButton.addEventListener('click', () => {
-            loadData(sectionId, currentPage - 1, perPage);
+            loadData(sectionId, currentPage - 1, perPage, prevCursor);
         });
         paginationContainer.appendChild(prevButton);
 
@@ -300,9 +708,9 @@ document.addEventListener('DOMContentLoaded', function() {
 
         const nextButton = document.createElement('button');
         nextButton.textContent = 'Next';
-        nextButton.disabled = currentPage === totalPages;
+        nextButton.disabled = currentPage === totalPages || !nextCursor;
         nextButton.addEventListener('click', () => {
-            loadData(sectionId, currentPage + 1, perPage);
+            loadData(sectionId, currentPage + 1, perPage, nextCursor);
         });
         paginationContainer.appendChild(nextButton);
     }
@@ -365,17 +773,10 @@ document.addEventListener('DOMContentLoaded', function() {
             };
 
               xhr.onload = async function() {
-                if (xhr.status === 200) {
-                     uploadProgress.style.display = 'none';
-                     uploadMessage.textContent = 'Upload successful!';
+                if (xhr.status === 202) {
                      const response = JSON.parse(xhr.responseText);
-                    if (response.reload_required) {
-                           sections.forEach(section => {
-                            if (section.classList.contains('active')) {
-                                refreshData(section.id);
-                           }
-                       });
-                   }
+                     uploadMessage.textContent = 'Importing...';
+                     pollImportJob(response.status_url);
                 } else {
                     uploadProgress.style.display = 'none';
                    uploadMessage.textContent = 'Upload failed.';
@@ -389,6 +790,45 @@ document.addEventListener('DOMContentLoaded', function() {
              xhr.send(formData);
         });
 
+      // Polls a background import job and shows its row counters until it finishes
+      async function pollImportJob(statusUrl) {
+          let job;
+          try {
+              const response = await fetch(statusUrl);
+              if (!response.ok) {
+                  throw new Error(`HTTP error! status: ${response.status}`);
+              }
+              job = await response.json();
+          } catch (error) {
+              console.error('Error polling import job:', error);
+              uploadProgress.style.display = 'none';
+              uploadMessage.textContent = 'Import status unavailable.';
+              return;
+          }
+
+          if (job.status === 'queued' || job.status === 'running') {
+              uploadProgress.removeAttribute('value');
+              uploadMessage.textContent = `Importing... ${job.rows_read} read, ${job.rows_inserted} inserted, ${job.rows_rejected} rejected`;
+              setTimeout(() => pollImportJob(statusUrl), 1000);
+              return;
+          }
+
+          uploadProgress.style.display = 'none';
+          uploadProgress.value = 0;
+          if (job.status === 'skipped') {
+              uploadMessage.textContent = 'This file has already been imported.';
+          } else if (job.status === 'done') {
+              uploadMessage.textContent = `Import complete: ${job.rows_inserted} rows inserted, ${job.rows_rejected} rejected.`;
+              sections.forEach(section => {
+                  if (section.classList.contains('active')) {
+                      refreshData(section.id);
+                  }
+              });
+          } else {
+              uploadMessage.textContent = `Import failed: ${job.error}`;
+          }
+      }
+
       // Function for refreshing data, handles refreshing specific sections
     window.refreshData = async function(sectionId) {
         await loadData(sectionId);
@@ -0,0 +1,94 @@
+"""Behaviour of the web app's JSON endpoints on a database built from the sample exports."""
+import importlib
+import shutil
+import sqlite3
+from pathlib import Path
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("openpyxl")
+
+import create_db
+import data_loader
+from database_utils import create_database_engine, UNKNOWN_CONVERSATION
+
+SAMPLES = Path(__file__).resolve().parent.parent / "samples"
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp("app")
+    path = str(tmp_path / "app.db")
+    create_db.create_database(path)
+    engine = create_database_engine(path)
+    try:
+        for name in ("sms.xlsx", "chatMessages.xlsx"):
+            shutil.copy(SAMPLES / name, tmp_path / name)
+            data_loader.load_and_clean_data(str(tmp_path / name), engine, data_loader.table_mapping,
+                                            data_loader.transform_mapping)
+    finally:
+        engine.dispose()
+    return path
+
+
+@pytest.fixture(scope="module")
+def client(db_path):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("DATABASE_PATH", db_path)
+        app_module = importlib.import_module("app")
+    assert app_module.db_path == db_path, "app was imported earlier against another database"
+    return app_module.app.test_client()
+
+
+def fetch_all(client, url, **params):
+    """Follows next_cursor from the first page to the last and returns every row served"""
+    rows = []
+    cursor = None
+    while True:
+        response = client.get(url, query_string={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        rows.extend(body["data"])
+        cursor = body["next_cursor"]
+        if not cursor or not body["data"]:
+            return rows, body
+
+
+def test_conversation_message_counts_match_served_messages(client, db_path):
+    with sqlite3.connect(db_path) as conn:
+        conversations = conn.execute("SELECT section, name, message_count FROM conversations").fetchall()
+    assert (("sms", UNKNOWN_CONVERSATION) in {(section, name) for section, name, _ in conversations})
+
+    for section, name, message_count in conversations:
+        rows, body = fetch_all(client, "/get_conversation", section=section, name=name, per_page=200)
+        assert body["total_count"] == message_count, (section, name)
+        assert len(rows) == message_count, (section, name)
+
+
+def test_parquet_export_is_typed(client, db_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    response = client.get("/export", query_string={"section": "sms", "format": "parquet"})
+    assert response.status_code == 200
+    exported = pq.read_table(pa.BufferReader(response.get_data()))
+
+    assert exported.schema.field("time_dt").type == pa.timestamp("ms", tz="UTC")
+    assert exported.schema.field("contact_id").type == pa.int64()
+    assert exported.schema.field("location_id").type == pa.int64()
+    assert exported.schema.field("text").type == pa.string()
+    with sqlite3.connect(db_path) as conn:
+        stored = [row[0] for row in conn.execute("SELECT time_dt FROM sms_messages ORDER BY time_dt")]
+    assert [value.value for value in exported.column("time_dt")] == stored
+    assert any(value is not None for value in stored)
+
+
+@pytest.mark.parametrize("url, params", [
+    ("/get_data", {"section": "sms"}),
+    ("/get_conversation", {"section": "sms", "name": UNKNOWN_CONVERSATION}),
+    ("/search", {"q": "hello"}),
+])
+@pytest.mark.parametrize("paging", [{"per_page": 0}, {"per_page": -5}, {"page": 0}, {"page": -1}])
+def test_invalid_paging_is_rejected(client, url, params, paging):
+    response = client.get(url, query_string={**params, **paging})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
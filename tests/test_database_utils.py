@@ -0,0 +1,57 @@
+"""IdCache, the LRU of dimension ids shared by the files of an import run."""
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from database_utils import IdCache
+
+
+def test_evicts_least_recently_used():
+    cache = IdCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_put_refreshes_an_existing_key():
+    cache = IdCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("a", 1)
+    cache.put("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+
+
+def test_counts_hits_and_misses():
+    cache = IdCache(max_size=2)
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+    cache.put("b", 2)
+    cache.put("c", 3)  # evicts "a"
+    cache.get("a")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    assert stats["hit_rate"] == 0.5
+    assert (stats["size"], stats["max_size"]) == (2, 2)
+
+
+def test_preload_fills_up_to_max_size():
+    cache = IdCache(max_size=2)
+    cache.preload([("a", 1), (None, 9), ("b", 2), ("c", 3)])
+
+    assert cache.preloaded
+    assert len(cache) == 2
+    assert None not in cache
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, 2, None)
+    assert cache.stats()["misses"] == 1
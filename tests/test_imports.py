@@ -0,0 +1,164 @@
+"""Imports of the sample exports through data_processor (serial) and data_loader (parallel, /upload)."""
+import shutil
+import sqlite3
+from pathlib import Path
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("openpyxl")
+
+import create_db
+import data_loader
+import data_processor
+from database_utils import create_database_engine, create_import_ledger
+
+SAMPLES = Path(__file__).resolve().parent.parent / "samples"
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "test.db"
+    create_db.create_database(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def sample(tmp_path):
+    """Copies a sample export into tmp_path, so the cleaned output is not written into the repository"""
+    def copy(name):
+        path = tmp_path / name
+        shutil.copy(SAMPLES / name, path)
+        return path
+    return copy
+
+
+def import_serial(db_path, file_path):
+    data_processor.process_and_insert_data(file_path, db_path=db_path)
+
+
+def import_loader(db_path, file_path):
+    engine = create_database_engine(db_path)
+    try:
+        progress = data_loader.load_and_clean_data(str(file_path), engine, data_loader.table_mapping,
+                                                   data_loader.transform_mapping)
+    finally:
+        engine.dispose()
+    assert progress["error"] is None
+
+
+def scalar(db_path, sql):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(sql).fetchone()[0]
+
+
+@pytest.mark.parametrize("import_file", [import_serial, import_loader])
+def test_calls_keep_location_and_duration(db_path, sample, import_file):
+    import_file(db_path, sample("calls.xlsx"))
+
+    assert scalar(db_path, "SELECT COUNT(*) FROM calls") > 0
+    assert scalar(db_path, "SELECT COUNT(*) FROM calls WHERE location_id IS NOT NULL") > 0
+    assert scalar(db_path, "SELECT COUNT(*) FROM calls WHERE duration > 0") > 0
+
+
+@pytest.mark.parametrize("import_file", [import_serial, import_loader])
+def test_sms_keep_location(db_path, sample, import_file):
+    import_file(db_path, sample("sms.xlsx"))
+
+    assert scalar(db_path, "SELECT COUNT(*) FROM sms_messages WHERE location_id IS NOT NULL") > 0
+
+
+# Sample export -> table it is imported into
+SAMPLE_TABLES = {
+    "calls.xlsx": "calls",
+    "chatMessages.xlsx": "chat_messages",
+    "contacts.xlsx": "contacts",
+    "installedApps.xlsx": "installedapps",
+    "keylogs.xlsx": "keylogs",
+    "sms.xlsx": "sms_messages",
+}
+
+
+@pytest.mark.parametrize("name, table_name", SAMPLE_TABLES.items())
+def test_serial_reimport_adds_no_rows(db_path, sample, name, table_name):
+    file_path = sample(name)
+    import_serial(db_path, file_path)
+    count = scalar(db_path, f"SELECT COUNT(*) FROM {table_name}")
+    import_serial(db_path, file_path)
+
+    assert count > 0
+    assert scalar(db_path, f"SELECT COUNT(*) FROM {table_name}") == count
+
+
+@pytest.mark.parametrize("table_name, contact_column", [("calls", "from_to"), ("sms_messages", "from_to"),
+                                                        ("chat_messages", "sender")])
+def test_serial_import_keeps_contact_text(db_path, sample, table_name, contact_column):
+    name = next(name for name, table in SAMPLE_TABLES.items() if table == table_name)
+    import_serial(db_path, sample(name))
+
+    assert scalar(db_path, f"SELECT COUNT(*) FROM {table_name} WHERE contact_id IS NOT NULL") > 0
+    assert scalar(db_path, f"SELECT COUNT(*) FROM {table_name} WHERE contact_id IS NOT NULL "
+                           f"AND {contact_column} IS NULL") == 0
+
+
+@pytest.mark.parametrize("name, table_name", SAMPLE_TABLES.items())
+def test_loader_reimport_adds_no_rows(db_path, sample, name, table_name):
+    file_path = sample(name)
+    import_loader(db_path, file_path)
+    count = scalar(db_path, f"SELECT COUNT(*) FROM {table_name}")
+    import_loader(db_path, file_path)
+
+    assert count > 0
+    assert scalar(db_path, f"SELECT COUNT(*) FROM {table_name}") == count
+
+
+def dump_messages(db_path):
+    """Rows of the sms and calls tables with their contact, location and type ids decoded back to text"""
+    with sqlite3.connect(db_path) as conn:
+        return sorted(conn.execute("""
+            SELECT 'sms', s.sms_type, s.time, s.time_dt, s.from_to, s.text, NULL, l.location_text, c.name
+            FROM sms_messages_decoded s LEFT JOIN locations l USING (location_id) LEFT JOIN contacts c USING (contact_id)
+            UNION ALL
+            SELECT 'calls', s.call_type, s.time, s.time_dt, s.from_to, NULL, s.duration, l.location_text, c.name
+            FROM calls_decoded s LEFT JOIN locations l USING (location_id) LEFT JOIN contacts c USING (contact_id)
+        """).fetchall(), key=repr)
+
+
+def test_worker_count_does_not_change_stored_rows(tmp_path, sample):
+    main = pytest.importorskip("main")
+    files = [(str(sample(name)), name) for name in ("calls.xlsx", "sms.xlsx")]
+    dumps = []
+    for workers in (1, 2):
+        path = tmp_path / f"workers{workers}.db"
+        create_db.create_database(str(path))
+        engine = create_database_engine(str(path))
+        create_import_ledger(engine)
+        try:
+            if workers > 1:
+                main.run_pipeline(engine, files, workers)
+            else:
+                main.run_serial(engine, files)
+        finally:
+            engine.dispose()
+        dumps.append(dump_messages(str(path)))
+
+    assert dumps[0]
+    assert dumps[0] == dumps[1]
+
+
+def test_files_to_import_skips_copies_within_a_run(tmp_path, sample):
+    main = pytest.importorskip("main")
+    original = sample("calls.xlsx")
+    copy = tmp_path / "calls copy.xlsx"
+    shutil.copy(original, copy)
+    path = tmp_path / "ledger.db"
+    create_db.create_database(str(path))
+    engine = create_database_engine(str(path))
+    create_import_ledger(engine)
+    try:
+        pending = main.files_to_import(engine, [str(original), str(copy)])
+        forced = main.files_to_import(engine, [str(original), str(copy)], force=True)
+    finally:
+        engine.dispose()
+
+    assert [file_path for file_path, _ in pending] == [str(original)]
+    assert [file_path for file_path, _ in forced] == [str(original)]
@@ -0,0 +1,66 @@
+"""Keyset paging of the /get_data sections (queries.PagedQuery)."""
+import sqlite3
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import create_db
+from database_utils import create_database_engine
+from queries import DATA_SECTIONS, fetch_page
+
+# time_dt of the keylogs rows: repeated keys and NULLs, which sort after every key
+TIME_DTS = [5000, None, 3000, 5000, None, 1000, 3000, None, 2000, 5000, None, 4000, None]
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    path = str(tmp_path / "paging.db")
+    create_db.create_database(path)
+    with sqlite3.connect(path) as conn:
+        conn.executemany("INSERT INTO keylogs (application_id, time, time_dt, text) VALUES (NULL, ?, ?, ?)",
+                         [(str(time_dt), time_dt, f"row {i}") for i, time_dt in enumerate(TIME_DTS)])
+    engine = create_database_engine(path)
+    yield engine
+    engine.dispose()
+
+
+def expected_order(conn):
+    """rowids newest first: time_dt descending with NULLs last, then rowid descending"""
+    rows = conn.exec_driver_sql("SELECT time_dt, rowid FROM keylogs").fetchall()
+    keyed = sorted((row for row in rows if row[0] is not None), reverse=True)
+    nulls = sorted((row for row in rows if row[0] is None), key=lambda row: row[1], reverse=True)
+    return [row_id for _, row_id in keyed + nulls]
+
+
+@pytest.mark.parametrize("per_page", [1, 2, 3, 4, 5, len(TIME_DTS)])
+def test_next_and_prev_cursors_visit_every_row_once(db_engine, per_page):
+    spec = DATA_SECTIONS['keylogs']
+    with db_engine.connect() as conn:
+        expected = expected_order(conn)
+
+        pages = []
+        rows, next_cursor, prev_cursor = fetch_page(conn, spec, 1, per_page)
+        pages.append(rows)
+        while next_cursor:
+            rows, next_cursor, prev_cursor = fetch_page(conn, spec, 1, per_page, next_cursor)
+            pages.append(rows)
+        forward = [row[-1] for page in pages for row in page]
+
+        backward_pages = [pages[-1]]
+        while prev_cursor:
+            rows, _, prev_cursor = fetch_page(conn, spec, 1, per_page, prev_cursor)
+            backward_pages.append(rows)
+        backward = [row[-1] for page in reversed(backward_pages) for row in page]
+
+    assert forward == expected
+    assert backward == expected
+    assert all(len(page) == per_page for page in pages[:-1])
+
+
+@pytest.mark.parametrize("section", DATA_SECTIONS)
+def test_sections_select_only_their_fields(db_engine, section):
+    spec = DATA_SECTIONS[section]
+    with db_engine.connect() as conn:
+        result = spec.statements['page'].execute(conn, limit=0, offset=0)
+        # Each field, then the sort key and rowid appended by PagedQuery
+        assert len(result.keys()) == len(spec.fields) + 2
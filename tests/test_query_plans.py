@@ -0,0 +1,100 @@
+"""Query plan checks of the /get_data and /get_conversation statements (see query_plans.py)."""
+import shutil
+import sqlite3
+from pathlib import Path
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import create_db
+import query_plans
+from database_utils import create_database_engine
+from migrations import migrate
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("detail", [
+    "SEARCH t USING INDEX idx_keylogs_time_dt (time_dt<?)",
+    "SEARCH conversations USING INDEX idx_conversations_by_last_time (section=? AND last_time_dt>?)",
+    "SEARCH contacts USING COVERING INDEX idx_contacts_name (name=? AND rowid<?)",
+    "SEARCH d USING INTEGER PRIMARY KEY (rowid=?) LEFT-JOIN",
+    "SCAN CONSTANT ROW",
+])
+def test_seek_plans_pass(detail):
+    assert query_plans.plan_problems([detail], seek=True) == []
+
+
+@pytest.mark.parametrize("detail, seek, kind", [
+    ("SCAN keylogs", False, "full_scan"),
+    ("SCAN t", True, "full_scan"),
+    ("USE TEMP B-TREE FOR ORDER BY", False, "temp_sort"),
+    ("USE TEMP B-TREE FOR RIGHT PART OF ORDER BY", False, "temp_sort"),
+    ("SCAN t USING INDEX idx_keylogs_time_dt", True, "index_walk"),
+    ("SCAN contacts USING COVERING INDEX idx_contacts_name", True, "index_walk"),
+])
+def test_bad_plans_fail(detail, seek, kind):
+    assert query_plans.plan_problems([detail], seek=seek) == [(kind, detail)]
+
+
+def test_index_walk_passes_outside_seeks():
+    # Page-number pages read the index in order and stop at LIMIT/OFFSET
+    assert query_plans.plan_problems(["SCAN t USING INDEX idx_keylogs_time_dt"]) == []
+
+
+def test_allow_list_skips_a_kind():
+    details = ["MULTI-INDEX OR", "USE TEMP B-TREE FOR ORDER BY"]
+    assert query_plans.plan_problems(details, allow=("temp_sort",), seek=True) == []
+
+
+def failing_plans(db_path):
+    db_engine = create_database_engine(str(db_path))
+    try:
+        return {label: problems for label, _, problems in query_plans.check_query_plans(db_engine) if problems}
+    finally:
+        db_engine.dispose()
+
+
+def test_fresh_database(tmp_path):
+    db_path = tmp_path / "fresh.db"
+    create_db.create_database(str(db_path))
+    assert failing_plans(db_path) == {}
+
+
+def test_schema_sql_database(tmp_path):
+    db_path = tmp_path / "schema.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript((REPO_ROOT / "schema.sql").read_text())
+    migrate(str(db_path))
+    assert failing_plans(db_path) == {}
+
+
+def test_migrated_shipped_database(tmp_path):
+    db_path = tmp_path / "shipped.db"
+    shutil.copy(REPO_ROOT / "my_database.db", db_path)
+    migrate(str(db_path))
+    assert failing_plans(db_path) == {}
+
+
+def test_missing_index_is_reported(tmp_path):
+    db_path = tmp_path / "fresh.db"
+    create_db.create_database(str(db_path))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DROP INDEX idx_keylogs_time_dt")
+    failed = failing_plans(db_path)
+    assert ("full_scan", "SCAN t") in failed["keylogs (next)"]
+    assert "keylogs (count)" not in failed
+
+
+def test_startup_check_strict_raises(tmp_path):
+    db_path = tmp_path / "fresh.db"
+    create_db.create_database(str(db_path))
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DROP INDEX idx_contacts_name")
+    db_engine = create_database_engine(str(db_path))
+    try:
+        query_plans.startup_check(db_engine, "warn")
+        with pytest.raises(RuntimeError, match="contacts"):
+            query_plans.startup_check(db_engine, "strict")
+    finally:
+        db_engine.dispose()
@@ -1,6 +1,5 @@
 import pandas as pd
 from datetime import datetime
-from database_utils import get_or_create_record
 import logging
 from dateutil import parser
 
@@ -16,6 +15,8 @@ def parse_datetime(date_string, format_string = '%b %e, %I:%M %p'):
     """
     if pd.isna(date_string):
        return None
+    if isinstance(date_string, datetime):
+       return date_string
     try:
         # Attempt to parse with dateutil.parser which handles many formats
         return parser.parse(date_string)
@@ -23,12 +24,106 @@ def parse_datetime(date_string, format_string = '%b %e, %I:%M %p'):
       logging.error(f"Date parsing error: {e} with string: {date_string}")
       return None
 
+# Timestamp formats seen in exports, tried in order when inferring a column's format
+TIMESTAMP_FORMATS = [
+    '%b %d, %I:%M %p',
+    '%b %d, %Y %I:%M %p',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%b %d, %H:%M',
+    '%b %d, %Y',
+    '%b %d, %Y %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+]
+# Number of non-empty values sampled when inferring the format of a column
+FORMAT_SAMPLE_SIZE = 50
+
+def _to_datetime_with_format(values, format_string):
+    """Parses a Series of strings with one format; formats without a year get the current year like dateutil does"""
+    if '%Y' not in format_string:
+        values = values + f" {datetime.now().year}"
+        format_string = f"{format_string} %Y"
+    return pd.to_datetime(values, format=format_string, errors='coerce')
+
+def infer_datetime_format(values, formats=TIMESTAMP_FORMATS, sample_size=FORMAT_SAMPLE_SIZE):
+    """Returns the format that parses most of a sample of the values, or None if none of them match"""
+    sample = values.dropna().head(sample_size)
+    if sample.empty:
+        return None
+    best_format, best_count = None, 0
+    for format_string in formats:
+        count = _to_datetime_with_format(sample, format_string).notna().sum()
+        if count > best_count:
+            best_format, best_count = format_string, count
+            if count == len(sample):
+                break
+    return best_format
+
+def parse_datetime_series(series, format_cache=None, cache_key=None, fallback=parse_datetime, timezone=None):
+    """Parses a whole column of date strings at once.
+
+    The format is inferred from a sample (and remembered in format_cache under
+    cache_key, so later chunks of the same file skip inference), the column is
+    parsed with pd.to_datetime, and only the rows that did not match go through
+    the per-value fallback. If timezone is given, naive results are localized
+    for the whole column in one call.
+    Args:
+        series (pd.Series): The column to parse.
+        format_cache (dict): Per-file map of cache_key to detected format.
+        cache_key (str): Key for this column in format_cache.
+        fallback (callable): Per-value parser for rows the format does not match.
+        timezone (str): Timezone to localize naive timestamps to.
+
+    Returns:
+        pd.Series: The parsed timestamps, NaT where parsing failed.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        parsed = series
+    elif series.dropna().empty:
+        parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    else:
+        if pd.api.types.infer_dtype(series, skipna=True) == 'string':
+            strings = series.str.strip()
+        else:
+            strings = series.where(series.map(lambda x: isinstance(x, str))).str.strip()
+
+        if format_cache is not None and cache_key in format_cache:
+            format_string = format_cache[cache_key]
+        else:
+            format_string = infer_datetime_format(strings)
+            if format_cache is not None:
+                format_cache[cache_key] = format_string
+
+        if format_string:
+            parsed = _to_datetime_with_format(strings, format_string)
+        else:
+            parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+
+        leftover = parsed.isna() & series.notna()
+        if leftover.any():
+            fallback_values = series[leftover].map(fallback)
+            try:
+                parsed[leftover] = pd.to_datetime(fallback_values, errors='coerce')
+            except (TypeError, ValueError):
+                # Mixed timezone-aware results cannot share a datetime64 column
+                parsed = parsed.astype(object)
+                parsed[leftover] = fallback_values
+
+    if timezone and pd.api.types.is_datetime64_dtype(parsed):
+        parsed = parsed.dt.tz_localize(timezone, ambiguous='NaT', nonexistent='NaT')
+    return parsed
+
 def parse_duration(duration_string):
     """Parses a duration string into seconds."""
     if pd.isna(duration_string):
         return None
+    if isinstance(duration_string, (int, float)):
+        return int(duration_string)
     try:
-        parts = duration_string.replace("Min", "").replace("Sec", "").strip().split("&")
+        parts = duration_string.split("&")
         total_seconds = 0
         for part in parts:
           part = part.strip()
@@ -41,6 +136,8 @@ def parse_duration(duration_string):
           elif "sec" in part.lower():
               seconds = int(part.lower().replace("sec", "").strip())
               total_seconds += seconds
+          elif part:
+              total_seconds += int(part)
         return total_seconds
     except ValueError as e:
         print(f"Duration parsing error: {e}")
@@ -48,8 +145,21 @@ def parse_duration(duration_string):
 
 
 class Transform:
-    def __init__(self, db_engine):
+    # Leading data rows the loader drops from the first chunk of a file
+    skip_rows = 0
+
+    def __init__(self, db_engine, timer=None):
       self.db_engine = db_engine
+      # Detected timestamp format per column, reused across chunks of the same file
+      self.datetime_formats = {}
+      # instrumentation.StageTimer; when set, datetime parsing is timed as its own stage
+      self.timer = timer
+
+    def parse_datetime_column(self, df, column):
+      if self.timer is None:
+          return parse_datetime_series(df[column], self.datetime_formats, column)
+      with self.timer.span("parse_datetime", len(df)):
+          return parse_datetime_series(df[column], self.datetime_formats, column)
 
     def clean_columns(self, df):
       df.columns = [col.lower().replace(' ', '_') for col in df.columns]
@@ -61,32 +171,33 @@ class Transform:
       pass
 
 class KeylogTransform(Transform):
+   skip_rows = 2
+
    def transform(self, df):
-       df = df.iloc[2:]
-       df.loc[:,'time_dt'] = df['time'].apply(lambda x: parse_datetime(x))
+       df.loc[:,'time_dt'] = self.parse_datetime_column(df, 'time')
        return df
 class SmsMessageTransform(Transform):
+   skip_rows = 1  # skips the header for sms_messages
+
    def transform(self, df):
-       df = df.iloc[1:]  # skips the header for sms_messages
-       df.loc[:,'time_dt'] = df['time'].apply(lambda x: parse_datetime(x))
+       df.loc[:,'time_dt'] = self.parse_datetime_column(df, 'time')
        return df
 class ChatMessageTransform(Transform):
     def transform(self, df):
-        df.loc[:,'time_dt'] = df['time'].apply(lambda x: parse_datetime(x))
+        df.loc[:,'time_dt'] = self.parse_datetime_column(df, 'time')
         return df
 class ContactTransform(Transform):
     def transform(self, df):
-        df.loc[:,'last_contacted_dt'] = df['last_contacted'].apply(lambda x: parse_datetime(x))
+        df.loc[:,'last_contacted_dt'] = self.parse_datetime_column(df, 'last_contacted')
         return df
 class CallTransform(Transform):
     def transform(self, df):
-        df.loc[:,'time_dt'] = df['time'].apply(lambda x: parse_datetime(x))
-        df.loc[:,'duration'] = df['duration_(sec)'].apply(lambda x: parse_duration(x))
-        df = df.drop(columns = ['duration_(sec)'])
+        df.loc[:,'time_dt'] = self.parse_datetime_column(df, 'time')
+        df['duration'] = df['duration'].apply(lambda x: parse_duration(x))
         return df
 class InstalledAppTransform(Transform):
     def transform(self, df):
-       df.loc[:,'installed_date'] = df['installed_date'].apply(lambda x: parse_datetime(x))
+       df['installed_date'] = self.parse_datetime_column(df, 'installed_date')
        return df
 class LocationTransform(Transform):
   def transform(self, df):